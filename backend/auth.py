@@ -8,6 +8,7 @@ from pymongo import MongoClient
 from bson import ObjectId
 import os
 from typing import Optional
+from metrics import mongo_command_metrics
 
 # Security setup
 SECRET_KEY = os.getenv("SECRET_KEY")
@@ -31,7 +32,8 @@ try:
         connectTimeoutMS=10000,          # 10 second connection timeout
         socketTimeoutMS=20000,           # 20 second socket timeout
         maxPoolSize=10,                  # Limit connection pool size
-        retryWrites=True
+        retryWrites=True,
+        event_listeners=[mongo_command_metrics]
     )
     mongo_db = mongo_client[MONGODB_DB]
     users_collection = mongo_db["users"]
@@ -0,0 +1,158 @@
+"""
+Benchmark response serialization and compression on representative payloads:
+conversation history, a company's model catalog, a /query/ answer and a
+debug chunk dump.
+
+    python benchmark_responses.py --repeat 200
+
+before: jsonable_encoder + the standard json encoder (FastAPI's default path)
+after:  the endpoint's response model, if it has one, + orjson
+
+Payload sizes are reported raw, gzipped and, when the brotli package is
+installed, brotli-compressed at the levels configured for the API.
+"""
+
+import argparse
+import gzip
+import os
+import statistics
+import time
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, ORJSONResponse
+
+from chat import ConversationHistoryResponse, QueryResponse
+from main import CatalogModelsResponse
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+ANSWER = """# Replacing the Air Filter - Expert Guidance
+
+## Understanding Your Situation
+I understand you want to keep the unit running efficiently. A clogged filter is the most common cause of weak airflow (Page 12).
+
+## Step-by-Step Solution
+1. *Switch off and unplug the unit* - the fan can start without warning while the panel is open (Page 12)
+
+2. *Open the front panel* - lift it from both sides until it locks in the upright position (Page 13)
+
+3. *Slide the filter out* - pull the tab gently downwards; do not bend the mesh (Page 13)
+
+> *Safety First*: Never operate the unit without the filter installed (Page 14)
+
+---
+
+## Reference Documents
+[manual.pdf](https://res.cloudinary.com/demo/raw/upload/v1/acme_cooler_manual.pdf)
+"""
+
+
+def conversation_payload(messages: int) -> dict:
+    conversation = []
+    for i in range(messages):
+        if i % 2:
+            conversation.append({"role": "assistant", "content": ANSWER})
+        else:
+            conversation.append({"role": "user", "content": "How do I replace the air filter and how often should I do it?"})
+    return {"total_messages": messages, "conversation": conversation}
+
+
+def catalog_payload(models: int) -> dict:
+    return {
+        "models": [
+            {
+                "_id": f"{i:024x}",
+                "company_name": "acme",
+                "product_name": f"cooler_{i}",
+                "filename": f"cooler_{i}_manual.pdf",
+                "uri": f"https://res.cloudinary.com/demo/raw/upload/v1/acme_cooler_{i}_manual.pdf",
+                "qr_uri": f"https://res.cloudinary.com/demo/image/upload/v1/qr_codes/acme_cooler_{i}.png",
+            }
+            for i in range(models)
+        ]
+    }
+
+
+def debug_payload(chunks: int) -> dict:
+    all_data = [
+        {
+            "index": i,
+            "company_name": "acme",
+            "product_name": f"cooler_{i % 20}",
+            "source": "https://res.cloudinary.com/demo/raw/upload/v1/acme_cooler_manual.pdf",
+            "page": i % 40,
+            "content_preview": ANSWER[i % 200:i % 200 + 100] + "...",
+        }
+        for i in range(chunks)
+    ]
+    products = sorted({d["product_name"] for d in all_data})
+    return {
+        "total_documents": chunks,
+        "unique_companies": ["acme"],
+        "unique_products": products,
+        "company_product_combinations": [f"acme|{p}" for p in products],
+        "all_data": all_data,
+    }
+
+
+def render_before(payload: dict) -> bytes:
+    return JSONResponse(jsonable_encoder(payload)).body
+
+
+def render_after(payload: dict, model, exclude_unset: bool) -> bytes:
+    if model is None:
+        return ORJSONResponse(jsonable_encoder(payload)).body
+    content = model.model_validate(payload).model_dump(mode="json", by_alias=True, exclude_unset=exclude_unset)
+    return ORJSONResponse(content).body
+
+
+def time_ms(fn, repeat: int) -> float:
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=100)
+    parser.add_argument("--messages", type=int, default=200, help="conversation history length")
+    parser.add_argument("--models", type=int, default=2000, help="models in the catalog listing")
+    parser.add_argument("--chunks", type=int, default=50, help="chunks in the debug dump (it searches k=50)")
+    args = parser.parse_args()
+
+    gzip_level = int(os.getenv("COMPRESSION_GZIP_LEVEL", "6"))
+    brotli_quality = int(os.getenv("COMPRESSION_BROTLI_QUALITY", "4"))
+    payloads = [
+        ("/conversation/history/", conversation_payload(args.messages), ConversationHistoryResponse, True),
+        ("/companies/{c}/models/", catalog_payload(args.models), CatalogModelsResponse, True),
+        ("/query/", {"response": ANSWER, "cached": False}, QueryResponse, False),
+        ("/debug/all-data", debug_payload(args.chunks), None, False),
+    ]
+
+    print(f"{'endpoint':<24} {'before ms':>10} {'after ms':>9} {'raw KB':>8} {'gzip KB':>8} {'gzip ms':>8} {'br KB':>7} {'br ms':>7}")
+    for name, payload, model, exclude_unset in payloads:
+        body = render_after(payload, model, exclude_unset)
+        before = time_ms(lambda: render_before(payload), args.repeat)
+        after = time_ms(lambda: render_after(payload, model, exclude_unset), args.repeat)
+        gzip_ms = time_ms(lambda: gzip.compress(body, compresslevel=gzip_level), args.repeat)
+        gzip_kb = len(gzip.compress(body, compresslevel=gzip_level)) / 1024
+        if brotli is not None:
+            brotli_ms = time_ms(lambda: brotli.compress(body, quality=brotli_quality), args.repeat)
+            brotli_kb = f"{len(brotli.compress(body, quality=brotli_quality)) / 1024:>7.1f}"
+            brotli_ms = f"{brotli_ms:>7.2f}"
+        else:
+            brotli_kb = brotli_ms = f"{'-':>7}"
+        print(
+            f"{name:<24} {before:>10.2f} {after:>9.2f} {len(body) / 1024:>8.1f} "
+            f"{gzip_kb:>8.1f} {gzip_ms:>8.2f} {brotli_kb} {brotli_ms}"
+        )
+
+
+if __name__ == "__main__":
+    main()
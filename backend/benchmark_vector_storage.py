@@ -0,0 +1,191 @@
+"""
+Benchmark Qdrant storage settings for the /query/ retrieval path: recall@k
+against exact float32 search, search latency percentiles and vector memory.
+
+Run a local Qdrant first (docker compose up -d vector-db), then e.g.:
+
+    python benchmark_vector_storage.py --source-collection manuals --limit 20000
+    python benchmark_vector_storage.py --synthetic 20000 --dims 1024
+
+Points (vectors and payloads) are copied from --source-collection on QDRANT_URL,
+or generated as clustered synthetic vectors, into temporary collections on
+--bench-url. Queries are perturbed copies of stored chunks, searched with the
+same company/product filter and k as process_query.
+"""
+
+import argparse
+import os
+import time
+import uuid
+
+import numpy as np
+from dotenv import load_dotenv
+from qdrant_client import QdrantClient
+from qdrant_client.http import models
+
+from vector_storage import VectorStorageSettings, ensure_collection
+
+load_dotenv()
+
+SETTINGS = [
+    VectorStorageSettings(quantization="none", on_disk=False, dimensions=0),
+    VectorStorageSettings(quantization="scalar", rescore=True, oversampling=2.0, on_disk=False, dimensions=0),
+    VectorStorageSettings(quantization="scalar", rescore=False, oversampling=1.0, on_disk=False, dimensions=0),
+    VectorStorageSettings(quantization="scalar", rescore=True, oversampling=2.0, on_disk=True, dimensions=0),
+    VectorStorageSettings(quantization="binary", rescore=True, oversampling=3.0, on_disk=True, dimensions=0),
+    VectorStorageSettings(quantization="none", on_disk=False, dimensions=512),
+    VectorStorageSettings(quantization="scalar", rescore=True, oversampling=2.0, on_disk=True, dimensions=512),
+]
+
+
+def load_source_points(url: str, api_key: str, collection: str, limit: int):
+    client = QdrantClient(url=url, api_key=api_key)
+    vectors, payloads, offset = [], [], None
+    while len(vectors) < limit:
+        points, offset = client.scroll(
+            collection_name=collection,
+            limit=min(256, limit - len(vectors)),
+            offset=offset,
+            with_vectors=True,
+            with_payload=True,
+        )
+        for point in points:
+            vectors.append(point.vector)
+            payloads.append(point.payload)
+        if offset is None:
+            break
+    return np.asarray(vectors, dtype=np.float32), payloads
+
+
+def synthetic_points(count: int, dims: int, products: int, seed: int = 7):
+    """Clustered unit vectors, one cluster per product, so filtered search is realistic"""
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(products, dims)).astype(np.float32)
+    labels = rng.integers(0, products, size=count)
+    vectors = centers[labels] + rng.normal(scale=0.6, size=(count, dims)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    payloads = [
+        {"page_content": "", "metadata": {"company_name": f"company_{p % 10}", "product_name": f"product_{p}"}}
+        for p in labels
+    ]
+    return vectors, payloads
+
+
+def product_filter(payload: dict) -> models.Filter:
+    metadata = payload.get("metadata", {})
+    return models.Filter(must=[
+        models.FieldCondition(key="metadata.company_name", match=models.MatchValue(value=metadata.get("company_name"))),
+        models.FieldCondition(key="metadata.product_name", match=models.MatchValue(value=metadata.get("product_name"))),
+    ])
+
+
+def build_queries(vectors: np.ndarray, payloads: list, count: int, noise: float, seed: int = 11):
+    rng = np.random.default_rng(seed)
+    picks = rng.choice(len(vectors), size=min(count, len(vectors)), replace=False)
+    queries = vectors[picks] + rng.normal(scale=noise, size=(len(picks), vectors.shape[1])).astype(np.float32)
+    queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+    return queries, [product_filter(payloads[i]) for i in picks]
+
+
+def upload(client: QdrantClient, name: str, vectors: np.ndarray, payloads: list, settings: VectorStorageSettings):
+    ensure_collection(client, name, len(settings.truncate(vectors[0].tolist())), settings)
+    for start in range(0, len(vectors), 256):
+        client.upsert(
+            collection_name=name,
+            points=[
+                models.PointStruct(id=start + i, vector=settings.truncate(vector.tolist()), payload=payloads[start + i])
+                for i, vector in enumerate(vectors[start:start + 256])
+            ],
+            wait=True,
+        )
+    # Wait for the optimizer so HNSW and quantized segments are in place
+    while client.get_collection(name).status != models.CollectionStatus.GREEN:
+        time.sleep(0.5)
+
+
+def search(client, name, queries, filters, k, settings, exact=False):
+    results, latencies = [], []
+    params = models.SearchParams(exact=True) if exact else settings.search_params()
+    for query, query_filter in zip(queries, filters):
+        started = time.perf_counter()
+        points = client.query_points(
+            collection_name=name,
+            query=settings.truncate(query.tolist()),
+            query_filter=query_filter,
+            limit=k,
+            search_params=params,
+        ).points
+        latencies.append(time.perf_counter() - started)
+        results.append([p.id for p in points])
+    return results, np.asarray(latencies) * 1000
+
+
+def recall_at_k(results, truth) -> float:
+    hits = [len(set(r) & set(t)) / len(t) for r, t in zip(results, truth) if t]
+    return float(np.mean(hits)) if hits else 0.0
+
+
+def vector_memory_mb(count: int, dims: int, settings: VectorStorageSettings) -> float:
+    """RAM for vectors only: float32 originals unless on disk, plus quantized copies"""
+    original = 0 if settings.on_disk else count * dims * 4
+    quantized = {"scalar": count * dims, "binary": count * dims / 8}.get(settings.quantization, 0)
+    return (original + quantized) / 2 ** 20
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--bench-url", default="http://localhost:6333")
+    parser.add_argument("--source-collection", default=None)
+    parser.add_argument("--limit", type=int, default=20000, help="points copied from the source collection")
+    parser.add_argument("--synthetic", type=int, default=20000, help="synthetic points when no source is given")
+    parser.add_argument("--dims", type=int, default=1024)
+    parser.add_argument("--products", type=int, default=40)
+    parser.add_argument("--queries", type=int, default=300)
+    parser.add_argument("--noise", type=float, default=0.02)
+    parser.add_argument("-k", type=int, default=15, help="process_query retrieves k=15 before reranking")
+    parser.add_argument("--keep", action="store_true", help="keep the benchmark collections")
+    args = parser.parse_args()
+
+    if args.source_collection:
+        vectors, payloads = load_source_points(
+            os.getenv("QDRANT_URL"), os.getenv("QDRANT_API_KEY"), args.source_collection, args.limit
+        )
+    else:
+        vectors, payloads = synthetic_points(args.synthetic, args.dims, args.products)
+    queries, filters = build_queries(vectors, payloads, args.queries, args.noise)
+    print(f"{len(vectors)} points, {vectors.shape[1]} dimensions, {len(queries)} queries, k={args.k}\n")
+
+    client = QdrantClient(url=args.bench_url)
+    prefix = f"bench_{uuid.uuid4().hex[:8]}"
+    baseline = SETTINGS[0]
+    created = []
+    try:
+        truth_name = f"{prefix}_truth"
+        upload(client, truth_name, vectors, payloads, baseline)
+        created.append(truth_name)
+        truth, _ = search(client, truth_name, queries, filters, args.k, baseline, exact=True)
+
+        print(f"{'settings':<36} {'recall@k':>9} {'p50 ms':>8} {'p95 ms':>8} {'vector MB':>10}")
+        for i, settings in enumerate(SETTINGS):
+            if settings.dimensions and settings.dimensions >= vectors.shape[1]:
+                continue
+            name = f"{prefix}_{i}"
+            upload(client, name, vectors, payloads, settings)
+            created.append(name)
+            # Warm up caches before timing
+            search(client, name, queries[:20], filters[:20], args.k, settings)
+            results, latencies = search(client, name, queries, filters, args.k, settings)
+            dims = settings.dimensions or vectors.shape[1]
+            print(
+                f"{settings.describe():<36} {recall_at_k(results, truth):>9.3f} "
+                f"{np.percentile(latencies, 50):>8.2f} {np.percentile(latencies, 95):>8.2f} "
+                f"{vector_memory_mb(len(vectors), dims, settings):>10.1f}"
+            )
+    finally:
+        if not args.keep:
+            for name in created:
+                client.delete_collection(name)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,190 @@
+"""
+Offline bulk ingestion of a catalog directory or manifest, reusing the upload
+pipeline from main.py (Cloudinary, QR, parse/chunk/embed, MongoDB, Qdrant).
+
+    python bulk_ingest.py ./catalog/acme --company acme --workers 4
+    python bulk_ingest.py manifest.csv --workers 4 --embed-concurrency 16
+
+Directory mode: every PDF below the directory is a manual of --company; its
+product is the name of the folder containing it, or the file name for PDFs at
+the top level. Manifest mode: a .csv with a header or a .jsonl file with
+path, company_name, product_name and optional product_code per file (paths
+relative to the manifest).
+
+Progress is appended to a checkpoint file after every manual, so an
+interrupted run resumes where it stopped. Failed files are retried on the
+next run; a manual the interrupted run inserted but never finished indexing
+is re-ingested once it has been pending for --stale-after seconds.
+"""
+
+import argparse
+import asyncio
+import csv
+import hashlib
+import json
+import os
+import sys
+import time
+from pathlib import Path
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("source", help="catalog directory, or a .csv/.jsonl manifest")
+    parser.add_argument("--company", help="company_name for directory mode")
+    parser.add_argument("--workers", type=int, default=4, help="manuals processed concurrently")
+    parser.add_argument("--embed-concurrency", type=int, default=None, help="concurrent NIM embedding requests")
+    parser.add_argument(
+        "--nim-share", type=float, default=0.5,
+        help="fraction of the NIM rate limits this run may use next to the API (default 0.5)"
+    )
+    parser.add_argument("--checkpoint", default=None, help="checkpoint file (default: <source>.checkpoint.jsonl)")
+    parser.add_argument("--retag", action="store_true", help="move duplicates under the manifest's company/product")
+    parser.add_argument(
+        "--stale-after", type=float, default=None,
+        help="re-ingest manuals left pending this many seconds by an interrupted run (default INGEST_STALE_SECONDS)"
+    )
+    args = parser.parse_args()
+    if Path(args.source).is_dir() and not args.company:
+        parser.error("--company is required when source is a directory")
+    return args
+
+
+def load_manifest(source: Path, company: str | None) -> list[dict]:
+    if source.is_dir():
+        entries = []
+        for path in sorted(source.rglob("*.pdf")):
+            product = path.parent.name if path.parent != source else path.stem
+            entries.append({"path": path, "company_name": company, "product_name": product, "product_code": None})
+        return entries
+    if source.suffix == ".jsonl":
+        rows = [json.loads(line) for line in source.read_text().splitlines() if line.strip()]
+    else:
+        with source.open(newline="") as f:
+            rows = list(csv.DictReader(f))
+    return [
+        {
+            "path": (source.parent / row["path"]).resolve(),
+            "company_name": row.get("company_name") or company,
+            "product_name": row.get("product_name") or row.get("product_code"),
+            "product_code": row.get("product_code") or None,
+        }
+        for row in rows
+    ]
+
+
+def load_checkpoint(path: Path) -> dict:
+    """Latest record per file path; success and duplicate mean done"""
+    done = {}
+    if path.exists():
+        for line in path.read_text().splitlines():
+            if line.strip():
+                record = json.loads(line)
+                done[record["path"]] = record
+    return done
+
+
+def hash_file(path: Path) -> str:
+    digest = hashlib.sha256()
+    with path.open("rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+async def run(args):
+    import main
+
+    source = Path(args.source).resolve()
+    checkpoint_path = Path(args.checkpoint or f"{source}.checkpoint.jsonl")
+    entries = load_manifest(source, args.company)
+    done = load_checkpoint(checkpoint_path)
+    pending = [e for e in entries if done.get(str(e["path"]), {}).get("status") not in ("success", "duplicate")]
+    print(f"{len(entries)} manuals, {len(entries) - len(pending)} already done, {len(pending)} to ingest")
+
+    totals = {"success": 0, "duplicate": 0, "error": 0, "pages": 0, "chunks": 0}
+    qr_tasks = {}
+    checkpoint_lock = asyncio.Lock()
+    semaphore = asyncio.Semaphore(args.workers)
+    started = time.perf_counter()
+
+    async def record(entry: dict, **fields):
+        line = json.dumps({"path": str(entry["path"]), **fields})
+        async with checkpoint_lock:
+            with checkpoint_path.open("a") as f:
+                f.write(line + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+
+    async def ingest(entry: dict):
+        path, company_name, product_name = entry["path"], entry["company_name"], entry["product_name"]
+        product_code = entry["product_code"]
+        async with semaphore:
+            file_started = time.perf_counter()
+            try:
+                content_hash = await asyncio.to_thread(hash_file, path)
+                existing = await asyncio.to_thread(main.find_manual_by_hash, content_hash)
+                if existing is not None:
+                    db_record = await asyncio.to_thread(
+                        main.link_duplicate_manual, existing, company_name, product_name, product_code, args.retag
+                    )
+                    totals["duplicate"] += 1
+                    await record(entry, status="duplicate", db_id=db_record["_id"], content_hash=content_hash)
+                    print(f"= {path.name}: duplicate of {db_record['_id']}")
+                    return
+
+                # Manuals of one product share a single QR upload
+                qr_key = (company_name, product_name)
+                if qr_key not in qr_tasks:
+                    qr_tasks[qr_key] = asyncio.ensure_future(asyncio.to_thread(
+                        main.generate_and_upload_qr, company_name, product_name, product_code
+                    ))
+                ingested = await main.ingest_pdf_file(
+                    path, path.name, company_name, product_name, product_code,
+                    content_hash=content_hash,
+                    qr_task=qr_tasks[qr_key]
+                )
+                indexing = await main.store_ingested_chunks(ingested)
+                split_docs = ingested["split_docs"]
+                pages = split_docs[0].metadata.get("total_pages", 0) if split_docs else 0
+                totals["success"] += 1
+                totals["pages"] += pages
+                totals["chunks"] += len(split_docs)
+                await record(
+                    entry, status="success", db_id=ingested["inserted_id"], content_hash=content_hash,
+                    pages=pages, chunks=len(split_docs), indexing=indexing["status"]
+                )
+                print(
+                    f"+ {path.name}: {pages} pages, {len(split_docs)} chunks, "
+                    f"{indexing['status']} in {time.perf_counter() - file_started:.1f}s"
+                )
+            except Exception as e:
+                totals["error"] += 1
+                detail = getattr(e, "detail", None) or str(e)
+                await record(entry, status="error", error=detail)
+                print(f"! {path.name}: {detail}", file=sys.stderr)
+
+    await asyncio.gather(*(ingest(entry) for entry in pending))
+
+    elapsed = time.perf_counter() - started
+    print(
+        f"\n{totals['success']} ingested, {totals['duplicate']} duplicates, {totals['error']} failed "
+        f"in {elapsed:.1f}s"
+    )
+    if elapsed > 0:
+        print(
+            f"{totals['pages']} pages ({totals['pages'] / elapsed:.1f} pages/s), "
+            f"{totals['chunks']} chunks ({totals['chunks'] / elapsed:.1f} chunks/s)"
+        )
+    return 1 if totals["error"] else 0
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    # Read by the NIM limiter when main is imported
+    if args.embed_concurrency:
+        os.environ["NIM_EMBED_CONCURRENCY"] = str(args.embed_concurrency)
+    os.environ["NIM_LIMITER_SHARE"] = str(args.nim_share)
+    if args.stale_after is not None:
+        os.environ["INGEST_STALE_SECONDS"] = str(args.stale_after)
+    sys.exit(asyncio.run(run(args)))
@@ -0,0 +1,120 @@
+"""
+In-memory cache for the company/product catalog served by the /companies/ endpoints
+"""
+
+import asyncio
+import hashlib
+import json
+import threading
+import time
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from metrics import record_cache
+
+
+class CatalogCache:
+    """Caches catalog payloads together with an ETag until the catalog changes"""
+
+    GENERATION_KEY = "catalog_generation"
+
+    def __init__(self, generation_check_seconds: float = 1.0):
+        self._lock = threading.Lock()
+        self._entries: Dict[str, Tuple[Any, str]] = {}
+        self._version = 0
+        self._shared_store = None
+        self._shared_generation = None
+        self._generation_checked_at = 0.0
+        self.generation_check_seconds = generation_check_seconds
+        self._refresh_tasks: set = set()
+
+    def bind_shared_store(self, store):
+        """
+        Share invalidations across workers through a state store generation
+        counter, polled at most once per generation_check_seconds
+        """
+        self._shared_store = store
+
+    def _sync_shared_generation(self):
+        if self._shared_store is None:
+            return
+        now = time.monotonic()
+        if now - self._generation_checked_at < self.generation_check_seconds:
+            return
+        self._generation_checked_at = now
+        try:
+            # The store read is blocking I/O: apply it off the event loop, for later requests
+            task = asyncio.get_running_loop().create_task(asyncio.to_thread(self._refresh_generation))
+            self._refresh_tasks.add(task)
+            task.add_done_callback(self._refresh_tasks.discard)
+        except RuntimeError:
+            # No event loop (scripts): refresh inline
+            self._refresh_generation()
+
+    def _refresh_generation(self):
+        try:
+            generation = self._shared_store.get(self.GENERATION_KEY, 0)
+        except Exception:
+            return
+        if generation != self._shared_generation:
+            with self._lock:
+                self._shared_generation = generation
+                self._version += 1
+                self._entries.clear()
+
+    @staticmethod
+    def compute_etag(payload: Any) -> str:
+        """Build a weak ETag from the JSON representation of a payload"""
+        body = json.dumps(payload, sort_keys=True, default=str).encode("utf-8")
+        return f'W/"{hashlib.sha1(body).hexdigest()}"'
+
+    def get(self, key: str, loader: Callable[[], Any]) -> Tuple[Any, str]:
+        """Return the cached (payload, etag) for key, loading it on a miss"""
+        self._sync_shared_generation()
+        with self._lock:
+            entry = self._entries.get(key)
+            version = self._version
+        record_cache("catalog", entry is not None)
+        if entry is not None:
+            return entry
+
+        payload = loader()
+        entry = (payload, self.compute_etag(payload))
+        with self._lock:
+            # Only keep the result if nothing was invalidated while loading
+            if version == self._version:
+                self._entries[key] = entry
+        return entry
+
+    def invalidate(self, company_name: Optional[str] = None):
+        """Drop cached entries after an upload, delete or QR update"""
+        if self._shared_store is not None:
+            try:
+                generation = time.time_ns()
+                self._shared_store.set(self.GENERATION_KEY, generation)
+                self._shared_generation = generation
+            except Exception:
+                pass
+        with self._lock:
+            self._version += 1
+            if company_name is None:
+                self._entries.clear()
+                return
+            self._entries.pop("companies", None)
+            self._entries.pop(f"models:{company_name}", None)
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Check an If-None-Match header value against an ETag"""
+    if not if_none_match:
+        return False
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    bare = etag[2:] if etag.startswith("W/") else etag
+    for tag in candidates:
+        if tag == "*":
+            return True
+        if (tag[2:] if tag.startswith("W/") else tag) == bare:
+            return True
+    return False
+
+
+catalog_cache = CatalogCache()
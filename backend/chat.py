@@ -1,19 +1,38 @@
+import asyncio
 import logging
+import orjson
 import os
-from fastapi import APIRouter, HTTPException
+import time
+from contextlib import contextmanager
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from qdrant_client.http import models       
 from langchain_openai import OpenAIEmbeddings
 from nvidia_embeddings import NVIDIANIMEmbeddings
-from langchain_qdrant import QdrantVectorStore
 from langchain.memory import ConversationBufferMemory
 from langchain.schema import BaseMessage, HumanMessage, AIMessage
 from dotenv import load_dotenv
 from openai import OpenAI
 from langchain_nvidia_ai_endpoints.reranking import NVIDIARerank
+from metrics import time_query_stage, record_query_stage, record_llm_usage
+from tracing import start_span, set_span_attributes
+from structured_logging import log_event
+from semantic_cache import SemanticAnswerCache
+from hot_vector_cache import HotProductVectorCache
+from singleflight import SingleFlight, run_coalesced
+from nim_limiter import nim_limiter, AdmissionTimeout, PRIORITY_INTERACTIVE
+from vector_storage import get_collection_name, get_qdrant_client, get_vector_store, point_to_document, storage_settings
+from resilience import (
+    CircuitOpenError,
+    EMBED_HEDGE_AFTER_SECONDS,
+    chat_dependency,
+    embed_dependency,
+    qdrant_dependency,
+    rerank_dependency,
+)
 
-# Setup logging
-logging.basicConfig(level=logging.DEBUG)
+# Logging is configured by structured_logging.setup_logging() at app startup
 logger = logging.getLogger(__name__)
 
 # Disable pymongo debug logs
@@ -34,9 +53,12 @@ def get_nvidia_client():
     global client
     if client is None:
         try:
+            # Retries are budgeted by chat_dependency, not by the client
             client = OpenAI(
                 base_url=os.getenv("NVIDIA_BASE_URL"),
-                api_key=os.getenv("NVIDIA_API_KEY")
+                api_key=os.getenv("NVIDIA_API_KEY"),
+                timeout=chat_dependency.timeout_seconds,
+                max_retries=0
             )
             # List available models (non-blocking)
             try:
@@ -73,6 +95,51 @@ def get_nvidia_reranker():
             reranker = None
     return reranker
 
+@contextmanager
+def interactive_slot(endpoint: str, on_admitted=None):
+    """Interactive NIM limiter slot; on_admitted runs once the slot is held"""
+    with nim_limiter.acquire(endpoint, PRIORITY_INTERACTIVE):
+        if on_admitted is not None:
+            on_admitted()
+        yield
+
+def rerank_documents(nvidia_reranker, query: str, documents: list, on_admitted=None) -> list:
+    """Rerank through the reranker's circuit breaker and the shared NIM limiter"""
+    return rerank_dependency.call(
+        nvidia_reranker.compress_documents,
+        query=query,
+        documents=documents,
+        admission=lambda: interactive_slot("rerank", on_admitted)
+    )
+
+async def rerank_with_deadline(nvidia_reranker, query: str, documents: list) -> list:
+    """
+    Rerank on a worker thread, raising TimeoutError once the call has run
+    longer than the reranker's deadline. The deadline starts at admission:
+    queueing in the NIM limiter is bounded by the limiter's own wait budget.
+    """
+    loop = asyncio.get_running_loop()
+    admitted = asyncio.Event()
+    call = asyncio.ensure_future(asyncio.to_thread(
+        rerank_documents, nvidia_reranker, query, documents, lambda: loop.call_soon_threadsafe(admitted.set)
+    ))
+    admission = asyncio.ensure_future(admitted.wait())
+    try:
+        await asyncio.wait({call, admission}, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        admission.cancel()
+    # The thread cannot be interrupted; past the deadline its result is dropped
+    call.add_done_callback(lambda t: t.cancelled() or t.exception())
+    return await asyncio.wait_for(asyncio.shield(call), timeout=rerank_dependency.timeout_seconds)
+
+def create_chat_completion(nvidia_client, **kwargs):
+    """Chat completion through the chat circuit breaker and the shared NIM limiter"""
+    return chat_dependency.call(
+        nvidia_client.chat.completions.create,
+        admission=lambda: interactive_slot("chat"),
+        **kwargs
+    )
+
 def get_available_nvidia_models():
     """Get list of available NVIDIA models for debugging"""
     try:
@@ -95,197 +162,115 @@ conversation_memory = ConversationBufferMemory(
     output_key="output"
 )
 
+# Concurrent identical embedding, search and rerank calls share one upstream request
+embed_flight = SingleFlight("embed")
+search_flight = SingleFlight("search")
+rerank_flight = SingleFlight("rerank")
+
+# Answers to first-turn questions, reused for paraphrases about the same product
+answer_cache = SemanticAnswerCache()
+
+# Chunk vectors of the most queried products, searched in-process
+hot_vectors = HotProductVectorCache()
+
 class QueryRequest(BaseModel):
     query: str
     company_name: str
     product_name: str
     user_id: str | None = "default_user"  # For future multi-user support
 
-@router.get("/health/")
-async def health_check():
-    health_status = {
-        "status": "healthy",
-        "qdrant": "unknown",
-        "nvidia_client": "unknown",
-        "nvidia_model_test": "unknown",
-        "reranker": "unknown"
-    }
-    
-    try:
-        # Test Qdrant connection
-        from qdrant_client import QdrantClient
-        qdrant = QdrantClient(
-            url=os.getenv("QDRANT_URL"),
-            api_key=os.getenv("QDRANT_API_KEY")
-        )
-        qdrant.get_collections()
-        health_status["qdrant"] = "available"
-    except Exception as e:
-        logger.error(f"Qdrant health check failed: {str(e)}")
-        health_status["qdrant"] = f"error: {str(e)}"
-        health_status["status"] = "degraded"
-    
-    try:
-        # Check NVIDIA client initialization
-        nvidia_client = get_nvidia_client()
-        if nvidia_client is None:
-            health_status["nvidia_client"] = "not initialized"
-            health_status["status"] = "degraded"
-        else:
-            health_status["nvidia_client"] = "initialized"
-            
-            # Test model availability (non-blocking)
-            try:
-                nvidia_client.chat.completions.create(
-                    model=os.getenv("NVIDIA_CHAT_MODEL"),
-                    messages=[{"role": "user", "content": "Test"}],
-                    max_tokens=1
-                )
-                health_status["nvidia_model_test"] = "available"
-            except Exception as model_error:
-                logger.warning(f"NVIDIA model test failed: {model_error}")
-                health_status["nvidia_model_test"] = f"error: {str(model_error)}"
-                health_status["status"] = "degraded"
-    except Exception as e:
-        logger.error(f"NVIDIA client health check failed: {str(e)}")
-        health_status["nvidia_client"] = f"error: {str(e)}"
-        health_status["status"] = "degraded"
-    
-    try:
-        # Test NVIDIA reranker
-        nvidia_reranker = get_nvidia_reranker()
-        if nvidia_reranker is None:
-            health_status["reranker"] = "not available"
-        else:
-            health_status["reranker"] = "available"
-    except Exception as e:
-        logger.warning(f"Reranker health check failed: {str(e)}")
-        health_status["reranker"] = f"error: {str(e)}"
-    
-    # Return 200 even if degraded, so monitoring can see the status
-    return health_status
+class QueryResponse(BaseModel):
+    response: str
+    cached: bool
 
-@router.post("/query/")
-async def process_query(request: QueryRequest):
-    try:
-        query = request.query
-        company_name = request.company_name
-        product_name = request.product_name
-        user_id = request.user_id or "default_user"
-        
-        # Debug logging for received parameters
-        logger.info(f"\n\n\n\n\n\n\n\n\n\n=== RECEIVED PARAMETERS ===\n\n\n\n\n\n\n\n\n")
-        logger.info(f"query: '{query}'")
-        logger.info(f"company_name: '{company_name}' (type: {type(company_name)})")
-        logger.info(f"product_name: '{product_name}' (type: {type(product_name)})")
-        logger.info(f"user_id: '{user_id}'")
-        logger.info(f"==========================")
+# -----------------------------
+# Health probes, run in the background by health_monitor
+# -----------------------------
+def probe_qdrant():
+    """Check Qdrant is reachable through the shared client"""
+    get_qdrant_client().get_collections()
 
-        # Embedding
-        embedding_model = NVIDIANIMEmbeddings()
+def probe_nvidia():
+    """Check the NIM endpoint answers, using the free model listing instead of a billed completion"""
+    nvidia_client = get_nvidia_client()
+    if nvidia_client is None:
+        raise RuntimeError("NVIDIA NIM client not initialized")
+    nvidia_client.models.list()
 
-        # Connect to Qdrant
-        try:
-            vector_db = QdrantVectorStore.from_existing_collection(
-                url=os.getenv("QDRANT_URL"),
-                api_key=os.getenv("QDRANT_API_KEY"),
-                collection_name=os.getenv("QDRANT_COLLECTION_NAME"),
-                embedding=embedding_model
+def probe_reranker():
+    """Check the reranker is configured"""
+    if get_nvidia_reranker() is None:
+        raise RuntimeError("NVIDIA reranker not available")
+
+def product_filter(company_name: str, product_name: str) -> models.Filter:
+    """Strict filter on both company_name and product_name"""
+    return models.Filter(
+        must=[
+            models.FieldCondition(
+                key="metadata.company_name",
+                match=models.MatchValue(value=company_name)
+            ),
+            models.FieldCondition(
+                key="metadata.product_name",
+                match=models.MatchValue(value=product_name)
             )
-        except Exception as e:
-            logger.error(f"Failed to connect to Qdrant collection: {str(e)}", exc_info=True)
-            raise HTTPException(status_code=400, detail=f"{str(e)} Vector database not available. Please ensure Qdrant is running and documents are uploaded.")
+        ]
+    )
 
-        # -----------------------------
-        # ✅ Strict Metadata filtering - Both company_name and product_code required
-        # -----------------------------
-        
-        # Check if both company_name and product_name are provided and not empty
-        if not company_name or not product_name or company_name.strip() == "" or product_name.strip() == "":
-            logger.warning(f"Missing or empty required parameters: company_name='{company_name}', product_name='{product_name}'")
-            raise HTTPException(status_code=400, detail="Both company_name and product_name are required to search for context.")
-        
-        logger.info(f"\n\n\n\n\n\n\n\n\n\ncompany_name: {company_name}, product_name: {product_name}\n\n\n\n\n\n\n\n\n\n")
-        
-        # Create strict filter requiring both company_name and product_name
-        qdrant_filter = models.Filter(
-            must=[
-                models.FieldCondition(
-                    key="metadata.company_name",
-                    match=models.MatchValue(value=company_name)
-                ),
-                models.FieldCondition(
-                    key="metadata.product_name",
-                    match=models.MatchValue(value=product_name)
-                )
-            ]
-        )
-        
-        # Debug logging for filter
-        logger.info(f"Using filter: company_name='{company_name}', product_name='{product_name}'")
-        logger.info(f"Filter object: {qdrant_filter}")
-        
-        # Perform search with strict filter - get more results for reranking
-        search_result = vector_db.similarity_search(query=query, k=15, filter=qdrant_filter)
-        
-        # Debug logging
-        logger.info(f"Initial search result count: {len(search_result) if search_result else 0}")
-        if search_result:
-            logger.info(f"First result metadata: {search_result[0].metadata}")
-            logger.info(f"First result company: {search_result[0].metadata.get('company_name')}")
-            logger.info(f"First result product: {search_result[0].metadata.get('product_name')}")
-        
-        # If no results found with strict filter, return "no context found"
-        if not search_result:
-            logger.warning(f"No context found for company_name='{company_name}' and product_name='{product_name}'")
-            raise HTTPException(status_code=400, detail="No context found for the specified company and product combination.")
+async def embed_query(embedding_model, query: str) -> list:
+    """
+    Query embedding through the embed breaker and NIM limiter; identical
+    in-flight queries share one call and slow tails are hedged
+    """
+    return await embed_flight.do(
+        (embedding_model.model, query),
+        lambda: embed_dependency.hedged(EMBED_HEDGE_AFTER_SECONDS, embedding_model.embed_query, query)
+    )
 
-        logger.info(f"Found {len(search_result)} search results before reranking")
-        
-        # Apply NVIDIA reranking for better context
-        try:
-            nvidia_reranker = get_nvidia_reranker()
-            if nvidia_reranker is not None:
-                logger.info("🔄 Applying NVIDIA reranking to improve context relevance...")
-                reranked_chunks = nvidia_reranker.compress_documents(
-                    query=query,
-                    documents=search_result
-                )
-                # Take top 8 reranked results
-                search_result = reranked_chunks[:8]
-                logger.info(f"✅ Reranking completed. Using top {len(search_result)} most relevant chunks")
-            else:
-                logger.warning("⚠️ NVIDIA reranker not available, using original search results")
-        except Exception as rerank_error:
-            logger.error(f"❌ Reranking failed: {rerank_error}")
-            logger.info("🔄 Continuing with original search results")
-        
-        logger.info(f"Final result count: {len(search_result)}")
-        logger.debug(f"Final search result: {search_result}")
-
-        # Format context (include metadata for debugging)
-        context = "\n\n\n".join([
-            f"page_content: {result.page_content}\n"
-            f"page_label: {result.metadata.get('page_label')}\n"
-            f"company_name: {result.metadata.get('company_name')}\n"
-            f"product_name: {result.metadata.get('product_name')}\n"
-            f"source: {result.metadata.get('source')}\n"
-            f"total_pages: {result.metadata.get('total_pages')}\n"
-            f"page: {result.metadata.get('page')}"
-            for result in search_result
-        ])
-        
-        logger.info(f"Context length: {len(context)} characters")
-        
-        # Collect unique PDF URLs from search results
-        pdf_urls = set()
-        for result in search_result:
-            source = result.metadata.get('source')
-            if source:
-                pdf_urls.add(source)
-        
-        # Enhanced System prompt for human-like expert guidance
-        SYSTEM_PROMPT = f"""
+async def search_by_vector(vector_db, query_embedding: list, k: int, qdrant_filter=None) -> list:
+    """Vector search through the Qdrant breaker, off the event loop"""
+    return await asyncio.to_thread(
+        qdrant_dependency.call, vector_db.similarity_search_by_vector,
+        embedding=query_embedding, k=k, filter=qdrant_filter,
+        search_params=storage_settings.search_params()
+    )
+
+async def rerank_results(query: str, search_result: list) -> list:
+    """Top 8 chunks after NVIDIA reranking; the original results if the reranker is unavailable or fails"""
+    try:
+        nvidia_reranker = get_nvidia_reranker()
+        if nvidia_reranker is None:
+            log_event(logger, logging.WARNING, "query.rerank_unavailable", "NVIDIA reranker not available, using original search results")
+            return search_result
+        with time_query_stage("rerank"), start_span("nvidia.rerank", input_count=len(search_result)):
+            rerank_key = (query, tuple(d.metadata.get("_id", d.page_content) for d in search_result))
+            # Past the deadline, answer from the unreranked results
+            reranked_chunks = list(await rerank_flight.do(
+                rerank_key, lambda: rerank_with_deadline(nvidia_reranker, query, search_result)
+            ))
+            set_span_attributes(output_count=len(reranked_chunks))
+        log_event(logger, logging.DEBUG, "query.rerank", "Reranking kept %d chunks", min(len(reranked_chunks), 8))
+        return reranked_chunks[:8]
+    except Exception as rerank_error:
+        logger.error("Reranking failed, continuing with original search results: %s", rerank_error)
+        return search_result
+
+def format_context(search_result: list) -> str:
+    """Format retrieved chunks for the system prompt (include metadata for debugging)"""
+    return "\n\n\n".join([
+        f"page_content: {result.page_content}\n"
+        f"page_label: {result.metadata.get('page_label')}\n"
+        f"company_name: {result.metadata.get('company_name')}\n"
+        f"product_name: {result.metadata.get('product_name')}\n"
+        f"source: {result.metadata.get('source')}\n"
+        f"total_pages: {result.metadata.get('total_pages')}\n"
+        f"page: {result.metadata.get('page')}"
+        for result in search_result
+    ])
+
+def build_system_prompt(context: str) -> str:
+    """Enhanced system prompt for human-like expert guidance"""
+    return f"""
         You are an experienced technical expert and guide who specializes in equipment manuals, troubleshooting, and maintenance. Your role is to provide helpful, human-like guidance based on the technical documentation provided.
 
         ## Your Expertise & Approach:
@@ -358,11 +343,113 @@ async def process_query(request: QueryRequest):
         {context}
         """
 
+def add_reference_documents(ai_response: str, search_result: list) -> str:
+    """Append the unique PDF URLs of the retrieved chunks as a Reference Documents section"""
+    pdf_urls = set()
+    for result in search_result:
+        source = result.metadata.get('source')
+        if source:
+            pdf_urls.add(source)
+    if not pdf_urls or "## Reference Documents" in ai_response:
+        return ai_response
+    pdf_links_section = "\n\n## Reference Documents\n"
+    for pdf_url in pdf_urls:
+        # Extract filename from URL for display
+        filename = pdf_url.split('/')[-1] if '/' in pdf_url else pdf_url
+        pdf_links_section += f"[{filename}]({pdf_url})\n\n"
+    return ai_response + pdf_links_section
+
+@router.post("/query/", response_model=QueryResponse)
+async def process_query(request: QueryRequest):
+    try:
+        query = request.query
+        company_name = request.company_name
+        product_name = request.product_name
+        user_id = request.user_id or "default_user"
+        
+        log_event(
+            logger, logging.INFO, "query.received", "Query received",
+            company_name=company_name, product_name=product_name, user_id=user_id, query_length=len(query)
+        )
+        log_event(logger, logging.DEBUG, "query.text", "Query text: %s", query)
+
+        # Embedding
+        embedding_model = NVIDIANIMEmbeddings()
+
+        # -----------------------------
+        # ✅ Strict Metadata filtering - Both company_name and product_code required
+        # -----------------------------
+        
+        # Check if both company_name and product_name are provided and not empty
+        if not company_name or not product_name or company_name.strip() == "" or product_name.strip() == "":
+            logger.warning("Missing or empty required parameters: company_name=%r, product_name=%r", company_name, product_name)
+            raise HTTPException(status_code=400, detail="Both company_name and product_name are required to search for context.")
+        
+        # Create strict filter requiring both company_name and product_name
+        qdrant_filter = product_filter(company_name, product_name)
+        log_event(logger, logging.DEBUG, "query.filter", "Filter object: %s", qdrant_filter)
+        
+        # Embed the query and search with strict filter - get more results for reranking
+        # Slow-tail query embeddings are hedged with one duplicate request
+        with time_query_stage("embed"):
+            query_embedding = await embed_query(embedding_model, query)
+
+        # Only first-turn questions are cacheable; later turns depend on the history
+        is_first_turn = not conversation_memory.chat_memory.messages
+        if is_first_turn:
+            cached_answer = answer_cache.lookup(company_name, product_name, query_embedding)
+            if cached_answer is not None:
+                conversation_memory.chat_memory.add_user_message(query)
+                conversation_memory.chat_memory.add_ai_message(cached_answer)
+                log_event(logger, logging.INFO, "query.cache_hit", "Answered from semantic cache")
+                return {"response": cached_answer, "cached": True}
+        # Hot products are searched in-process; everything else goes to Qdrant
+        search_started = time.perf_counter()
+        search_result = hot_vectors.search(company_name, product_name, query_embedding, 15)
+        if search_result is not None:
+            record_query_stage("search_local", time.perf_counter() - search_started)
+        else:
+            # Connect to Qdrant
+            try:
+                with time_query_stage("connect"):
+                    vector_db = get_vector_store(embedding_model)
+            except Exception as e:
+                logger.error("Failed to connect to Qdrant collection: %s", e, exc_info=True)
+                raise HTTPException(status_code=400, detail=f"{str(e)} Vector database not available. Please ensure Qdrant is running and documents are uploaded.")
+            with time_query_stage("search"), start_span(
+                "qdrant.similarity_search", k=15, company_name=company_name, product_name=product_name
+            ):
+                search_result = list(await run_coalesced(
+                    search_flight, (company_name, product_name, 15, query),
+                    qdrant_dependency.call, vector_db.similarity_search_by_vector,
+                    embedding=query_embedding, k=15, filter=qdrant_filter,
+                    search_params=storage_settings.search_params()
+                ))
+                set_span_attributes(result_count=len(search_result))
+        
+        log_event(logger, logging.INFO, "query.search", "Search returned %d results", len(search_result))
+        if search_result:
+            log_event(logger, logging.DEBUG, "query.first_result", "First result metadata: %s", search_result[0].metadata)
+        
+        # If no results found with strict filter, return "no context found"
+        if not search_result:
+            logger.warning("No context found for company_name=%r and product_name=%r", company_name, product_name)
+            raise HTTPException(status_code=400, detail="No context found for the specified company and product combination.")
+        
+        # Apply NVIDIA reranking for better context
+        search_result = await rerank_results(query, search_result)
+        
+        log_event(logger, logging.DEBUG, "query.final_results", "Final search result: %s", search_result)
+
+        context = format_context(search_result)
+        log_event(logger, logging.DEBUG, "query.context", "Context length: %d characters", len(context))
+        system_prompt = build_system_prompt(context)
+
         # Get conversation history from memory
         chat_history = conversation_memory.chat_memory.messages
         
         # Prepare messages for LLM including conversation history
-        messages = [{"role": "system", "content": SYSTEM_PROMPT}]
+        messages = [{"role": "system", "content": system_prompt}]
         
         # Add conversation history
         for message in chat_history:
@@ -374,7 +461,7 @@ async def process_query(request: QueryRequest):
         # Add current user query
         messages.append({"role": "user", "content": query})
         
-        logger.info(f"Total messages in conversation: {len(messages)}")
+        log_event(logger, logging.DEBUG, "query.messages", "Total messages in conversation: %d", len(messages))
         
         # Get response from NVIDIA NIM
         nvidia_client = get_nvidia_client()
@@ -386,16 +473,29 @@ async def process_query(request: QueryRequest):
             raise HTTPException(status_code=500, detail="NVIDIA_CHAT_MODEL environment variable not set")
         
         try:
-            response = nvidia_client.chat.completions.create(
-                model=nvidia_model,
-                messages=messages,
-                temperature=0.8,
-                top_p=1,
-                max_tokens=1024
-            )
+            with time_query_stage("llm"), start_span(
+                "nvidia.chat.completions", model=nvidia_model, message_count=len(messages)
+            ):
+                response = await asyncio.to_thread(
+                    create_chat_completion,
+                    nvidia_client,
+                    model=nvidia_model,
+                    messages=messages,
+                    temperature=0.8,
+                    top_p=1,
+                    max_tokens=1024
+                )
+                usage = getattr(response, "usage", None)
+                set_span_attributes(
+                    prompt_tokens=getattr(usage, "prompt_tokens", None),
+                    completion_tokens=getattr(usage, "completion_tokens", None)
+                )
+            record_llm_usage(usage)
+        except (AdmissionTimeout, CircuitOpenError) as unavailable_error:
+            raise HTTPException(status_code=503, detail=str(unavailable_error))
         except Exception as api_error:
             error_msg = str(api_error)
-            logger.error(f"NVIDIA API error: {error_msg}", exc_info=True)
+            logger.error("NVIDIA API error: %s", error_msg, exc_info=True)
             
             # Check for specific error types
             if "404" in error_msg or "Not Found" in error_msg:
@@ -431,29 +531,262 @@ async def process_query(request: QueryRequest):
         # Get the AI response
         ai_response = response.choices[0].message.content
         
-        # Append PDF URLs at the end if they exist and AI hasn't already added them
-        if pdf_urls and "## Reference Documents" not in ai_response:
-            pdf_links_section = "\n\n## Reference Documents\n"
-            for pdf_url in pdf_urls:
-                # Extract filename from URL for display
-                filename = pdf_url.split('/')[-1] if '/' in pdf_url else pdf_url
-                pdf_links_section += f"[{filename}]({pdf_url})\n\n"
-            
-            ai_response += pdf_links_section
+        # Append PDF URLs at the end if the AI hasn't already added them
+        ai_response = add_reference_documents(ai_response, search_result)
+
+        if is_first_turn:
+            answer_cache.store(company_name, product_name, query_embedding, ai_response)
 
         # Save conversation to memory
         conversation_memory.chat_memory.add_user_message(query)
         conversation_memory.chat_memory.add_ai_message(ai_response)
         
-        logger.info(f"Conversation saved to memory. Total messages: {len(conversation_memory.chat_memory.messages)}")
+        log_event(
+            logger, logging.INFO, "query.completed", "Query answered",
+            history_messages=len(conversation_memory.chat_memory.messages), response_length=len(ai_response)
+        )
 
-        return {"response": ai_response}
+        return {"response": ai_response, "cached": False}
 
+    except HTTPException:
+        raise
+    except (AdmissionTimeout, CircuitOpenError) as e:
+        logger.warning("Query rejected, dependency unavailable: %s", e)
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
-        logger.error(f"Error processing query: {str(e)}", exc_info=True)
+        logger.error("Error processing query: %s", e, exc_info=True)
         raise HTTPException(status_code=500, detail=str(e))
 
-@router.get("/conversation/clear/")
+# Limits for /query/batch/
+BATCH_QUERY_MAX_ITEMS = int(os.getenv("BATCH_QUERY_MAX_ITEMS", "100"))
+BATCH_QUERY_ANSWER_CONCURRENCY = int(os.getenv("BATCH_QUERY_ANSWER_CONCURRENCY", "4"))
+
+class BatchQueryItem(BaseModel):
+    query: str
+    company_name: str
+    product_name: str
+
+class BatchQueryRequest(BaseModel):
+    items: list[BatchQueryItem]
+    rerank: bool = True
+    generate_answers: bool = False
+
+class ChunkResult(BaseModel):
+    page_content: str
+    page: int | None = None
+    page_label: str | int | None = None
+    source: str | None = None
+    filename: str | None = None
+    db_id: str | None = None
+
+class BatchQueryResult(BaseModel):
+    query: str
+    company_name: str
+    product_name: str
+    chunks: list[ChunkResult]
+    answer: str | None
+    cached: bool
+    error: str | None
+    timings: dict[str, float]
+
+class BatchQueryResponse(BaseModel):
+    results: list[BatchQueryResult]
+    timings: dict[str, float]
+
+def serialize_chunk(document) -> dict:
+    """The parts of a retrieved chunk returned by /query/batch/"""
+    return {
+        "page_content": document.page_content,
+        "page": document.metadata.get("page"),
+        "page_label": document.metadata.get("page_label"),
+        "source": document.metadata.get("source"),
+        "filename": document.metadata.get("filename"),
+        "db_id": document.metadata.get("db_id"),
+    }
+
+def search_batch(query_embeddings: list, filters: list, k: int) -> list[list]:
+    """Run several filtered searches in a single Qdrant round trip"""
+    collection_name = get_collection_name()
+    search_params = storage_settings.search_params()
+    responses = get_qdrant_client().query_batch_points(
+        collection_name=collection_name,
+        requests=[
+            models.QueryRequest(query=embedding, filter=query_filter, limit=k, params=search_params, with_payload=True)
+            for embedding, query_filter in zip(query_embeddings, filters)
+        ],
+    )
+    return [
+        [point_to_document(point.id, point.payload or {}, collection_name) for point in response.points]
+        for response in responses
+    ]
+
+def generate_answer(nvidia_client, nvidia_model: str, query: str, search_result: list) -> str:
+    """Answer one batch item on its own: no conversation history is read or written"""
+    messages = [
+        {"role": "system", "content": build_system_prompt(format_context(search_result))},
+        {"role": "user", "content": query},
+    ]
+    response = create_chat_completion(
+        nvidia_client,
+        model=nvidia_model,
+        messages=messages,
+        temperature=0.8,
+        top_p=1,
+        max_tokens=1024
+    )
+    record_llm_usage(getattr(response, "usage", None))
+    return add_reference_documents(response.choices[0].message.content, search_result)
+
+def elapsed_ms(started: float) -> float:
+    return round((time.perf_counter() - started) * 1000, 1)
+
+@router.post("/query/batch/", response_model=BatchQueryResponse)
+async def process_query_batch(request: BatchQueryRequest):
+    """
+    Retrieve (and optionally answer) many independent questions: one embedding
+    call for all queries, one Qdrant batch search, parallel reranking and
+    concurrent answers. A failing item reports its error without failing the
+    batch.
+    """
+    items = request.items
+    if not items:
+        raise HTTPException(status_code=400, detail="No items provided")
+    if len(items) > BATCH_QUERY_MAX_ITEMS:
+        raise HTTPException(status_code=400, detail=f"At most {BATCH_QUERY_MAX_ITEMS} items per batch")
+    started = time.perf_counter()
+    log_event(
+        logger, logging.INFO, "query.batch_received", "Batch of %d queries received", len(items),
+        rerank=request.rerank, generate_answers=request.generate_answers
+    )
+
+    results = [
+        {
+            "query": item.query,
+            "company_name": item.company_name,
+            "product_name": item.product_name,
+            "chunks": [],
+            "answer": None,
+            "cached": False,
+            "error": None,
+            "timings": {},
+        }
+        for item in items
+    ]
+    valid = []
+    for n, item in enumerate(items):
+        if item.query.strip() and item.company_name.strip() and item.product_name.strip():
+            valid.append(n)
+        else:
+            results[n]["error"] = "query, company_name and product_name are required"
+    if not valid:
+        return {"results": results, "timings": {"total_ms": elapsed_ms(started)}}
+
+    try:
+        embed_started = time.perf_counter()
+        with start_span("nvidia.embed_batch", query_count=len(valid)):
+            embeddings = dict(zip(valid, await asyncio.to_thread(
+                NVIDIANIMEmbeddings().embed_documents, [items[n].query for n in valid]
+            )))
+        embed_ms = elapsed_ms(embed_started)
+        record_query_stage("batch_embed", embed_ms / 1000)
+
+        # Look up cached answers first so only the misses are reranked
+        cached_answers = {}
+        if request.generate_answers:
+            def lookup_cached_answers():
+                for n in valid:
+                    answer = answer_cache.lookup(items[n].company_name, items[n].product_name, embeddings[n])
+                    if answer is not None:
+                        cached_answers[n] = answer
+            await asyncio.to_thread(lookup_cached_answers)
+
+        # Hot products are searched in-process, the rest in one batch request
+        search_started = time.perf_counter()
+        search_results = {}
+        for n in valid:
+            local_result = hot_vectors.search(items[n].company_name, items[n].product_name, embeddings[n], 15)
+            if local_result is not None:
+                search_results[n] = local_result
+        remote = [n for n in valid if n not in search_results]
+        if remote:
+            with start_span("qdrant.query_batch_points", request_count=len(remote)):
+                search_results.update(zip(remote, await asyncio.to_thread(
+                    qdrant_dependency.call, search_batch,
+                    [embeddings[n] for n in remote],
+                    [product_filter(items[n].company_name, items[n].product_name) for n in remote],
+                    15
+                )))
+        search_ms = elapsed_ms(search_started)
+        record_query_stage("batch_search", search_ms / 1000)
+    except (AdmissionTimeout, CircuitOpenError) as e:
+        logger.warning("Batch query rejected, dependency unavailable: %s", e)
+        raise HTTPException(status_code=503, detail=str(e))
+    except Exception as e:
+        logger.error("Error processing batch query: %s", e, exc_info=True)
+        raise HTTPException(status_code=500, detail=str(e))
+
+    nvidia_client = get_nvidia_client() if request.generate_answers else None
+    nvidia_model = os.getenv("NVIDIA_CHAT_MODEL")
+    answer_slots = asyncio.Semaphore(BATCH_QUERY_ANSWER_CONCURRENCY)
+
+    async def finish_item(n: int):
+        item, result = items[n], results[n]
+        search_result = search_results[n]
+        if not search_result:
+            result["error"] = "No context found for the specified company and product combination."
+            return
+        cached_answer = cached_answers.get(n)
+        # Cache hits return their search chunks as is; the answer does not need them
+        if request.rerank and cached_answer is None:
+            rerank_started = time.perf_counter()
+            search_result = await rerank_results(item.query, search_result)
+            result["timings"]["rerank_ms"] = elapsed_ms(rerank_started)
+        result["chunks"] = [serialize_chunk(d) for d in search_result]
+        if cached_answer is not None:
+            result["answer"], result["cached"] = cached_answer, True
+            return
+        if not request.generate_answers:
+            return
+        if nvidia_client is None or not nvidia_model:
+            result["error"] = "NVIDIA NIM client not initialized or NVIDIA_CHAT_MODEL not set"
+            return
+        async with answer_slots:
+            llm_started = time.perf_counter()
+            try:
+                with time_query_stage("llm"), start_span("nvidia.chat.completions", model=nvidia_model, batch=True):
+                    answer = await asyncio.to_thread(generate_answer, nvidia_client, nvidia_model, item.query, search_result)
+            except Exception as answer_error:
+                logger.warning("Batch answer failed for item %d: %s", n, answer_error)
+                result["error"] = str(answer_error)
+                return
+            finally:
+                result["timings"]["llm_ms"] = elapsed_ms(llm_started)
+        # Shared with /query/, which always reranks: answers from unreranked context stay out
+        if request.rerank:
+            answer_cache.store(item.company_name, item.product_name, embeddings[n], answer)
+        result["answer"] = answer
+
+    async def timed_item(n: int):
+        await finish_item(n)
+        results[n]["timings"]["total_ms"] = elapsed_ms(started)
+
+    await asyncio.gather(*(timed_item(n) for n in valid))
+
+    total_ms = elapsed_ms(started)
+    log_event(
+        logger, logging.INFO, "query.batch_completed", "Batch of %d queries answered", len(items),
+        embed_ms=embed_ms, search_ms=search_ms, total_ms=total_ms,
+        errors=sum(1 for r in results if r["error"])
+    )
+    return {
+        "results": results,
+        "timings": {"embed_ms": embed_ms, "search_ms": search_ms, "total_ms": total_ms},
+    }
+
+class MessageResponse(BaseModel):
+    message: str
+
+@router.get("/conversation/clear/", response_model=MessageResponse)
 async def clear_conversation():
     """Clear the conversation memory"""
     try:
@@ -464,27 +797,73 @@ async def clear_conversation():
         logger.error(f"Error clearing conversation memory: {str(e)}", exc_info=True)
         raise HTTPException(status_code=500, detail=str(e))
 
-@router.get("/conversation/history/")
-async def get_conversation_history():
-    """Get the current conversation history"""
+# Page size bound for paginated conversation history
+HISTORY_PAGE_SIZE_MAX = 200
+
+class ConversationMessage(BaseModel):
+    role: str
+    content: str
+
+class ConversationHistoryResponse(BaseModel):
+    total_messages: int
+    conversation: list[ConversationMessage]
+    # Only set on paginated requests
+    next_cursor: int | None = None
+
+def serialize_message(message: BaseMessage) -> dict | None:
+    """Convert a memory message into the role/content shape used by the API"""
+    if isinstance(message, HumanMessage):
+        return {"role": "user", "content": message.content}
+    if isinstance(message, AIMessage):
+        return {"role": "assistant", "content": message.content}
+    return None
+
+@router.get("/conversation/history/", response_model=ConversationHistoryResponse, response_model_exclude_unset=True)
+async def get_conversation_history(
+    cursor: int | None = Query(None, ge=0),
+    limit: int | None = Query(None, ge=1, le=HISTORY_PAGE_SIZE_MAX)
+):
+    """
+    Get the current conversation history. Passing cursor/limit returns a page
+    of messages starting at the cursor position together with next_cursor.
+    """
     try:
         messages = conversation_memory.chat_memory.messages
+        paginated = cursor is not None or limit is not None
+        start = cursor or 0
+        end = start + (limit or HISTORY_PAGE_SIZE_MAX) if paginated else len(messages)
+
         conversation_data = []
-        
-        for message in messages:
-            if isinstance(message, HumanMessage):
-                conversation_data.append({"role": "user", "content": message.content})
-            elif isinstance(message, AIMessage):
-                conversation_data.append({"role": "assistant", "content": message.content})
-        
-        return {
+        for message in messages[start:end]:
+            item = serialize_message(message)
+            if item is not None:
+                conversation_data.append(item)
+
+        result = {
             "total_messages": len(messages),
             "conversation": conversation_data
         }
+        if paginated:
+            result["next_cursor"] = end if end < len(messages) else None
+        return result
     except Exception as e:
         logger.error(f"Error getting conversation history: {str(e)}", exc_info=True)
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.get("/conversation/history/export")
+async def export_conversation_history():
+    """Stream the conversation history as NDJSON, one message per line"""
+    # Snapshot the list so concurrent queries don't shift it mid-stream
+    messages = list(conversation_memory.chat_memory.messages)
+
+    def generate():
+        for message in messages:
+            item = serialize_message(message)
+            if item is not None:
+                yield orjson.dumps(item) + b"\n"
+
+    return StreamingResponse(generate(), media_type="application/x-ndjson")
+
 @router.get("/debug/search/{company_name}/{product_name}")
 async def debug_search(company_name: str, product_name: str, query: str = "test"):
     """Debug endpoint to test search without API processing"""
@@ -498,12 +877,7 @@ async def debug_search(company_name: str, product_name: str, query: str = "test"
         embedding_model = NVIDIANIMEmbeddings()
         
         # Connect to Qdrant
-        vector_db = QdrantVectorStore.from_existing_collection(
-            url=os.getenv("QDRANT_URL"),
-            api_key=os.getenv("QDRANT_API_KEY"),
-            collection_name=os.getenv("QDRANT_COLLECTION_NAME"),
-            embedding=embedding_model
-        )
+        vector_db = get_vector_store(embedding_model)
         
         # Create strict filter
         qdrant_filter = models.Filter(
@@ -522,25 +896,14 @@ async def debug_search(company_name: str, product_name: str, query: str = "test"
         logger.info(f"Filter: {qdrant_filter}")
         
         # Perform search - get more results for reranking
-        search_result = vector_db.similarity_search(query=query, k=15, filter=qdrant_filter)
+        query_embedding = await embed_query(embedding_model, query)
+        search_result = await search_by_vector(vector_db, query_embedding, 15, qdrant_filter)
         
         logger.info(f"Initial search result count: {len(search_result) if search_result else 0}")
         
-        # Apply reranking if available
-        try:
-            nvidia_reranker = get_nvidia_reranker()
-            if nvidia_reranker is not None:
-                logger.info("🔄 Applying NVIDIA reranking for debug...")
-                reranked_chunks = nvidia_reranker.compress_documents(
-                    query=query,
-                    documents=search_result
-                )
-                search_result = reranked_chunks[:8]  # Take top 8
-                logger.info(f"✅ Reranking completed. Using top {len(search_result)} results")
-            else:
-                logger.warning("⚠️ NVIDIA reranker not available for debug")
-        except Exception as rerank_error:
-            logger.error(f"❌ Reranking failed in debug: {rerank_error}")
+        # Apply reranking the way /query/ does; falls back to the search results
+        if search_result:
+            search_result = await rerank_results(query, search_result)
         
         logger.info(f"Final search result count: {len(search_result) if search_result else 0}")
         
@@ -566,7 +929,7 @@ async def debug_search(company_name: str, product_name: str, query: str = "test"
         else:
             # Let's also try without filter to see what's available
             logger.info("No results with filter, checking what's available...")
-            all_results = vector_db.similarity_search(query=query, k=20)
+            all_results = await search_by_vector(vector_db, query_embedding, 20)
             
             available_data = []
             companies = set()
@@ -620,15 +983,10 @@ async def debug_all_data():
         embedding_model = NVIDIANIMEmbeddings()
         
         # Connect to Qdrant
-        vector_db = QdrantVectorStore.from_existing_collection(
-            url=os.getenv("QDRANT_URL"),
-            api_key=os.getenv("QDRANT_API_KEY"),
-            collection_name=os.getenv("QDRANT_COLLECTION_NAME"),
-            embedding=embedding_model
-        )
+        vector_db = get_vector_store(embedding_model)
         
         # Get all data without any filter
-        all_results = vector_db.similarity_search(query="test", k=50)
+        all_results = await search_by_vector(vector_db, await embed_query(embedding_model, "test"), 50)
         
         logger.info(f"Total documents found: {len(all_results)}")
         
@@ -678,12 +1036,7 @@ async def debug_reranking(company_name: str, product_name: str, query: str = "te
         embedding_model = NVIDIANIMEmbeddings()
         
         # Connect to Qdrant
-        vector_db = QdrantVectorStore.from_existing_collection(
-            url=os.getenv("QDRANT_URL"),
-            api_key=os.getenv("QDRANT_API_KEY"),
-            collection_name=os.getenv("QDRANT_COLLECTION_NAME"),
-            embedding=embedding_model
-        )
+        vector_db = get_vector_store(embedding_model)
         
         # Create strict filter
         qdrant_filter = models.Filter(
@@ -700,7 +1053,8 @@ async def debug_reranking(company_name: str, product_name: str, query: str = "te
         )
         
         # Get initial search results
-        initial_results = vector_db.similarity_search(query=query, k=15, filter=qdrant_filter)
+        query_embedding = await embed_query(embedding_model, query)
+        initial_results = await search_by_vector(vector_db, query_embedding, 15, qdrant_filter)
         logger.info(f"Initial search results: {len(initial_results)}")
         
         if not initial_results:
@@ -722,10 +1076,8 @@ async def debug_reranking(company_name: str, product_name: str, query: str = "te
                 reranking_info["reranker_available"] = True
                 logger.info("Testing reranking...")
                 
-                reranked_chunks = nvidia_reranker.compress_documents(
-                    query=query,
-                    documents=initial_results
-                )
+                # Same breaker, limiter admission and deadline as /query/, but failures are reported
+                reranked_chunks = list(await rerank_with_deadline(nvidia_reranker, query, initial_results))
                 
                 reranking_info["reranking_successful"] = True
                 logger.info(f"Reranking successful. Got {len(reranked_chunks)} reranked chunks")
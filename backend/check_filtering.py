@@ -1,13 +1,12 @@
-import os
 from qdrant_client.http import models
 from nvidia_embeddings import NVIDIANIMEmbeddings
-from langchain_qdrant import QdrantVectorStore
+from vector_storage import get_vector_store
 from dotenv import load_dotenv
 
 load_dotenv()
 
-def test_retrieval(company_name, product_code, query):
-    """Test retrieval with strict filtering"""
+def check_retrieval(company_name, product_code, query):
+    """Manual retrieval check with strict filtering against the configured Qdrant and NIM (not a pytest test)"""
     
     # Check if both company_name and product_code are provided
     if not company_name or not product_code:
@@ -17,12 +16,7 @@ def test_retrieval(company_name, product_code, query):
     embedding_model = NVIDIANIMEmbeddings()
     
     # Connect to Qdrant
-    vector_db = QdrantVectorStore.from_existing_collection(
-        url=os.getenv("QDRANT_URL"),
-        api_key=os.getenv("QDRANT_API_KEY"),
-        collection_name=os.getenv("QDRANT_COLLECTION_NAME"),
-        embedding=embedding_model
-    )
+    vector_db = get_vector_store(embedding_model)
     
     # Create strict filter requiring both company_name and product_code
     qdrant_filter = models.Filter(
@@ -50,7 +44,7 @@ def test_retrieval(company_name, product_code, query):
 # Test examples
 if __name__ == "__main__":
     # Test with valid parameters
-    result1 = test_retrieval("Asus", "tuf_f15", "saftey precautions")
+    result1 = check_retrieval("Asus", "tuf_f15", "saftey precautions")
     print(f"Test 1: {result1}")
     
     
\ No newline at end of file
@@ -0,0 +1,42 @@
+"""
+Response compression: brotli for clients that accept it, gzip for the rest,
+only for bodies above a size threshold
+"""
+
+import logging
+import os
+
+from fastapi import FastAPI
+from fastapi.middleware.gzip import GZipMiddleware
+
+try:
+    from brotli_asgi import BrotliMiddleware
+except ImportError:  # optional; gzip only
+    BrotliMiddleware = None
+
+logger = logging.getLogger(__name__)
+
+
+def setup_compression(app: FastAPI):
+    """
+    Register the compression middleware. Small bodies are sent as is:
+    compressing them costs more CPU than the bytes it saves.
+    """
+    if os.getenv("COMPRESSION_ENABLED", "true").lower() != "true":
+        return
+    minimum_size = int(os.getenv("COMPRESSION_MIN_BYTES", "1024"))
+    if BrotliMiddleware is not None and os.getenv("COMPRESSION_BROTLI", "true").lower() == "true":
+        app.add_middleware(
+            BrotliMiddleware,
+            quality=int(os.getenv("COMPRESSION_BROTLI_QUALITY", "4")),
+            minimum_size=minimum_size,
+            gzip_fallback=True,
+        )
+        logger.info("Brotli/gzip compression above %d bytes", minimum_size)
+    else:
+        app.add_middleware(
+            GZipMiddleware,
+            minimum_size=minimum_size,
+            compresslevel=int(os.getenv("COMPRESSION_GZIP_LEVEL", "6")),
+        )
+        logger.info("Gzip compression above %d bytes", minimum_size)
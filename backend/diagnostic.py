@@ -5,7 +5,6 @@ Diagnostic script to test the batch upload functionality
 
 import sys
 import traceback
-import os
 
 def test_imports():
     """Test all required imports"""
@@ -72,19 +71,16 @@ def test_qdrant_connection():
     print("\n🔍 Testing Qdrant connection...")
     
     try:
-        from qdrant_client import QdrantClient
+        from vector_storage import get_collection_name, get_qdrant_client
         
-        qdrant_client = QdrantClient(
-            url=os.getenv("QDRANT_URL"),
-            api_key=os.getenv("QDRANT_API_KEY")
-        )
+        qdrant_client = get_qdrant_client()
         
         collections = qdrant_client.get_collections()
         print(f"✅ Qdrant connection successful, found {len(collections.collections)} collections")
         
         # Check if our collection exists
-        collection_exists = any(col.name == os.getenv("QDRANT_COLLECTION_NAME") for col in collections.collections)
-        print(f"✅ Collection '{os.getenv('QDRANT_COLLECTION_NAME')}' exists: {collection_exists}")
+        collection_exists = any(col.name == get_collection_name() for col in collections.collections)
+        print(f"✅ Collection '{get_collection_name()}' exists: {collection_exists}")
         
         return True
         
@@ -0,0 +1,218 @@
+"""
+Dead-letter retry queue for chunks that could not be embedded or upserted,
+and per-manual indexing completeness
+"""
+
+import asyncio
+import logging
+import os
+import random
+from datetime import datetime, timedelta
+from typing import Callable, List, Optional
+
+from bson import ObjectId
+from langchain_core.documents import Document
+from pymongo import ReturnDocument
+
+logger = logging.getLogger(__name__)
+
+STATUS_PENDING = "pending"
+STATUS_IN_PROGRESS = "in_progress"
+STATUS_DEAD = "dead"
+
+# Set at the manual's insert, replaced once its chunks have been upserted
+INDEXING_PENDING = "pending"
+INDEXING_COMPLETE = "complete"
+INDEXING_PARTIAL = "partial"
+INDEXING_FAILED = "failed"
+
+
+class EmbeddingRetryQueue:
+    """
+    One MongoDB document per failed batch, holding the chunk texts and
+    metadata. Batches are retried with exponential backoff and marked dead
+    after max_attempts; the owning manual's "indexing" field tracks how many
+    of its chunks are searchable.
+    """
+
+    def __init__(
+        self,
+        queue_collection,
+        manual_collection,
+        base_delay_seconds: float = None,
+        max_delay_seconds: float = None,
+        max_attempts: int = None,
+        lease_seconds: float = 600
+    ):
+        self.queue = queue_collection
+        self.manuals = manual_collection
+        self.base_delay_seconds = base_delay_seconds or float(os.getenv("EMBED_RETRY_BASE_DELAY_SECONDS", "30"))
+        self.max_delay_seconds = max_delay_seconds or float(os.getenv("EMBED_RETRY_MAX_DELAY_SECONDS", "3600"))
+        self.max_attempts = max_attempts or int(os.getenv("EMBED_RETRY_MAX_ATTEMPTS", "10"))
+        self.lease_seconds = lease_seconds
+        try:
+            self.queue.create_index([("status", 1), ("next_attempt_at", 1)])
+            self.queue.create_index("db_id")
+        except Exception as index_err:
+            logger.warning(f"Retry queue index creation failed: {index_err}")
+
+    def _backoff(self, attempts: int) -> timedelta:
+        delay = min(self.max_delay_seconds, self.base_delay_seconds * (2 ** attempts))
+        return timedelta(seconds=delay * (0.5 + random.random() / 2))
+
+    def enqueue(self, db_id: str, docs: List[Document], error: str):
+        """Record a failed batch for later re-embedding"""
+        now = datetime.utcnow()
+        self.queue.insert_one({
+            "db_id": db_id,
+            "chunks": [{"page_content": d.page_content, "metadata": d.metadata} for d in docs],
+            "status": STATUS_PENDING,
+            "attempts": 0,
+            "last_error": error,
+            "created_at": now,
+            "next_attempt_at": now + self._backoff(0),
+        })
+
+    def claim_due(self) -> Optional[dict]:
+        """Lease the next due batch, including batches whose previous lease expired"""
+        now = datetime.utcnow()
+        return self.queue.find_one_and_update(
+            {"$or": [
+                {"status": STATUS_PENDING, "next_attempt_at": {"$lte": now}},
+                {"status": STATUS_IN_PROGRESS, "leased_until": {"$lte": now}},
+            ]},
+            {"$set": {"status": STATUS_IN_PROGRESS, "leased_until": now + timedelta(seconds=self.lease_seconds)}},
+            sort=[("next_attempt_at", 1)],
+            return_document=ReturnDocument.AFTER,
+        )
+
+    @staticmethod
+    def documents(item: dict) -> List[Document]:
+        return [Document(page_content=c["page_content"], metadata=c["metadata"]) for c in item["chunks"]]
+
+    def complete(self, item: dict):
+        """Drop a batch that has been upserted and count its chunks as indexed"""
+        self.queue.delete_one({"_id": item["_id"]})
+        self._update_manual(item["db_id"], indexed=len(item["chunks"]))
+
+    def reschedule(self, item: dict, error: str):
+        """Back off after another failure, or mark the batch dead after max_attempts"""
+        attempts = item["attempts"] + 1
+        if attempts >= self.max_attempts:
+            self.queue.update_one(
+                {"_id": item["_id"]},
+                {"$set": {"status": STATUS_DEAD, "attempts": attempts, "last_error": error}}
+            )
+            self._set_manual_status(item["db_id"], INDEXING_FAILED)
+            logger.error("Giving up on %d chunks of manual %s: %s", len(item["chunks"]), item["db_id"], error)
+            return
+        self.queue.update_one(
+            {"_id": item["_id"]},
+            {"$set": {
+                "status": STATUS_PENDING,
+                "attempts": attempts,
+                "last_error": error,
+                "next_attempt_at": datetime.utcnow() + self._backoff(attempts),
+            }}
+        )
+
+    def discard(self, db_id: str) -> int:
+        """Forget queued batches of a deleted manual"""
+        return self.queue.delete_many({"db_id": db_id}).deleted_count
+
+    def stats(self) -> dict:
+        counts = {STATUS_PENDING: 0, STATUS_IN_PROGRESS: 0, STATUS_DEAD: 0}
+        for row in self.queue.aggregate([{"$group": {"_id": "$status", "count": {"$sum": 1}}}]):
+            counts[row["_id"]] = row["count"]
+        return counts
+
+    def record_indexing(self, db_id: str, total_chunks: int, failed_chunks: int):
+        """Store how much of a freshly ingested manual made it into the vector store"""
+        self.manuals.update_one(
+            {"_id": ObjectId(db_id)},
+            {"$set": {"indexing": {
+                "status": INDEXING_PARTIAL if failed_chunks else INDEXING_COMPLETE,
+                "total_chunks": total_chunks,
+                "indexed_chunks": total_chunks - failed_chunks,
+                "pending_chunks": failed_chunks,
+                "updated_at": datetime.utcnow(),
+            }}}
+        )
+
+    def _update_manual(self, db_id: str, indexed: int):
+        manual_id = ObjectId(db_id)
+        self.manuals.update_one(
+            {"_id": manual_id},
+            {
+                "$inc": {"indexing.indexed_chunks": indexed, "indexing.pending_chunks": -indexed},
+                "$set": {"indexing.updated_at": datetime.utcnow()},
+            }
+        )
+        self.manuals.update_one(
+            {"_id": manual_id, "indexing.pending_chunks": {"$lte": 0}},
+            {"$set": {"indexing.status": INDEXING_COMPLETE}}
+        )
+
+    def _set_manual_status(self, db_id: str, status: str):
+        self.manuals.update_one(
+            {"_id": ObjectId(db_id)},
+            {"$set": {"indexing.status": status, "indexing.updated_at": datetime.utcnow()}}
+        )
+
+    def manual_exists(self, db_id: str) -> bool:
+        return self.manuals.count_documents({"_id": ObjectId(db_id)}, limit=1) > 0
+
+
+class EmbeddingRetryWorker:
+    """
+    Background loop draining due batches through store_batch, a blocking
+    function that embeds and upserts a list of documents and raises on failure.
+    """
+
+    def __init__(self, queue: EmbeddingRetryQueue, store_batch: Callable[[List[Document]], None], interval_seconds: float = None):
+        self.queue = queue
+        self.store_batch = store_batch
+        self.interval_seconds = interval_seconds or float(os.getenv("EMBED_RETRY_POLL_SECONDS", "15"))
+        self._task: asyncio.Task | None = None
+
+    async def drain(self) -> int:
+        """Retry every batch that is currently due; returns how many were stored"""
+        stored = 0
+        while True:
+            item = await asyncio.to_thread(self.queue.claim_due)
+            if item is None:
+                return stored
+            if not await asyncio.to_thread(self.queue.manual_exists, item["db_id"]):
+                await asyncio.to_thread(self.queue.discard, item["db_id"])
+                continue
+            try:
+                await asyncio.to_thread(self.store_batch, self.queue.documents(item))
+            except Exception as e:
+                logger.warning("Retry of %d chunks for manual %s failed: %s", len(item["chunks"]), item["db_id"], e)
+                await asyncio.to_thread(self.queue.reschedule, item, str(e))
+                # The service is likely still down; wait for the next poll
+                return stored
+            await asyncio.to_thread(self.queue.complete, item)
+            stored += 1
+            logger.info("Re-embedded %d chunks for manual %s", len(item["chunks"]), item["db_id"])
+
+    async def _loop(self):
+        while True:
+            try:
+                await self.drain()
+            except Exception as e:
+                logger.error("Embedding retry pass failed: %s", e)
+            await asyncio.sleep(self.interval_seconds)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
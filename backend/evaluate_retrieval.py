@@ -0,0 +1,268 @@
+"""
+Evaluate retrieval quality and latency of the /query/ path (filtered vector
+search, then reranking) for several configurations side by side.
+
+The labeled set is a JSONL file, one question per line:
+
+    {"query": "safety precautions", "company_name": "Asus", "product_name": "tuf_f15",
+     "expected_pages": [3, 4], "pdf": "manuals/asus_tuf_f15.pdf"}
+
+expected_pages are 1-based PDF page numbers. "pdf" (relative to the labeled
+set) is optional: when present, every configuration indexes the manuals into
+a fresh collection with its own chunker and storage layout; otherwise the
+existing collection is searched and only k, rerank and search-time
+quantization parameters vary.
+
+    python evaluate_retrieval.py labeled.jsonl --offline
+    python evaluate_retrieval.py labeled.jsonl --config "baseline" --config "norerank:rerank=false"
+    python evaluate_retrieval.py labeled.jsonl --config "recursive:chunker=recursive" --config "k30:k=30"
+
+--offline needs no network: an in-memory local Qdrant, a hashing embedder and
+a lexical reranker stand in for the services, so scores compare
+configurations rather than predict production quality. Local Qdrant ignores
+quantization.
+
+Config keys: k (candidates searched, 15 in /query/), top (chunks evaluated,
+8 after reranking), rerank, chunker, quantization, rescore, oversampling.
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import re
+import time
+import uuid
+from pathlib import Path
+
+import numpy as np
+from dotenv import load_dotenv
+from langchain_community.document_loaders import PyPDFLoader
+from langchain_core.embeddings import Embeddings
+from langchain_qdrant import QdrantVectorStore
+from qdrant_client import QdrantClient
+
+from manual_chunker import create_chunker
+from vector_storage import VectorStorageSettings, ensure_collection, get_collection_name, get_qdrant_client
+
+load_dotenv()
+
+DEFAULT_CONFIGS = [
+    "baseline",
+    "norerank:rerank=false",
+    "recursive:chunker=recursive",
+    "scalar:quantization=scalar",
+]
+
+TOKEN_PATTERN = re.compile(r"\w+")
+
+
+class HashingEmbeddings(Embeddings):
+    """Offline stand-in for the NIM embeddings: signed feature hashing of words and word bigrams"""
+
+    def __init__(self, dims: int = 1024):
+        self.dims = dims
+
+    def _embed(self, text: str) -> list:
+        words = TOKEN_PATTERN.findall(text.lower())
+        vector = np.zeros(self.dims, dtype=np.float32)
+        for feature in words + [f"{a} {b}" for a, b in zip(words, words[1:])]:
+            digest = hashlib.blake2b(feature.encode(), digest_size=8).digest()
+            index = int.from_bytes(digest[:4], "little") % self.dims
+            vector[index] += 1.0 if digest[4] & 1 else -1.0
+        norm = np.linalg.norm(vector)
+        return (vector / norm if norm else vector).tolist()
+
+    def embed_query(self, text: str) -> list:
+        return self._embed(text)
+
+    def embed_documents(self, texts: list) -> list:
+        return [self._embed(text) for text in texts]
+
+
+class LexicalReranker:
+    """Offline stand-in for NVIDIARerank: orders chunks by query word overlap"""
+
+    def compress_documents(self, query: str, documents: list) -> list:
+        terms = set(TOKEN_PATTERN.findall(query.lower()))
+        scored = []
+        for document in documents:
+            words = TOKEN_PATTERN.findall(document.page_content.lower())
+            overlap = sum(1 for word in words if word in terms)
+            score = overlap / (len(words) ** 0.5) if words else 0.0
+            document.metadata["relevance_score"] = score
+            scored.append(document)
+        return sorted(scored, key=lambda d: d.metadata["relevance_score"], reverse=True)
+
+
+class EvalConfig:
+    def __init__(self, spec: str):
+        name, _, options = spec.partition(":")
+        self.name = name
+        values = dict(option.split("=", 1) for option in options.split(",") if option)
+        self.k = int(values.pop("k", 15))
+        self.top = int(values.pop("top", 8))
+        self.rerank = values.pop("rerank", "true").lower() == "true"
+        self.chunker = values.pop("chunker", "manual")
+        self.storage = VectorStorageSettings(
+            quantization=values.pop("quantization", "none"),
+            rescore=values.pop("rescore", "true").lower() == "true",
+            oversampling=float(values.pop("oversampling", 2.0)),
+            on_disk=False,
+            dimensions=0,
+        )
+        if values:
+            raise SystemExit(f"Unknown config keys in {spec!r}: {', '.join(values)}")
+
+    def index_key(self) -> tuple:
+        """Configurations with the same key search the same collection"""
+        return self.chunker, self.storage.quantization
+
+
+def load_labeled_set(path: Path) -> list:
+    rows = [json.loads(line) for line in path.read_text().splitlines() if line.strip()]
+    for row in rows:
+        row["expected_pages"] = set(row["expected_pages"])
+        if row.get("pdf"):
+            row["pdf"] = (path.parent / row["pdf"]).resolve()
+    return rows
+
+
+def chunk_pages(document) -> set:
+    """1-based pages a chunk spans; PyPDFLoader pages are 0-based"""
+    first = document.metadata.get("page")
+    if first is None:
+        return set()
+    last = document.metadata.get("page_end")
+    if last is None:
+        last = first
+    return set(range(first + 1, last + 2))
+
+
+def score(ranked: list, expected: set) -> tuple:
+    """Recall of the expected pages over the ranked chunks, and reciprocal rank of the first relevant chunk"""
+    covered = set()
+    reciprocal_rank = 0.0
+    for rank, document in enumerate(ranked, start=1):
+        pages = chunk_pages(document) & expected
+        if pages and not reciprocal_rank:
+            reciprocal_rank = 1.0 / rank
+        covered |= pages
+    return len(covered) / len(expected), reciprocal_rank
+
+
+def build_index(client, rows: list, config: EvalConfig, embedding) -> str:
+    """Chunk and index every manual of the labeled set into a fresh collection"""
+    name = f"eval_{uuid.uuid4().hex[:8]}"
+    ensure_collection(client, name, len(embedding.embed_query("dimension probe")), config.storage)
+    vector_store = QdrantVectorStore(client=client, collection_name=name, embedding=embedding)
+    chunker = create_chunker(config.chunker)
+    manuals = {(row["company_name"], row["product_name"], row["pdf"]) for row in rows}
+    for company_name, product_name, pdf in sorted(manuals, key=str):
+        chunks = chunker.split_documents(PyPDFLoader(file_path=str(pdf)).load())
+        for chunk in chunks:
+            chunk.metadata["company_name"] = company_name
+            chunk.metadata["product_name"] = product_name
+        for start in range(0, len(chunks), 50):
+            vector_store.add_documents(chunks[start:start + 50])
+        print(f"  indexed {pdf.name} with {chunker.name} chunker: {len(chunks)} chunks")
+    return name
+
+
+async def evaluate(config: EvalConfig, rows: list, query_embeddings: list, vector_store) -> dict:
+    # Imported late: chat builds its caches and clients on import
+    import chat
+    from resilience import qdrant_dependency
+
+    recalls, reciprocal_ranks, latencies = [], [], []
+    for row, query_embedding in zip(rows, query_embeddings):
+        started = time.perf_counter()
+        search_result = qdrant_dependency.call(
+            vector_store.similarity_search_by_vector,
+            embedding=query_embedding,
+            k=config.k,
+            filter=chat.product_filter(row["company_name"], row["product_name"]),
+            search_params=config.storage.search_params(),
+        )
+        if config.rerank and search_result:
+            search_result = await chat.rerank_results(row["query"], search_result)
+        latencies.append((time.perf_counter() - started) * 1000)
+        recall, reciprocal_rank = score(search_result[:config.top], row["expected_pages"])
+        recalls.append(recall)
+        reciprocal_ranks.append(reciprocal_rank)
+    return {
+        "config": config.name,
+        "recall": float(np.mean(recalls)),
+        "mrr": float(np.mean(reciprocal_ranks)),
+        "p50_ms": float(np.percentile(latencies, 50)),
+        "p95_ms": float(np.percentile(latencies, 95)),
+        "queries": len(rows),
+    }
+
+
+async def run(args):
+    rows = load_labeled_set(Path(args.labeled_set))
+    configs = [EvalConfig(spec) for spec in (args.config or DEFAULT_CONFIGS)]
+    build = all(row.get("pdf") for row in rows)
+
+    if args.offline:
+        import chat
+        if not build:
+            raise SystemExit("--offline indexes the manuals itself: every labeled row needs a \"pdf\"")
+        embedding = HashingEmbeddings()
+        client = QdrantClient(location=":memory:")
+        chat.reranker = LexicalReranker()
+    else:
+        from nvidia_embeddings import NVIDIANIMEmbeddings
+        embedding = NVIDIANIMEmbeddings()
+        client = get_qdrant_client()
+    if not build:
+        print(f"Searching the existing collection {get_collection_name()}; chunker and index layout do not vary\n")
+
+    embed_latencies, query_embeddings = [], []
+    for row in rows:
+        started = time.perf_counter()
+        query_embeddings.append(embedding.embed_query(row["query"]))
+        embed_latencies.append((time.perf_counter() - started) * 1000)
+
+    collections, created, reports = {}, [], []
+    try:
+        for config in configs:
+            if not build:
+                collection_name = get_collection_name()
+            elif config.index_key() not in collections:
+                collection_name = build_index(client, rows, config, embedding)
+                collections[config.index_key()] = collection_name
+                created.append(collection_name)
+            else:
+                collection_name = collections[config.index_key()]
+            vector_store = QdrantVectorStore(client=client, collection_name=collection_name, embedding=embedding)
+            reports.append(await evaluate(config, rows, query_embeddings, vector_store))
+    finally:
+        if not args.keep:
+            for name in created:
+                client.delete_collection(name)
+
+    print(f"\n{len(rows)} queries, query embedding p50 {np.percentile(embed_latencies, 50):.1f} ms\n")
+    print(f"{'config':<20} {'recall@top':>10} {'MRR':>7} {'p50 ms':>8} {'p95 ms':>8}")
+    for report in reports:
+        print(
+            f"{report['config']:<20} {report['recall']:>10.3f} {report['mrr']:>7.3f} "
+            f"{report['p50_ms']:>8.2f} {report['p95_ms']:>8.2f}"
+        )
+    if args.output:
+        Path(args.output).write_text(json.dumps(reports, indent=2))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("labeled_set", help="JSONL file of labeled questions")
+    parser.add_argument("--config", action="append", help="name[:key=value,...]; repeat to compare (default: a standard set)")
+    parser.add_argument("--offline", action="store_true", help="use local stand-ins instead of Qdrant and NVIDIA services")
+    parser.add_argument("--output", default=None, help="also write the results as JSON")
+    parser.add_argument("--keep", action="store_true", help="keep the evaluation collections")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
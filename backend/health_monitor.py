@@ -0,0 +1,102 @@
+"""
+Background dependency probing so health endpoints serve a cached snapshot
+"""
+
+import asyncio
+import logging
+import os
+import time
+from datetime import datetime
+from typing import Callable, Dict
+
+from dotenv import load_dotenv
+
+logger = logging.getLogger(__name__)
+
+load_dotenv()
+
+
+class HealthMonitor:
+    """Runs registered probes on an interval and keeps the latest result per dependency"""
+
+    def __init__(self, interval_seconds: float = None, probe_timeout_seconds: float = None):
+        self.interval_seconds = interval_seconds or float(os.getenv("HEALTH_CHECK_INTERVAL_SECONDS", "30"))
+        self.probe_timeout_seconds = probe_timeout_seconds or float(os.getenv("HEALTH_CHECK_TIMEOUT_SECONDS", "5"))
+        self._probes: Dict[str, Callable[[], None]] = {}
+        self._required: set = set()
+        self._snapshot: Dict[str, dict] = {}
+        self._task: asyncio.Task | None = None
+
+    def register(self, name: str, probe: Callable[[], None], required: bool = True):
+        """
+        Register a blocking probe that raises on failure. Required probes
+        decide readiness; optional ones are only reported.
+        """
+        self._probes[name] = probe
+        if required:
+            self._required.add(name)
+        self._snapshot[name] = {
+            "status": "unknown",
+            "required": required,
+            "last_checked": None,
+            "last_success": None,
+            "latency_ms": None,
+            "error": None,
+        }
+
+    async def _run_probe(self, name: str, probe: Callable[[], None]):
+        entry = self._snapshot[name]
+        started = time.perf_counter()
+        try:
+            await asyncio.wait_for(asyncio.to_thread(probe), timeout=self.probe_timeout_seconds)
+            entry["status"] = "available"
+            entry["error"] = None
+            entry["last_success"] = datetime.now().isoformat()
+        except asyncio.TimeoutError:
+            entry["status"] = "error"
+            entry["error"] = f"timed out after {self.probe_timeout_seconds}s"
+        except Exception as e:
+            entry["status"] = "error"
+            entry["error"] = str(e)
+        entry["latency_ms"] = round((time.perf_counter() - started) * 1000, 1)
+        entry["last_checked"] = datetime.now().isoformat()
+        if entry["status"] != "available":
+            logger.warning("Health probe %s failed: %s", name, entry["error"])
+
+    async def refresh(self):
+        """Run every probe once, concurrently"""
+        await asyncio.gather(*(self._run_probe(name, probe) for name, probe in self._probes.items()))
+
+    async def _loop(self):
+        while True:
+            try:
+                await self.refresh()
+            except Exception as e:
+                logger.error("Health refresh failed: %s", e)
+            await asyncio.sleep(self.interval_seconds)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def is_ready(self) -> bool:
+        return all(self._snapshot[name]["status"] == "available" for name in self._required)
+
+    def snapshot(self) -> dict:
+        return {
+            "status": "healthy" if self.is_ready() else "degraded",
+            "interval_seconds": self.interval_seconds,
+            "services": {name: dict(entry) for name, entry in self._snapshot.items()},
+        }
+
+
+health_monitor = HealthMonitor()
@@ -0,0 +1,250 @@
+"""
+In-process vector tier for the most queried products: their chunk vectors are
+kept in contiguous NumPy matrices and searched with a brute-force dot product
+"""
+
+import asyncio
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from dotenv import load_dotenv
+from langchain_core.documents import Document
+from qdrant_client.http import models
+
+from metrics import record_cache
+from vector_storage import get_collection_name, get_qdrant_client, point_to_document
+
+logger = logging.getLogger(__name__)
+
+load_dotenv()
+
+
+class _ProductVectors:
+    """All chunks of one product: a normalized (n, dim) matrix plus ids and payloads"""
+
+    def __init__(self, ids: list, vectors: np.ndarray, payloads: List[dict]):
+        self.ids = ids
+        self.vectors = vectors
+        self.payloads = payloads
+        self.loaded_at = time.monotonic()
+        self.nbytes = vectors.nbytes + sum(len(p.get("page_content") or "") for p in payloads)
+
+
+class HotProductVectorCache:
+    """
+    Products are loaded after min_queries cache misses and searched locally
+    from then on. Products with more than max_points chunks stay in Qdrant.
+    Least recently used products are evicted once max_bytes is exceeded;
+    ingestion and deletion invalidate a product, and other workers follow
+    through a generation counter in the shared state store.
+    """
+
+    GENERATION_KEY_PREFIX = "hot_vector_generation"
+
+    def __init__(
+        self,
+        max_bytes: int = None,
+        max_points: int = None,
+        min_queries: int = None,
+        ttl_seconds: float = None,
+        generation_check_seconds: float = 1.0
+    ):
+        self.enabled = os.getenv("HOT_CACHE_ENABLED", "false").lower() == "true"
+        self.max_bytes = max_bytes or int(float(os.getenv("HOT_CACHE_MAX_MB", "256")) * 2 ** 20)
+        self.max_points = max_points or int(os.getenv("HOT_CACHE_MAX_POINTS", "5000"))
+        self.min_queries = min_queries or int(os.getenv("HOT_CACHE_MIN_QUERIES", "3"))
+        self.ttl_seconds = ttl_seconds or float(os.getenv("HOT_CACHE_TTL_SECONDS", "3600"))
+        self.generation_check_seconds = generation_check_seconds
+        self._lock = threading.Lock()
+        self._products: "OrderedDict[Tuple[str, str], _ProductVectors]" = OrderedDict()
+        self._misses: Dict[Tuple[str, str], int] = {}
+        self._too_large: set = set()
+        self._loading: set = set()
+        self._load_tasks: set = set()
+        # Bumped on invalidation so a load that raced with it is discarded
+        self._versions: Dict[Tuple[str, str], int] = {}
+        self._bytes = 0
+        self._shared_store = None
+        self._generations: Dict[Tuple[str, str], object] = {}
+        self._generation_checked_at: Dict[Tuple[str, str], float] = {}
+        self._refresh_tasks: set = set()
+
+    def bind_shared_store(self, store):
+        """Propagate per-product invalidations to other workers through the state store"""
+        self._shared_store = store
+
+    def _generation_key(self, key: Tuple[str, str]) -> str:
+        return f"{self.GENERATION_KEY_PREFIX}:{key[0]}|{key[1]}"
+
+    def _sync_shared_generation(self, key: Tuple[str, str]):
+        if self._shared_store is None:
+            return
+        now = time.monotonic()
+        if now - self._generation_checked_at.get(key, 0.0) < self.generation_check_seconds:
+            return
+        self._generation_checked_at[key] = now
+        try:
+            # The store read is blocking I/O: apply it off the event loop, for later searches
+            task = asyncio.get_running_loop().create_task(asyncio.to_thread(self._refresh_generation, key))
+            self._refresh_tasks.add(task)
+            task.add_done_callback(self._refresh_tasks.discard)
+        except RuntimeError:
+            # No event loop (scripts): refresh inline
+            self._refresh_generation(key)
+
+    def _refresh_generation(self, key: Tuple[str, str]):
+        try:
+            generation = self._shared_store.get(self._generation_key(key))
+        except Exception:
+            return
+        if key in self._generations and generation != self._generations[key]:
+            self._drop(key)
+        self._generations[key] = generation
+
+    def _drop(self, key: Tuple[str, str]):
+        with self._lock:
+            entry = self._products.pop(key, None)
+            if entry is not None:
+                self._bytes -= entry.nbytes
+            self._too_large.discard(key)
+            self._misses.pop(key, None)
+            self._versions[key] = self._versions.get(key, 0) + 1
+
+    def search(self, company_name: str, product_name: str, embedding, k: int) -> Optional[List[Document]]:
+        """
+        Top-k chunks by cosine similarity if the product is loaded, else None.
+        A miss counts towards loading the product in the background.
+        """
+        if not self.enabled:
+            return None
+        key = (company_name, product_name)
+        self._sync_shared_generation(key)
+        with self._lock:
+            entry = self._products.get(key)
+            if entry is not None and time.monotonic() - entry.loaded_at > self.ttl_seconds:
+                self._products.pop(key)
+                self._bytes -= entry.nbytes
+                entry = None
+            if entry is not None:
+                self._products.move_to_end(key)
+        if entry is None:
+            record_cache("hot_vectors", False)
+            self._record_miss(key)
+            return None
+
+        query = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(query)
+        if norm:
+            query = query / norm
+        if entry.vectors.shape[1] != query.shape[0]:
+            self._drop(key)
+            record_cache("hot_vectors", False)
+            return None
+        scores = entry.vectors @ query
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        record_cache("hot_vectors", True)
+        collection_name = get_collection_name()
+        return [point_to_document(entry.ids[i], entry.payloads[i], collection_name) for i in top]
+
+    def _record_miss(self, key: Tuple[str, str]):
+        with self._lock:
+            if key in self._too_large or key in self._loading:
+                return
+            self._misses[key] = self._misses.get(key, 0) + 1
+            if self._misses[key] < self.min_queries:
+                return
+            self._loading.add(key)
+        try:
+            task = asyncio.get_running_loop().create_task(asyncio.to_thread(self._load, key))
+            self._load_tasks.add(task)
+            task.add_done_callback(self._load_tasks.discard)
+        except RuntimeError:
+            # No event loop (scripts): load inline
+            self._load(key)
+
+    def _load(self, key: Tuple[str, str]):
+        company_name, product_name = key
+        with self._lock:
+            version = self._versions.get(key, 0)
+        try:
+            product_filter = models.Filter(must=[
+                models.FieldCondition(key="metadata.company_name", match=models.MatchValue(value=company_name)),
+                models.FieldCondition(key="metadata.product_name", match=models.MatchValue(value=product_name)),
+            ])
+            client = get_qdrant_client()
+            ids, vectors, payloads, offset = [], [], [], None
+            while True:
+                points, offset = client.scroll(
+                    collection_name=get_collection_name(),
+                    scroll_filter=product_filter,
+                    limit=512,
+                    offset=offset,
+                    with_vectors=True,
+                    with_payload=True,
+                )
+                for point in points:
+                    ids.append(point.id)
+                    vectors.append(point.vector)
+                    payloads.append(point.payload or {})
+                if len(ids) > self.max_points:
+                    with self._lock:
+                        self._too_large.add(key)
+                    logger.info("Product %s/%s has over %d chunks, not caching", company_name, product_name, self.max_points)
+                    return
+                if offset is None:
+                    break
+            if not ids:
+                return
+            matrix = np.ascontiguousarray(np.asarray(vectors, dtype=np.float32))
+            norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+            norms[norms == 0] = 1.0
+            matrix /= norms
+            entry = _ProductVectors(ids, matrix, payloads)
+            with self._lock:
+                if self._versions.get(key, 0) != version:
+                    return
+                old = self._products.pop(key, None)
+                if old is not None:
+                    self._bytes -= old.nbytes
+                self._products[key] = entry
+                self._bytes += entry.nbytes
+                self._misses.pop(key, None)
+                while self._bytes > self.max_bytes and len(self._products) > 1:
+                    _, evicted = self._products.popitem(last=False)
+                    self._bytes -= evicted.nbytes
+            logger.info(
+                "Cached %d vectors for %s/%s (%.1f MB)", len(ids), company_name, product_name, entry.nbytes / 2 ** 20
+            )
+        except Exception as e:
+            logger.warning("Loading hot vectors for %s/%s failed: %s", company_name, product_name, e)
+        finally:
+            with self._lock:
+                self._loading.discard(key)
+
+    def invalidate(self, company_name: str, product_name: str):
+        """Drop a product after its chunks changed; it reloads once it is hot again"""
+        key = (company_name, product_name)
+        self._drop(key)
+        if self._shared_store is not None:
+            try:
+                generation = time.time_ns()
+                self._shared_store.set(self._generation_key(key), generation)
+                self._generations[key] = generation
+            except Exception:
+                pass
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "products": len(self._products),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+            }
@@ -1,33 +1,78 @@
-from fastapi import FastAPI, File, UploadFile, HTTPException, Form
+from fastapi import FastAPI, File, UploadFile, HTTPException, Form, Header, Response, Query
+from fastapi.responses import ORJSONResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from pathlib import Path
+from pydantic import BaseModel, Field
+from contextlib import asynccontextmanager
 from langchain_community.document_loaders import PyPDFLoader
-from langchain_text_splitters import RecursiveCharacterTextSplitter
 from langchain_openai import OpenAIEmbeddings
-from nvidia_embeddings import NVIDIANIMEmbeddings
-from langchain_qdrant import QdrantVectorStore
+from nvidia_embeddings import NVIDIANIMEmbeddings, PrecomputedEmbeddings
+from nim_limiter import PRIORITY_INGESTION
+from resilience import circuit_states
+from manual_chunker import create_chunker, chunk_stats
+from embedding_retry import (
+    INDEXING_COMPLETE,
+    INDEXING_PARTIAL,
+    INDEXING_PENDING,
+    EmbeddingRetryQueue,
+    EmbeddingRetryWorker,
+)
+from vector_storage import backend_configured, ensure_collection, get_collection_name, get_qdrant_client, get_vector_store
 from dotenv import load_dotenv
-from pymongo import MongoClient
+from pymongo import MongoClient, UpdateOne
+from pymongo.errors import DuplicateKeyError
 from bson import ObjectId
 import os
+import hashlib
+import logging
 import shutil
+import tempfile
+import asyncio
 import chat
 import auth
+from catalog_cache import catalog_cache, etag_matches
+from shared_state import create_state_store
+from metrics import mongo_command_metrics, record_chunk_sizes, render_metrics, time_ingest_stage
+from structured_logging import setup_logging, request_id_middleware, log_event
+from health_monitor import health_monitor
+from tracing import setup_tracing, tracing_middleware, mongo_command_tracing, start_span, set_span_attributes
+from compression import setup_compression
 from pypdf import PdfReader
-from qdrant_client import QdrantClient
 from qdrant_client.http import models
 import cloudinary
 import cloudinary.uploader
 import cloudinary.api
 import qrcode
 import json
+import orjson
 import io
+import uuid
+from functools import lru_cache
 from PIL import Image
-from datetime import datetime
+from datetime import datetime, timedelta
 
 load_dotenv()
+setup_logging()
+setup_tracing()
+logger = logging.getLogger(__name__)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Dependency probes refresh a cached status snapshot in the background
+    health_monitor.register("mongodb", probe_mongodb)
+    health_monitor.register("qdrant", chat.probe_qdrant)
+    health_monitor.register("nvidia", chat.probe_nvidia)
+    health_monitor.register("reranker", chat.probe_reranker, required=False)
+    health_monitor.start()
+    if embedding_retry_worker is not None:
+        embedding_retry_worker.start()
+    yield
+    if embedding_retry_worker is not None:
+        await embedding_retry_worker.stop()
+    await health_monitor.stop()
 
-app = FastAPI()
+# orjson instead of the standard json encoder; see benchmark_responses.py
+app = FastAPI(lifespan=lifespan, default_response_class=ORJSONResponse)
 
 # Include the routers
 app.include_router(chat.router)
@@ -42,6 +87,13 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Request spans, continuing traces propagated in traceparent headers
+app.middleware("http")(tracing_middleware)
+# Request ids for log correlation; registered last so it wraps the tracing span
+app.middleware("http")(request_id_middleware)
+# Outermost, so it compresses the final body
+setup_compression(app)
+
 # Ensure uploads directory exists
 # Use /tmp for Vercel deployment, local path for development
 import platform
@@ -49,7 +101,7 @@ if platform.system() == "Windows":
     UPLOAD_DIR = Path(__file__).parent.parent / "uploads"
 else:
     UPLOAD_DIR = Path("/tmp/uploads")
-UPLOAD_DIR.mkdir(exist_ok=True)
+UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
 
 # -----------------------------
 # MongoDB setup
@@ -65,19 +117,45 @@ try:
         connectTimeoutMS=10000,          # 10 second connection timeout
         socketTimeoutMS=20000,           # 20 second socket timeout
         maxPoolSize=10,                  # Limit connection pool size
-        retryWrites=True
+        retryWrites=True,
+        event_listeners=[mongo_command_metrics, mongo_command_tracing]
     )
     mongo_db = mongo_client[MONGODB_DB]
     mongo_collection = mongo_db[MONGODB_COLLECTION]
     # Test connection
     mongo_client.admin.command('ping')
-    print("MongoDB connection successful")
+    logger.info("MongoDB connection successful")
+    # Indexes backing the catalog endpoints and manual lookups
+    try:
+        mongo_collection.create_index("company_name")
+        mongo_collection.create_index([("company_name", 1), ("product_name", 1)])
+        mongo_collection.create_index([("product_name", 1), ("filename", 1)])
+        # One manual record per PDF content; older records without a hash are exempt
+        mongo_collection.create_index(
+            "content_hash",
+            unique=True,
+            partialFilterExpression={"content_hash": {"$type": "string"}}
+        )
+    except Exception as index_err:
+        logger.warning(f"MongoDB index creation failed: {index_err}")
 except Exception as e:
-    print(f"MongoDB connection failed: {e}")
+    logger.warning(f"MongoDB connection failed: {e}")
     mongo_client = None
     mongo_db = None
     mongo_collection = None
 
+# Shared state across workers (MongoDB-backed unless STATE_STORE_BACKEND=memory)
+state_store = create_state_store(mongo_db)
+catalog_cache.bind_shared_store(state_store)
+chat.answer_cache.bind_shared_store(state_store)
+chat.hot_vectors.bind_shared_store(state_store)
+
+# Chunks that failed to embed or upsert, retried in the background instead of being dropped
+embedding_retry_queue = (
+    EmbeddingRetryQueue(mongo_db[os.getenv("EMBED_RETRY_COLLECTION", "embedding_retry_queue")], mongo_collection)
+    if mongo_db is not None else None
+)
+
 # -----------------------------
 # Cloudinary setup
 # -----------------------------
@@ -87,17 +165,26 @@ cloudinary.config(
     api_secret=os.getenv("CLOUDINARY_API_SECRET")
 )
 
+# Files larger than this are sent to Cloudinary in chunks instead of one request body
+CLOUDINARY_CHUNK_SIZE = 6 * 1024 * 1024
+
 def upload_to_cloudinary(file_path: str, public_id: str = None) -> dict:
     """
     Upload a file to Cloudinary and return the upload result
     """
     try:
-        result = cloudinary.uploader.upload(
-            file_path,
-            resource_type="raw",  # For PDF files
-            public_id=public_id,
-            folder="pdf_manuals"  # Organize PDFs in a folder
-        )
+        upload_options = {
+            "resource_type": "raw",  # For PDF files
+            "public_id": public_id,
+            "folder": "pdf_manuals",  # Organize PDFs in a folder
+        }
+        with time_ingest_stage("cloudinary_pdf"), start_span("cloudinary.upload_pdf", public_id=public_id):
+            if os.path.getsize(file_path) > CLOUDINARY_CHUNK_SIZE:
+                # Stream large PDFs from disk in chunks rather than buffering the whole file
+                return cloudinary.uploader.upload_large(
+                    file_path, chunk_size=CLOUDINARY_CHUNK_SIZE, **upload_options
+                )
+            result = cloudinary.uploader.upload(file_path, **upload_options)
         return result
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Cloudinary upload failed: {str(e)}")
@@ -110,42 +197,48 @@ def delete_from_cloudinary(public_id: str) -> bool:
         result = cloudinary.uploader.destroy(public_id, resource_type="raw")
         return result.get("result") == "ok"
     except Exception as e:
-        print(f"Cloudinary deletion failed: {e}")
+        logger.warning(f"Cloudinary deletion failed: {e}")
         return False
 
+@lru_cache(maxsize=512)
+def render_qr_png(company_name: str, product_name: str, product_code: str | None) -> bytes:
+    """
+    Render the QR code PNG for a product payload. Memoized, since the same
+    (company, product, code) payload always produces the same image.
+    """
+    # Data to encode in QR code
+    data = {
+        "company_name": company_name,
+        "product_name": product_name,
+        "product_code": product_code or product_name,
+    }
+    
+    # Create QR code instance
+    qr = qrcode.QRCode(
+        version=1,  # Controls the size of the QR code (1 is the smallest)
+        error_correction=qrcode.constants.ERROR_CORRECT_L,  # Sets the error correction level
+        box_size=10,  # Size of each QR code pixel
+        border=4,  # Thickness of the border
+    )
+    
+    # Add data to the QR code
+    qr.add_data(json.dumps(data))
+    qr.make(fit=True)
+    
+    # Create an image from the QR code instance
+    img = qr.make_image(fill_color="black", back_color="white")
+    
+    qr_buffer = io.BytesIO()
+    img.save(qr_buffer, format='PNG')
+    return qr_buffer.getvalue()
+
 def generate_qr_code(company_name: str, product_name: str, product_code: str = None) -> io.BytesIO:
     """
     Generate QR code with product information
     """
     try:
-        # Data to encode in QR code
-        data = {
-            "company_name": company_name,
-            "product_name": product_name,
-            "product_code": product_code or product_name,
-        }
-        
-        # Create QR code instance
-        qr = qrcode.QRCode(
-            version=1,  # Controls the size of the QR code (1 is the smallest)
-            error_correction=qrcode.constants.ERROR_CORRECT_L,  # Sets the error correction level
-            box_size=10,  # Size of each QR code pixel
-            border=4,  # Thickness of the border
-        )
-        
-        # Add data to the QR code
-        qr.add_data(json.dumps(data))
-        qr.make(fit=True)
-        
-        # Create an image from the QR code instance
-        img = qr.make_image(fill_color="black", back_color="white")
-        
-        # Convert to BytesIO for upload
-        qr_buffer = io.BytesIO()
-        img.save(qr_buffer, format='PNG')
-        qr_buffer.seek(0)
-        
-        return qr_buffer
+        # Fresh BytesIO for upload on every call; the PNG bytes themselves are cached
+        return io.BytesIO(render_qr_png(company_name, product_name, product_code))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"QR code generation failed: {str(e)}")
 
@@ -154,382 +247,683 @@ def upload_qr_to_cloudinary(qr_buffer: io.BytesIO, public_id: str) -> dict:
     Upload QR code to Cloudinary and return the upload result
     """
     try:
-        result = cloudinary.uploader.upload(
-            qr_buffer,
-            resource_type="image",  # For QR code images
-            public_id=public_id,
-            folder="qr_codes"  # Organize QR codes in a folder
-        )
+        with time_ingest_stage("cloudinary_qr"), start_span("cloudinary.upload_qr", public_id=public_id):
+            result = cloudinary.uploader.upload(
+                qr_buffer,
+                resource_type="image",  # For QR code images
+                public_id=public_id,
+                folder="qr_codes"  # Organize QR codes in a folder
+            )
         return result
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"QR code Cloudinary upload failed: {str(e)}")
 
-# Store list of uploaded files
-uploaded_files = []
-current_company_name: str | None = None
+# -----------------------------
+# Ingestion pipeline helpers
+# -----------------------------
+UPLOAD_READ_CHUNK_SIZE = 1024 * 1024
 
-@app.post("/upload_pdf/")
-async def upload_pdf(
-    file: UploadFile = File(...),
-    company_name: str = Form(...),
-    product_name: str | None = Form(None),
-    product_code: str | None = Form(None)
+async def save_upload_to_disk(file: UploadFile, file_path: Path) -> str:
+    """
+    Stream an upload to disk in chunks without blocking the event loop,
+    hashing the bytes on the way. Returns the SHA-256 hex digest.
+    """
+    digest = hashlib.sha256()
+    buffer = await asyncio.to_thread(file_path.open, "wb")
+    try:
+        with time_ingest_stage("receive"):
+            while True:
+                chunk = await file.read(UPLOAD_READ_CHUNK_SIZE)
+                if not chunk:
+                    break
+                digest.update(chunk)
+                await asyncio.to_thread(buffer.write, chunk)
+    finally:
+        await asyncio.to_thread(buffer.close)
+    return digest.hexdigest()
+
+def extract_pdf_metadata(file_path: Path) -> dict:
+    """
+    Extract core PDF metadata once per file
+    """
+    pdf_meta = {}
+    try:
+        reader = PdfReader(str(file_path))
+        info = reader.metadata or {}
+        # Normalize keys to match user-provided schema
+        pdf_meta["producer"] = info.get("/Producer") or info.get("producer")
+        pdf_meta["creator"] = info.get("/Creator") or info.get("creator")
+        pdf_meta["creationdate"] = info.get("/CreationDate") or info.get("creationdate")
+        pdf_meta["moddate"] = info.get("/ModDate") or info.get("moddate")
+        pdf_meta["total_pages"] = len(reader.pages)
+    except Exception:
+        pdf_meta = {}
+    return pdf_meta
+
+def parse_and_split_pdf(file_path: Path) -> tuple[dict, list]:
+    """
+    Load a PDF and split it into chunks. Depends on nothing remote, so it can
+    run while the Cloudinary uploads are in flight.
+    """
+    with time_ingest_stage("parse"), start_span("pdf.parse"):
+        pdf_meta = extract_pdf_metadata(file_path)
+        loader = PyPDFLoader(file_path=str(file_path))
+        docs = loader.load()
+        set_span_attributes(page_count=len(docs))
+    with time_ingest_stage("chunk"), start_span("pdf.chunk"):
+        chunker = create_chunker()
+        split_docs = chunker.split_documents(docs)
+        set_span_attributes(chunker=chunker.name, chunk_count=len(split_docs))
+    return pdf_meta, split_docs
+
+def attach_chunk_metadata(
+    split_docs: list,
+    pdf_meta: dict,
+    company_name: str,
+    product_name: str,
+    product_code: str | None,
+    filename: str,
+    db_id: str,
+    source: str
 ):
+    """
+    Attach manual-level metadata to every chunk once the remote stages are done
+    """
+    for d in split_docs:
+        d.metadata = d.metadata or {}
+        d.metadata["company_name"] = company_name
+        d.metadata["product_name"] = product_name
+        d.metadata["product_code"] = product_code
+        d.metadata["filename"] = filename
+        d.metadata["db_id"] = db_id
+        # Override the source with Cloudinary URI (PyPDFLoader sets it to local path)
+        d.metadata["source"] = source
+        # Preserve page metadata and core PDF metadata into chunks
+        for k, v in pdf_meta.items():
+            if v is not None:
+                d.metadata[k] = v
+
+def generate_and_upload_qr(
+    company_name: str,
+    product_name: str,
+    product_code: str | None
+) -> tuple[str | None, str | None]:
+    """
+    Generate and upload the product QR code, returning (qr_uri, qr_public_id).
+    QR failures never fail an upload.
+    """
     try:
-        # Remove all previously uploaded files
-        for old_file in UPLOAD_DIR.iterdir():
-            if old_file.is_file():
-                old_file.unlink()
-        uploaded_files.clear()
-
-        # Optionally: Clear Qdrant collection (requires Qdrant client)
-        # from qdrant_client import QdrantClient
-        # client = QdrantClient(url="http://localhost:6333")
-        # client.delete_collection(collection_name='learn_vector')
-
-        # Save uploaded file temporarily for processing
-        file_path = UPLOAD_DIR / file.filename
-        with file_path.open("wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
-
-        # Determine product_name (fallback to product_code for backward compatibility)
-        resolved_product_name = product_name or product_code
-        if not resolved_product_name:
-            raise HTTPException(status_code=400, detail="product_name or product_code is required")
-
-        # Upload to Cloudinary
+        qr_buffer = generate_qr_code(company_name, product_name, product_code)
+        qr_public_id = f"{company_name}_{product_name}_qr"
+        qr_result = upload_qr_to_cloudinary(qr_buffer, qr_public_id)
+        qr_uri = qr_result["secure_url"]
+        logger.info(f"QR code generated and uploaded to Cloudinary: {qr_uri}")
+        return qr_uri, qr_public_id
+    except Exception as e:
+        logger.warning(f"QR code generation/upload failed: {e}")
+        return None, None
+
+def store_chunks_in_qdrant(split_docs: list, embedding_model) -> list[tuple[list, str]]:
+    """
+    Store chunks in Qdrant in batches, creating the collection on first use.
+    Returns the batches that could not be embedded or upserted, with their errors.
+    """
+    if not split_docs:
+        return []
+    collection_name = get_collection_name()
+    # Process documents in smaller batches to avoid timeout/memory issues
+    batch_size = 50  # Smaller batch size for better reliability
+    batches = [split_docs[i:i + batch_size] for i in range(0, len(split_docs), batch_size)]
+    failed_batches = []
+    batch_number = 0
+    try:
+        qdrant_client = get_qdrant_client()
+
+        log_event(
+            logger, logging.INFO, "ingest.store", "Processing %d document chunks in batches of %d",
+            len(split_docs), batch_size
+        )
+
+        if not qdrant_client.collection_exists(collection_name):
+            # Create collection for first time with the configured quantization/on-disk layout;
+            # the vector size comes from the first chunk (precomputed in the upload path)
+            vector_size = len(embedding_model.embed_documents([split_docs[0].page_content])[0])
+            ensure_collection(qdrant_client, collection_name, vector_size)
+        else:
+            logger.info(f"Adding documents to existing {collection_name} collection...")
+        vector_store = get_vector_store(embedding_model, collection_name)
+
+        for batch_number, batch in enumerate(batches, start=1):
+            try:
+                vector_store.add_documents(batch)
+                log_event(logger, logging.DEBUG, "ingest.batch", "Added batch %d: %d documents", batch_number, len(batch))
+            except Exception as batch_err:
+                log_event(
+                    logger, logging.WARNING, "ingest.batch_failed", "Batch %d failed: %s", batch_number, batch_err
+                )
+                failed_batches.append((batch, str(batch_err)))
+                # Continue with next batch
+
+        logger.info("All documents processed for Qdrant storage")
+
+    except Exception as qdrant_err:
+        logger.warning("Qdrant storage failed, documents processed but not stored in vector database: %s", qdrant_err)
+        # Everything not yet attempted is reported as failed
+        failed_batches.extend((batch, str(qdrant_err)) for batch in batches[batch_number:])
+    return failed_batches
+
+def parse_and_embed_pdf(file_path: Path, embedding_model) -> tuple[dict, list, list | None]:
+    """
+    Local branch of the ingestion graph: parse, chunk and embed the PDF.
+    Vectors are None when early embedding failed and must happen at storage time.
+    """
+    pdf_meta, split_docs = parse_and_split_pdf(file_path)
+    texts = [d.page_content for d in split_docs]
+    if not texts:
+        return pdf_meta, split_docs, None
+    try:
+        with time_ingest_stage("embed"):
+            vectors = embedding_model.embed_documents(texts)
+        return pdf_meta, split_docs, vectors
+    except Exception as embed_err:
+        # Fall back to embedding while storing
+        logger.warning(f"Early embedding failed, deferring to storage: {embed_err}")
+        return pdf_meta, split_docs, None
+
+async def ingest_pdf_file(
+    file_path: Path,
+    filename: str,
+    company_name: str,
+    product_name: str,
+    product_code: str | None,
+    content_hash: str | None = None,
+    qr_task: asyncio.Future | None = None
+) -> dict:
+    """
+    Run the ingestion dependency graph for one saved PDF:
+
+        cloudinary upload ─┐
+        qr generate/upload ┼─> mongo insert ─> attach metadata ─> qdrant upsert
+        parse/chunk/embed ─┘
+
+    The remote uploads run concurrently with local parsing and embedding, so
+    ingestion time approaches the slowest branch instead of the sum. Batch
+    uploads pass a shared qr_task so the product QR is uploaded only once.
+    """
+    embedding_model = NVIDIANIMEmbeddings(priority=PRIORITY_INGESTION)
+    if qr_task is None:
+        qr_task = asyncio.to_thread(generate_and_upload_qr, company_name, product_name, product_code)
+    with start_span("ingest.parallel_stages", filename=filename, company_name=company_name, product_name=product_name):
+        cloudinary_result, qr_result, parse_result = await asyncio.gather(
+            asyncio.to_thread(
+                upload_to_cloudinary,
+                str(file_path),
+                f"{company_name}_{product_name}_{filename}"
+            ),
+            qr_task,
+            asyncio.to_thread(parse_and_embed_pdf, file_path, embedding_model),
+            return_exceptions=True
+        )
+
+    if isinstance(cloudinary_result, BaseException):
+        raise HTTPException(status_code=500, detail=f"Failed to upload {filename} to Cloudinary: {str(cloudinary_result)}")
+    cloudinary_uri = cloudinary_result["secure_url"]
+    cloudinary_public_id = cloudinary_result["public_id"]
+    logger.info(f"File uploaded to Cloudinary: {cloudinary_uri}")
+
+    if isinstance(parse_result, BaseException):
+        raise HTTPException(status_code=500, detail=f"Failed to parse {filename}: {str(parse_result)}")
+    pdf_meta, split_docs, vectors = parse_result
+    pdf_meta["source"] = cloudinary_uri
+    manual_chunk_stats = chunk_stats(split_docs)
+    record_chunk_sizes(d.metadata.get("chunk_tokens") for d in split_docs)
+    log_event(
+        logger, logging.INFO, "ingest.chunk_stats", "Chunked %s into %d chunks",
+        filename, manual_chunk_stats["chunk_count"], **manual_chunk_stats
+    )
+
+    qr_uri, qr_public_id = qr_result if not isinstance(qr_result, BaseException) else (None, None)
+
+    # Insert metadata record in MongoDB
+    try:
+        if mongo_collection is None:
+            raise HTTPException(status_code=500, detail="MongoDB connection not available")
+
+        insert_doc = {
+            "company_name": company_name,
+            "product_name": product_name,
+            "uri": cloudinary_uri,
+            "cloudinary_public_id": cloudinary_public_id,
+            "filename": filename,
+            "qr_uri": qr_uri,
+            "qr_public_id": qr_public_id,
+            "content_hash": content_hash,
+            "chunk_stats": manual_chunk_stats,
+            "indexing": {"status": INDEXING_PENDING, "updated_at": datetime.utcnow()},
+        }
+        insert_result = await asyncio.to_thread(mongo_collection.insert_one, insert_doc)
+        inserted_id = str(insert_result.inserted_id)
+        await asyncio.to_thread(catalog_cache.invalidate, company_name)
+    except DuplicateKeyError:
+        # A concurrent upload of the same PDF won the insert
+        raise HTTPException(status_code=409, detail=f"{filename} was already uploaded")
+    except Exception as db_err:
+        raise HTTPException(status_code=500, detail=f"Database insert failed for {filename}: {db_err}")
+
+    attach_chunk_metadata(
+        split_docs, pdf_meta, company_name, product_name, product_code,
+        filename, inserted_id, cloudinary_uri
+    )
+
+    return {
+        "split_docs": split_docs,
+        "vectors": vectors,
+        "inserted_id": inserted_id,
+        "cloudinary_uri": cloudinary_uri,
+        "cloudinary_public_id": cloudinary_public_id,
+        "qr_uri": qr_uri,
+        "qr_public_id": qr_public_id,
+        "content_hash": content_hash,
+        "chunk_stats": manual_chunk_stats,
+    }
+
+async def store_ingested_chunks(ingested: dict) -> dict:
+    """
+    Upsert an ingested file's chunks into Qdrant, reusing the vectors computed
+    alongside the uploads. Failed batches go to the embedding retry queue;
+    returns the manual's indexing status.
+    """
+    split_docs = ingested["split_docs"]
+    if not split_docs:
+        if embedding_retry_queue is not None:
+            await asyncio.to_thread(embedding_retry_queue.record_indexing, ingested["inserted_id"], 0, 0)
+        return {"status": "complete", "total_chunks": 0, "indexed_chunks": 0, "pending_chunks": 0}
+    chunk_embeddings = PrecomputedEmbeddings(NVIDIANIMEmbeddings(priority=PRIORITY_INGESTION))
+    if ingested["vectors"]:
+        chunk_embeddings.add([d.page_content for d in split_docs], ingested["vectors"])
+    with time_ingest_stage("upsert"), start_span("qdrant.upsert", chunk_count=len(split_docs)):
+        failed_batches = await asyncio.to_thread(store_chunks_in_qdrant, split_docs, chunk_embeddings)
+    # Cached answers and the product's in-process vectors predate these chunks
+    company_name, product_name = split_docs[0].metadata["company_name"], split_docs[0].metadata["product_name"]
+    await asyncio.to_thread(invalidate_product_caches, company_name, product_name)
+
+    failed_chunks = sum(len(batch) for batch, _ in failed_batches)
+    if embedding_retry_queue is not None:
         try:
-            cloudinary_result = upload_to_cloudinary(
-                str(file_path), 
-                public_id=f"{company_name}_{resolved_product_name}_{file.filename}"
+            for batch, error in failed_batches:
+                await asyncio.to_thread(embedding_retry_queue.enqueue, ingested["inserted_id"], batch, error)
+            await asyncio.to_thread(
+                embedding_retry_queue.record_indexing, ingested["inserted_id"], len(split_docs), failed_chunks
             )
-            cloudinary_uri = cloudinary_result["secure_url"]
-            cloudinary_public_id = cloudinary_result["public_id"]
-            print(f"✅ File uploaded to Cloudinary: {cloudinary_uri}")
-        except Exception as e:
-            # Clean up local file if Cloudinary upload fails
-            if file_path.exists():
-                file_path.unlink()
-            raise HTTPException(status_code=500, detail=f"Failed to upload to Cloudinary: {str(e)}")
+        except Exception as queue_err:
+            logger.error("Could not queue %d failed chunks for retry: %s", failed_chunks, queue_err)
+    if failed_chunks:
+        log_event(
+            logger, logging.WARNING, "ingest.partial", "%d of %d chunks queued for retry",
+            failed_chunks, len(split_docs), db_id=ingested["inserted_id"]
+        )
+    return {
+        "status": "partial" if failed_chunks else "complete",
+        "total_chunks": len(split_docs),
+        "indexed_chunks": len(split_docs) - failed_chunks,
+        "pending_chunks": failed_chunks,
+    }
 
-        # Generate and upload QR code
-        qr_uri = None
-        qr_public_id = None
-        try:
-            qr_buffer = generate_qr_code(company_name, resolved_product_name, product_code)
-            qr_public_id = f"{company_name}_{resolved_product_name}_qr"
-            qr_result = upload_qr_to_cloudinary(qr_buffer, qr_public_id)
-            qr_uri = qr_result["secure_url"]
-            print(f"✅ QR code generated and uploaded to Cloudinary: {qr_uri}")
-        except Exception as e:
-            print(f"⚠️  QR code generation/upload failed: {e}")
-            # Continue without QR code - the upload will still succeed
-
-        # Insert metadata record in MongoDB
-        try:
-            if mongo_collection is None:
-                raise HTTPException(status_code=500, detail="MongoDB connection not available")
-            
-            insert_doc = {
+def invalidate_product_caches(company_name: str, product_name: str):
+    """Drop a product's cached answers and in-process vectors (blocking: shared store I/O)"""
+    chat.answer_cache.invalidate(company_name, product_name)
+    chat.hot_vectors.invalidate(company_name, product_name)
+
+def store_retry_batch(docs: list):
+    """Re-embed and upsert one queued batch, raising if it fails again"""
+    failed_batches = store_chunks_in_qdrant(docs, NVIDIANIMEmbeddings(priority=PRIORITY_INGESTION))
+    if failed_batches:
+        raise RuntimeError(failed_batches[0][1])
+    company_name, product_name = docs[0].metadata["company_name"], docs[0].metadata["product_name"]
+    invalidate_product_caches(company_name, product_name)
+
+embedding_retry_worker = (
+    EmbeddingRetryWorker(embedding_retry_queue, store_retry_batch)
+    if embedding_retry_queue is not None else None
+)
+
+# A manual still pending this long after its insert was interrupted before its chunks were stored
+INGEST_STALE_SECONDS = float(os.getenv("INGEST_STALE_SECONDS", "900"))
+
+def discard_unindexed_manual(existing: dict):
+    """Remove the record and any stored chunks of a manual whose ingestion never finished"""
+    db_id = str(existing["_id"])
+    qdrant_client = get_qdrant_client()
+    collection_name = get_collection_name()
+    if qdrant_client.collection_exists(collection_name):
+        qdrant_client.delete(
+            collection_name=collection_name,
+            points_selector=models.FilterSelector(filter=models.Filter(
+                must=[
+                    models.FieldCondition(
+                        key="metadata.db_id",
+                        match=models.MatchValue(value=db_id)
+                    )
+                ]
+            ))
+        )
+    if embedding_retry_queue is not None:
+        embedding_retry_queue.discard(db_id)
+    mongo_collection.delete_one({"_id": existing["_id"]})
+    catalog_cache.invalidate(existing.get("company_name"))
+    chat.hot_vectors.invalidate(existing.get("company_name"), existing.get("product_name"))
+
+def find_manual_by_hash(content_hash: str) -> dict | None:
+    """
+    Look up an indexed manual record with the same PDF content. Partially
+    indexed manuals count, the retry queue owns their remaining chunks.
+    Records whose indexing failed or was interrupted between the MongoDB
+    insert and the Qdrant upsert are discarded so the file is ingested again;
+    records from before indexing was tracked count as indexed.
+    """
+    if mongo_collection is None:
+        raise HTTPException(status_code=500, detail="MongoDB connection not available")
+    existing = mongo_collection.find_one({"content_hash": content_hash})
+    if existing is None:
+        return None
+    indexing = existing.get("indexing") or {}
+    status = indexing.get("status", INDEXING_COMPLETE)
+    if status in (INDEXING_COMPLETE, INDEXING_PARTIAL):
+        return existing
+    if status == INDEXING_PENDING:
+        updated_at = indexing.get("updated_at")
+        if updated_at is not None and datetime.utcnow() - updated_at < timedelta(seconds=INGEST_STALE_SECONDS):
+            raise HTTPException(status_code=409, detail=f"{existing.get('filename')} is still being indexed")
+    logger.info(f"Re-ingesting {existing['_id']} (indexing {status})")
+    discard_unindexed_manual(existing)
+    return None
+
+def link_duplicate_manual(
+    existing: dict,
+    company_name: str,
+    product_name: str,
+    product_code: str | None,
+    retag: bool
+) -> dict:
+    """
+    Resolve a duplicate upload to the existing manual record. With retag the
+    record and its Qdrant points are moved under the new company/product;
+    nothing is parsed, embedded or re-uploaded.
+    """
+    db_id = str(existing["_id"])
+    old_company = existing.get("company_name")
+    same_product = old_company == company_name and existing.get("product_name") == product_name
+
+    if retag and not same_product:
+        qr_uri, qr_public_id = generate_and_upload_qr(company_name, product_name, product_code)
+        mongo_collection.update_one(
+            {"_id": existing["_id"]},
+            {"$set": {
                 "company_name": company_name,
-                "product_name": resolved_product_name,
-                "uri": cloudinary_uri,
-                "cloudinary_public_id": cloudinary_public_id,
-                "filename": file.filename,
+                "product_name": product_name,
                 "qr_uri": qr_uri,
                 "qr_public_id": qr_public_id,
-            }
-            insert_result = mongo_collection.insert_one(insert_doc)
-            inserted_id = str(insert_result.inserted_id)
-            # update current company
-            global current_company_name
-            current_company_name = company_name
-        except Exception as db_err:
-            raise HTTPException(status_code=500, detail=f"Database insert failed: {db_err}")
-
-        # Extract core PDF metadata once per file
-        pdf_meta = {}
-        try:
-            reader = PdfReader(str(file_path))
-            info = reader.metadata or {}
-            # Normalize keys to match user-provided schema
-            pdf_meta["producer"] = info.get("/Producer") or info.get("producer")
-            pdf_meta["creator"] = info.get("/Creator") or info.get("creator")
-            pdf_meta["creationdate"] = info.get("/CreationDate") or info.get("creationdate")
-            pdf_meta["moddate"] = info.get("/ModDate") or info.get("moddate")
-            pdf_meta["total_pages"] = len(reader.pages)
-            pdf_meta["source"] = cloudinary_uri
-        except Exception:
-            pdf_meta = {"source": cloudinary_uri}
-
-        # Load PDF
-        loader = PyPDFLoader(file_path=str(file_path))
-        docs = loader.load()
-        # Attach metadata
-        for d in docs:
-            d.metadata = d.metadata or {}
-            d.metadata["company_name"] = company_name
-            d.metadata["product_name"] = resolved_product_name
-            d.metadata["product_code"] = product_code
-            # Override the source with Cloudinary URI (PyPDFLoader sets it to local path)
-            d.metadata["source"] = cloudinary_uri
-            # Merge core PDF metadata into page-level docs
-            for k, v in pdf_meta.items():
-                if v is not None:
-                    d.metadata[k] = v
-
-        # Chunk documents
-        text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=1000,
-            chunk_overlap=500
+            }}
         )
-        split_docs = text_splitter.split_documents(documents=docs)
-        for d in split_docs:
-            d.metadata = d.metadata or {}
-            d.metadata["product_name"] = resolved_product_name
-            d.metadata["filename"] = file.filename
-            d.metadata["db_id"] = inserted_id
-            d.metadata["company_name"] = company_name
-            d.metadata["product_code"] = product_code
-            # Ensure source is set to Cloudinary URI in chunks
-            d.metadata["source"] = cloudinary_uri
-            # Preserve page metadata and core PDF metadata into chunks
-            for k, v in pdf_meta.items():
-                if v is not None:
-                    d.metadata[k] = v
-
-        # Create embeddings and store in Qdrant with improved batch handling
         try:
-            embedding_model = NVIDIANIMEmbeddings()
-            
-            # Check if collection exists and create/recreate if needed
-            qdrant_client = QdrantClient(
-                url=os.getenv("QDRANT_URL"),
-                api_key=os.getenv("QDRANT_API_KEY")
+            qdrant_client = get_qdrant_client()
+            qdrant_client.set_payload(
+                collection_name=get_collection_name(),
+                payload={
+                    "company_name": company_name,
+                    "product_name": product_name,
+                    "product_code": product_code,
+                },
+                points=models.FilterSelector(filter=models.Filter(
+                    must=[
+                        models.FieldCondition(
+                            key="metadata.db_id",
+                            match=models.MatchValue(value=db_id)
+                        )
+                    ]
+                )),
+                key="metadata"
             )
-            
-            collections = qdrant_client.get_collections()
-            collection_exists = any(col.name == os.getenv("QDRANT_COLLECTION_NAME") for col in collections.collections)
-            
-            # Process documents in smaller batches to avoid timeout/memory issues
-            batch_size = 50  # Smaller batch size for better reliability
-            total_docs = len(split_docs)
-            print(f"📊 Processing {total_docs} document chunks in batches of {batch_size}")
-            
-            if not collection_exists:
-                print(f"🆕 Creating new {os.getenv('QDRANT_COLLECTION_NAME')} collection...")
-                # Create collection for first time with first batch
-                first_batch = split_docs[:batch_size]
-                vector_store = QdrantVectorStore.from_documents(
-                    documents=first_batch,
-                    url=os.getenv("QDRANT_URL"),
-                    api_key=os.getenv("QDRANT_API_KEY"),
-                    collection_name=os.getenv("QDRANT_COLLECTION_NAME"),
-                    embedding=embedding_model
-                )
-                print(f"✅ Created collection with first {len(first_batch)} documents")
-                
-                # Add remaining documents in batches
-                remaining_docs = split_docs[batch_size:]
-                if remaining_docs:
-                    for i in range(0, len(remaining_docs), batch_size):
-                        batch = remaining_docs[i:i + batch_size]
-                        try:
-                            vector_store.add_documents(batch)
-                            print(f"✅ Added batch {i//batch_size + 2}: {len(batch)} documents")
-                        except Exception as batch_err:
-                            print(f"⚠️  Batch {i//batch_size + 2} failed: {batch_err}")
-                            # Continue with next batch
-            else:
-                print(f"📚 Adding documents to existing {os.getenv('QDRANT_COLLECTION_NAME')} collection...")
-                # Add to existing collection
-                vector_store = QdrantVectorStore.from_existing_collection(
-                    url=os.getenv("QDRANT_URL"),
-                    api_key=os.getenv("QDRANT_API_KEY"),
-                    collection_name=os.getenv("QDRANT_COLLECTION_NAME"),
-                    embedding=embedding_model
-                )
-                
-                # Add documents in batches
-                for i in range(0, len(split_docs), batch_size):
-                    batch = split_docs[i:i + batch_size]
-                    try:
-                        vector_store.add_documents(batch)
-                        print(f"✅ Added batch {i//batch_size + 1}: {len(batch)} documents")
-                    except Exception as batch_err:
-                        print(f"⚠️  Batch {i//batch_size + 1} failed: {batch_err}")
-                        # Continue with next batch
-                
-            print("✅ All documents processed for Qdrant storage")
-                
+            logger.info(f"Re-tagged vectors of {db_id} under {company_name} - {product_name}")
         except Exception as qdrant_err:
-            print(f"⚠️  Qdrant storage failed: {qdrant_err}")
-            print("   Documents processed but not stored in vector database")
-            # Continue without Qdrant - the upload will still succeed
+            logger.warning(f"Qdrant re-tag failed for {db_id}: {qdrant_err}")
+        catalog_cache.invalidate(old_company)
+        catalog_cache.invalidate(company_name)
+        chat.answer_cache.invalidate(old_company, existing.get("product_name"))
+        chat.answer_cache.invalidate(company_name, product_name)
+        chat.hot_vectors.invalidate(old_company, existing.get("product_name"))
+        chat.hot_vectors.invalidate(company_name, product_name)
+        existing.update({
+            "company_name": company_name,
+            "product_name": product_name,
+            "qr_uri": qr_uri,
+            "qr_public_id": qr_public_id,
+        })
+
+    return {
+        "_id": db_id,
+        "company_name": existing.get("company_name"),
+        "product_name": existing.get("product_name"),
+        "uri": existing.get("uri"),
+        "cloudinary_public_id": existing.get("cloudinary_public_id"),
+        "qr_uri": existing.get("qr_uri"),
+        "qr_public_id": existing.get("qr_public_id"),
+        "content_hash": existing.get("content_hash"),
+    }
+
+# Uploaded files and the current company live in the shared store so every
+# worker answers /get_uploaded_files/ and /companies/current/ the same way
+UPLOADED_FILES_KEY = "uploaded_files"
+CURRENT_COMPANY_KEY = "current_company_name"
+
+def create_upload_workspace() -> Path:
+    """Isolated temp directory per upload so concurrent uploads never touch each other's files"""
+    return Path(tempfile.mkdtemp(prefix="upload_", dir=UPLOAD_DIR))
+
+class IndexingStatus(BaseModel):
+    status: str
+    total_chunks: int
+    indexed_chunks: int
+    pending_chunks: int
+
+class ManualRecord(BaseModel):
+    id: str = Field(alias="_id")
+    company_name: str | None = None
+    product_name: str | None = None
+    uri: str | None = None
+    cloudinary_public_id: str | None = None
+    qr_uri: str | None = None
+    qr_public_id: str | None = None
+    content_hash: str | None = None
+    # Only set for freshly ingested manuals, not duplicates
+    chunk_stats: dict | None = None
+    indexing: IndexingStatus | None = None
+
+class UploadResponse(BaseModel):
+    message: str
+    duplicate: bool
+    files: list[str]
+    db_record: ManualRecord
+
+class UploadResult(BaseModel):
+    filename: str
+    status: str
+    chunks: int | None = None
+    chunk_stats: dict | None = None
+    indexing: IndexingStatus | None = None
+    db_id: str | None = None
+    cloudinary_uri: str | None = None
+    qr_uri: str | None = None
+    content_hash: str | None = None
+    error: str | None = None
+
+class UploadBatchResponse(BaseModel):
+    message: str
+    files: list[str]
+    results: list[UploadResult]
+    total_chunks: int
+
+@app.post("/upload_pdf/", response_model=UploadResponse, response_model_exclude_unset=True)
+async def upload_pdf(
+    file: UploadFile = File(...),
+    company_name: str = Form(...),
+    product_name: str | None = Form(None),
+    product_code: str | None = Form(None),
+    retag: bool = Form(False)
+):
+    # Validate before touching the shared upload list or reading the body
+    # Determine product_name (fallback to product_code for backward compatibility)
+    resolved_product_name = product_name or product_code
+    if not resolved_product_name:
+        raise HTTPException(status_code=400, detail="product_name or product_code is required")
+
+    upload_dir = create_upload_workspace()
+    try:
+        await asyncio.to_thread(state_store.list_clear, UPLOADED_FILES_KEY)
+
+        # Stream uploaded file to disk for processing
+        file_path = upload_dir / Path(file.filename).name
+        content_hash = await save_upload_to_disk(file, file_path)
+
+        # Short-circuit re-uploads of a PDF we already have
+        existing = await asyncio.to_thread(find_manual_by_hash, content_hash)
+        if existing is not None:
+            if file_path.exists():
+                file_path.unlink()
+            db_record = await asyncio.to_thread(
+                link_duplicate_manual, existing, company_name, resolved_product_name, product_code, retag
+            )
+            logger.info(f"{file.filename} already uploaded as {db_record['_id']}, skipping ingestion")
+            return {
+                "message": f"PDF {file.filename} was already uploaded",
+                "duplicate": True,
+                "files": await asyncio.to_thread(state_store.list_get, UPLOADED_FILES_KEY),
+                "db_record": db_record
+            }
+
+        try:
+            ingested = await ingest_pdf_file(
+                file_path, file.filename, company_name, resolved_product_name, product_code,
+                content_hash=content_hash
+            )
+        except Exception:
+            # Clean up local file if any ingestion stage fails
+            if file_path.exists():
+                file_path.unlink()
+            raise
+
+        # update current company
+        await asyncio.to_thread(state_store.set, CURRENT_COMPANY_KEY, company_name)
+
+        # Store in Qdrant, reusing the vectors computed alongside the uploads
+        indexing = await store_ingested_chunks(ingested)
 
         # Clean up local file after successful processing
         try:
             if file_path.exists():
                 file_path.unlink()
-                print(f"✅ Local file {file.filename} cleaned up")
+                logger.info(f"Local file {file.filename} cleaned up")
         except Exception as cleanup_err:
-            print(f"⚠️  Local file cleanup failed: {cleanup_err}")
+            logger.warning(f"Local file cleanup failed: {cleanup_err}")
 
         # Add file to uploaded_files list
-        uploaded_files.append(file.filename)
+        await asyncio.to_thread(state_store.list_append, UPLOADED_FILES_KEY, file.filename)
         return {
             "message": f"PDF {file.filename} processed successfully",
-            "files": uploaded_files,
+            "duplicate": False,
+            "files": await asyncio.to_thread(state_store.list_get, UPLOADED_FILES_KEY),
             "db_record": {
-                "_id": inserted_id,
+                "_id": ingested["inserted_id"],
                 "company_name": company_name,
                 "product_name": resolved_product_name,
-                "uri": cloudinary_uri,
-                "cloudinary_public_id": cloudinary_public_id,
-                "qr_uri": qr_uri,
-                "qr_public_id": qr_public_id,
+                "uri": ingested["cloudinary_uri"],
+                "cloudinary_public_id": ingested["cloudinary_public_id"],
+                "qr_uri": ingested["qr_uri"],
+                "qr_public_id": ingested["qr_public_id"],
+                "content_hash": content_hash,
+                "chunk_stats": ingested["chunk_stats"],
+                "indexing": indexing,
             }
         }
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        shutil.rmtree(upload_dir, ignore_errors=True)
 
-@app.post("/upload_multiple_pdfs/")
+@app.post("/upload_multiple_pdfs/", response_model=UploadBatchResponse, response_model_exclude_unset=True)
 async def upload_multiple_pdfs(
     files: list[UploadFile] = File(...),
     company_name: str = Form(...),
     product_name: str | None = Form(None),
-    product_code: str | None = Form(None)
+    product_code: str | None = Form(None),
+    retag: bool = Form(False)
 ):
     """
     Upload multiple PDF files at once with improved batch processing
     """
+    # Validate before touching the shared upload list or reading any body
+    if not files:
+        raise HTTPException(status_code=400, detail="No files provided")
+
+    # Determine product_name (fallback to product_code for backward compatibility)
+    resolved_product_name = product_name or product_code
+    if not resolved_product_name:
+        raise HTTPException(status_code=400, detail="product_name or product_code is required")
+
+    upload_dir = create_upload_workspace()
     try:
-        if not files:
-            raise HTTPException(status_code=400, detail="No files provided")
-        
         # Clear previous uploads
-        for old_file in UPLOAD_DIR.iterdir():
-            if old_file.is_file():
-                old_file.unlink()
-        uploaded_files.clear()
-        
-        # Determine product_name (fallback to product_code for backward compatibility)
-        resolved_product_name = product_name or product_code
-        if not resolved_product_name:
-            raise HTTPException(status_code=400, detail="product_name or product_code is required")
+        await asyncio.to_thread(state_store.list_clear, UPLOADED_FILES_KEY)
         
         results = []
-        all_split_docs = []
+        total_chunks = 0
+        # Every file in the batch shares the same product QR code; upload it once,
+        # with the first file that is actually ingested
+        qr_task = None
         
-        # Process each file
+        # Process each file end to end so peak memory is bounded by one file
         for file in files:
+            file_path = upload_dir / Path(file.filename).name
             try:
-                # Save uploaded file temporarily for processing
-                file_path = UPLOAD_DIR / file.filename
-                with file_path.open("wb") as buffer:
-                    shutil.copyfileobj(file.file, buffer)
+                # Stream uploaded file to disk for processing
+                content_hash = await save_upload_to_disk(file, file_path)
                 
-                # Upload to Cloudinary
-                try:
-                    cloudinary_result = upload_to_cloudinary(
-                        str(file_path), 
-                        public_id=f"{company_name}_{resolved_product_name}_{file.filename}"
-                    )
-                    cloudinary_uri = cloudinary_result["secure_url"]
-                    cloudinary_public_id = cloudinary_result["public_id"]
-                    print(f"✅ File uploaded to Cloudinary: {cloudinary_uri}")
-                except Exception as e:
+                # Link duplicates to the existing record without any ingestion work
+                existing = await asyncio.to_thread(find_manual_by_hash, content_hash)
+                if existing is not None:
                     if file_path.exists():
                         file_path.unlink()
-                    raise HTTPException(status_code=500, detail=f"Failed to upload {file.filename} to Cloudinary: {str(e)}")
-
-                # Generate and upload QR code
-                qr_uri = None
-                qr_public_id = None
-                try:
-                    qr_buffer = generate_qr_code(company_name, resolved_product_name, product_code)
-                    qr_public_id = f"{company_name}_{resolved_product_name}_qr"
-                    qr_result = upload_qr_to_cloudinary(qr_buffer, qr_public_id)
-                    qr_uri = qr_result["secure_url"]
-                    print(f"✅ QR code generated and uploaded to Cloudinary: {qr_uri}")
-                except Exception as e:
-                    print(f"⚠️  QR code generation/upload failed for {file.filename}: {e}")
-                    # Continue without QR code - the upload will still succeed
-                
-                # Insert metadata record in MongoDB
-                try:
-                    if mongo_collection is None:
-                        raise HTTPException(status_code=500, detail="MongoDB connection not available")
-                    
-                    insert_doc = {
-                        "company_name": company_name,
-                        "product_name": resolved_product_name,
-                        "uri": cloudinary_uri,
-                        "cloudinary_public_id": cloudinary_public_id,
+                    db_record = await asyncio.to_thread(
+                        link_duplicate_manual, existing, company_name, resolved_product_name, product_code, retag
+                    )
+                    results.append({
                         "filename": file.filename,
-                        "qr_uri": qr_uri,
-                        "qr_public_id": qr_public_id,
-                    }
-                    insert_result = mongo_collection.insert_one(insert_doc)
-                    inserted_id = str(insert_result.inserted_id)
-                except Exception as db_err:
-                    raise HTTPException(status_code=500, detail=f"Database insert failed for {file.filename}: {db_err}")
-                
-                # Extract core PDF metadata
-                pdf_meta = {}
-                try:
-                    reader = PdfReader(str(file_path))
-                    info = reader.metadata or {}
-                    pdf_meta["producer"] = info.get("/Producer") or info.get("producer")
-                    pdf_meta["creator"] = info.get("/Creator") or info.get("creator")
-                    pdf_meta["creationdate"] = info.get("/CreationDate") or info.get("creationdate")
-                    pdf_meta["moddate"] = info.get("/ModDate") or info.get("moddate")
-                    pdf_meta["total_pages"] = len(reader.pages)
-                    pdf_meta["source"] = cloudinary_uri
-                except Exception:
-                    pdf_meta = {"source": cloudinary_uri}
-                
-                # Load PDF
-                loader = PyPDFLoader(file_path=str(file_path))
-                docs = loader.load()
-                
-                # Attach metadata
-                for d in docs:
-                    d.metadata = d.metadata or {}
-                    d.metadata["company_name"] = company_name
-                    d.metadata["product_name"] = resolved_product_name
-                    d.metadata["product_code"] = product_code
-                    d.metadata["source"] = cloudinary_uri
-                    d.metadata["db_id"] = inserted_id
-                    d.metadata["filename"] = file.filename
-                    # Merge core PDF metadata
-                    for k, v in pdf_meta.items():
-                        if v is not None:
-                            d.metadata[k] = v
+                        "status": "duplicate",
+                        "chunks": 0,
+                        "db_id": db_record["_id"],
+                        "cloudinary_uri": db_record["uri"],
+                        "qr_uri": db_record["qr_uri"],
+                        "content_hash": content_hash
+                    })
+                    continue
                 
-                # Chunk documents
-                text_splitter = RecursiveCharacterTextSplitter(
-                    chunk_size=1000,
-                    chunk_overlap=500
+                if qr_task is None:
+                    qr_task = asyncio.ensure_future(asyncio.to_thread(
+                        generate_and_upload_qr, company_name, resolved_product_name, product_code
+                    ))
+                ingested = await ingest_pdf_file(
+                    file_path, file.filename, company_name, resolved_product_name, product_code,
+                    content_hash=content_hash,
+                    qr_task=qr_task
                 )
-                split_docs = text_splitter.split_documents(documents=docs)
-                
-                # Add metadata to chunks
-                for d in split_docs:
-                    d.metadata = d.metadata or {}
-                    d.metadata["product_name"] = resolved_product_name
-                    d.metadata["filename"] = file.filename
-                    d.metadata["db_id"] = inserted_id
-                    d.metadata["company_name"] = company_name
-                    d.metadata["product_code"] = product_code
-                    d.metadata["source"] = cloudinary_uri
-                    # Preserve page metadata and core PDF metadata
-                    for k, v in pdf_meta.items():
-                        if v is not None:
-                            d.metadata[k] = v
+                chunk_count = len(ingested["split_docs"])
                 
-                all_split_docs.extend(split_docs)
-                uploaded_files.append(file.filename)
+                # Flush this file's chunks to Qdrant before moving on
+                indexing = await store_ingested_chunks(ingested)
+                total_chunks += chunk_count
+                await asyncio.to_thread(state_store.list_append, UPLOADED_FILES_KEY, file.filename)
                 
                 # Clean up local file
                 if file_path.exists():
@@ -538,11 +932,15 @@ async def upload_multiple_pdfs(
                 results.append({
                     "filename": file.filename,
                     "status": "success",
-                    "chunks": len(split_docs),
-                    "db_id": inserted_id,
-                    "cloudinary_uri": cloudinary_uri,
-                    "qr_uri": qr_uri
+                    "chunks": chunk_count,
+                    "chunk_stats": ingested["chunk_stats"],
+                    "indexing": indexing,
+                    "db_id": ingested["inserted_id"],
+                    "cloudinary_uri": ingested["cloudinary_uri"],
+                    "qr_uri": ingested["qr_uri"],
+                    "content_hash": content_hash
                 })
+                del ingested
                 
             except Exception as file_err:
                 results.append({
@@ -551,195 +949,345 @@ async def upload_multiple_pdfs(
                     "error": str(file_err)
                 })
                 # Clean up on error
-                if 'file_path' in locals() and file_path.exists():
+                if file_path.exists():
                     file_path.unlink()
         
-        # Batch process all documents for Qdrant
-        if all_split_docs:
-            try:
-                embedding_model = NVIDIANIMEmbeddings()
-                
-                qdrant_client = QdrantClient(
-                    url=os.getenv("QDRANT_URL"),
-                    api_key=os.getenv("QDRANT_API_KEY")
-                )
-                
-                collections = qdrant_client.get_collections()
-                collection_exists = any(col.name == os.getenv("QDRANT_COLLECTION_NAME") for col in collections.collections)
-                
-                batch_size = 50
-                total_docs = len(all_split_docs)
-                print(f"📊 Processing {total_docs} document chunks from {len(files)} files in batches of {batch_size}")
-                
-                if not collection_exists:
-                    print(f"🆕 Creating new {os.getenv('QDRANT_COLLECTION_NAME')} collection...")
-                    first_batch = all_split_docs[:batch_size]
-                    vector_store = QdrantVectorStore.from_documents(
-                        documents=first_batch,
-                        url=os.getenv("QDRANT_URL"),
-                        api_key=os.getenv("QDRANT_API_KEY"),
-                        collection_name=os.getenv("QDRANT_COLLECTION_NAME"),
-                        embedding=embedding_model
-                    )
-                    print(f"✅ Created collection with first {len(first_batch)} documents")
-                    
-                    remaining_docs = all_split_docs[batch_size:]
-                    if remaining_docs:
-                        for i in range(0, len(remaining_docs), batch_size):
-                            batch = remaining_docs[i:i + batch_size]
-                            try:
-                                vector_store.add_documents(batch)
-                                print(f"✅ Added batch {i//batch_size + 2}: {len(batch)} documents")
-                            except Exception as batch_err:
-                                print(f"⚠️  Batch {i//batch_size + 2} failed: {batch_err}")
-                else:
-                    print(f"📚 Adding documents to existing {os.getenv('QDRANT_COLLECTION_NAME')} collection...")
-                    vector_store = QdrantVectorStore.from_existing_collection(
-                        url=os.getenv("QDRANT_URL"),
-                        api_key=os.getenv("QDRANT_API_KEY"),
-                        collection_name=os.getenv("QDRANT_COLLECTION_NAME"),
-                        embedding=embedding_model
-                    )
-                    
-                    for i in range(0, len(all_split_docs), batch_size):
-                        batch = all_split_docs[i:i + batch_size]
-                        try:
-                            vector_store.add_documents(batch)
-                            print(f"✅ Added batch {i//batch_size + 1}: {len(batch)} documents")
-                        except Exception as batch_err:
-                            print(f"⚠️  Batch {i//batch_size + 1} failed: {batch_err}")
-                
-                print("✅ All documents processed for Qdrant storage")
-                
-            except Exception as qdrant_err:
-                print(f"⚠️  Qdrant storage failed: {qdrant_err}")
-        
         # Update current company
-        global current_company_name
-        current_company_name = company_name
+        await asyncio.to_thread(state_store.set, CURRENT_COMPANY_KEY, company_name)
         
         return {
             "message": f"Processed {len(files)} files",
-            "files": uploaded_files,
+            "files": await asyncio.to_thread(state_store.list_get, UPLOADED_FILES_KEY),
             "results": results,
-            "total_chunks": len(all_split_docs)
+            "total_chunks": total_chunks
         }
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        shutil.rmtree(upload_dir, ignore_errors=True)
 
-@app.get("/get_uploaded_files/")
+class UploadedFilesResponse(BaseModel):
+    files: list[str]
+
+class RemoveFileResponse(BaseModel):
+    message: str
+    files: list[str]
+
+@app.get("/get_uploaded_files/", response_model=UploadedFilesResponse)
 async def get_uploaded_files():
-    return {"files": uploaded_files}
+    return {"files": await asyncio.to_thread(state_store.list_get, UPLOADED_FILES_KEY)}
 
-@app.post("/remove_file/")
+@app.post("/remove_file/", response_model=RemoveFileResponse)
 async def remove_file(file_name: str):
-    global uploaded_files
-    if file_name in uploaded_files:
-        file_path = UPLOAD_DIR / file_name
-        if file_path.exists():
-            file_path.unlink()  # Remove the file from disk
-        uploaded_files.remove(file_name)
-        return {"message": f"File {file_name} removed successfully", "files": uploaded_files}
+    # Temp files are removed with their upload workspace; only the listing remains
+    if await asyncio.to_thread(state_store.list_remove, UPLOADED_FILES_KEY, file_name):
+        files = await asyncio.to_thread(state_store.list_get, UPLOADED_FILES_KEY)
+        return {"message": f"File {file_name} removed successfully", "files": files}
     raise HTTPException(status_code=400, detail="File not found")
 
 # -----------------------------
 # New APIs: companies and models
 # -----------------------------
-@app.get("/companies/")
-async def list_companies():
+# Fields returned by the catalog endpoints; keeps MongoDB from shipping full documents
+CATALOG_MODEL_PROJECTION = {
+    "_id": 1,
+    "company_name": 1,
+    "product_name": 1,
+    "filename": 1,
+    "uri": 1,
+    "qr_uri": 1,
+}
+
+class CompaniesResponse(BaseModel):
+    companies: list[str]
+
+class CurrentCompanyResponse(BaseModel):
+    company_name: str | None
+
+class CatalogModel(BaseModel):
+    id: str = Field(alias="_id")
+    company_name: str | None = None
+    product_name: str | None = None
+    filename: str | None = None
+    uri: str | None = None
+    qr_uri: str | None = None
+
+class CatalogModelsResponse(BaseModel):
+    models: list[CatalogModel]
+    # Only set on paginated requests
+    next_cursor: str | None = None
+
+def catalog_response(response: Response, payload: dict, etag: str, if_none_match: str | None):
+    """Attach caching headers and answer 304 when the client already has this version"""
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers={"ETag": etag, "Cache-Control": "no-cache"})
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = "no-cache"
+    return payload
+
+@app.get("/companies/", response_model=CompaniesResponse)
+async def list_companies(response: Response, if_none_match: str | None = Header(None)):
     try:
         if mongo_collection is None:
             raise HTTPException(status_code=500, detail="MongoDB connection not available")
-        companies = mongo_collection.distinct("company_name")
-        return {"companies": companies}
+
+        def load_companies():
+            return {"companies": mongo_collection.distinct("company_name")}
+
+        payload, etag = await asyncio.to_thread(catalog_cache.get, "companies", load_companies)
+        return catalog_response(response, payload, etag, if_none_match)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-@app.get("/companies/current/")
+@app.get("/companies/current/", response_model=CurrentCompanyResponse)
 async def current_company():
     try:
-        # Prefer in-memory last uploaded; fallback to latest in DB
+        # Prefer the last uploaded company from shared state; fallback to latest in DB
+        current_company_name = await asyncio.to_thread(state_store.get, CURRENT_COMPANY_KEY)
         if current_company_name:
             return {"company_name": current_company_name}
         if mongo_collection is None:
             raise HTTPException(status_code=500, detail="MongoDB connection not available")
-        doc = mongo_collection.find_one(sort=[("_id", -1)])
+        doc = await asyncio.to_thread(mongo_collection.find_one, sort=[("_id", -1)], projection={"company_name": 1})
         return {"company_name": (doc or {}).get("company_name")}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-@app.get("/companies/{company}/models/")
-async def list_models_for_company(company: str):
+# Page size bounds for paginated catalog listings
+CATALOG_PAGE_SIZE_MAX = 200
+CATALOG_EXPORT_BATCH_SIZE = 500
+
+def serialize_model_doc(doc: dict) -> dict:
+    """Convert a manual document into the catalog model shape"""
+    return {
+        "_id": str(doc.get("_id")),
+        "company_name": doc.get("company_name"),
+        "product_name": doc.get("product_name"),
+        "filename": doc.get("filename"),
+        "uri": doc.get("uri"),
+        "qr_uri": doc.get("qr_uri"),
+    }
+
+def parse_object_id_cursor(cursor: str) -> ObjectId:
+    """Decode a pagination cursor (the last seen _id)"""
+    if not ObjectId.is_valid(cursor):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return ObjectId(cursor)
+
+@app.get("/companies/{company}/models/", response_model=CatalogModelsResponse, response_model_exclude_unset=True)
+async def list_models_for_company(
+    company: str,
+    response: Response,
+    cursor: str | None = None,
+    limit: int | None = Query(None, ge=1, le=CATALOG_PAGE_SIZE_MAX),
+    if_none_match: str | None = Header(None)
+):
+    """
+    List manuals for a company. Without cursor/limit the full cached catalog is
+    returned; otherwise results are paginated by _id and include next_cursor.
+    """
     try:
         if mongo_collection is None:
             raise HTTPException(status_code=500, detail="MongoDB connection not available")
-        cursor = mongo_collection.find({"company_name": company})
-        models = []
-        async_unsupported = []  # placeholder to keep structure clear
-        for doc in cursor:
-            models.append({
-                "_id": str(doc.get("_id")),
-                "company_name": doc.get("company_name"),
-                "product_name": doc.get("product_name"),
-                "filename": doc.get("filename"),
-                "uri": doc.get("uri"),
-                "qr_uri": doc.get("qr_uri"),
-            })
-        return {"models": models}
+
+        if cursor is None and limit is None:
+            def load_models():
+                docs = mongo_collection.find({"company_name": company}, CATALOG_MODEL_PROJECTION)
+                return {"models": [serialize_model_doc(doc) for doc in docs]}
+
+            payload, etag = await asyncio.to_thread(catalog_cache.get, f"models:{company}", load_models)
+            return catalog_response(response, payload, etag, if_none_match)
+
+        page_size = limit or CATALOG_PAGE_SIZE_MAX
+        mongo_filter = {"company_name": company}
+        if cursor is not None:
+            mongo_filter["_id"] = {"$gt": parse_object_id_cursor(cursor)}
+
+        # Fetch one extra document to know whether another page exists
+        docs = await asyncio.to_thread(lambda: list(
+            mongo_collection.find(mongo_filter, CATALOG_MODEL_PROJECTION)
+            .sort("_id", 1)
+            .limit(page_size + 1)
+        ))
+        has_more = len(docs) > page_size
+        docs = docs[:page_size]
+        return {
+            "models": [serialize_model_doc(doc) for doc in docs],
+            "next_cursor": str(docs[-1]["_id"]) if has_more else None,
+        }
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
-1
-@app.post("/generate_qr_for_existing/")
+
+@app.get("/companies/{company}/models/export")
+async def export_models_for_company(company: str):
+    """Stream every manual of a company as NDJSON, one model per line"""
+    if mongo_collection is None:
+        raise HTTPException(status_code=500, detail="MongoDB connection not available")
+
+    def generate():
+        docs = (
+            mongo_collection.find({"company_name": company}, CATALOG_MODEL_PROJECTION)
+            .sort("_id", 1)
+            .batch_size(CATALOG_EXPORT_BATCH_SIZE)
+        )
+        for doc in docs:
+            yield orjson.dumps(serialize_model_doc(doc)) + b"\n"
+
+    return StreamingResponse(generate(), media_type="application/x-ndjson")
+
+# QR backfill jobs run in the worker that started them; progress snapshots
+# are published to the shared store so any worker can report them
+QR_BACKFILL_CONCURRENCY = int(os.getenv("QR_BACKFILL_CONCURRENCY", "4"))
+QR_BACKFILL_WRITE_BATCH = 200
+qr_backfill_tasks: dict[str, asyncio.Task] = {}
+
+def publish_qr_job(job: dict):
+    """Write a QR backfill progress snapshot to the shared store"""
+    state_store.set(f"qr_backfill:{job['job_id']}", job)
+
+def flush_qr_updates(batch: list) -> int:
+    """Write a batch of QR updates to MongoDB in a single bulk_write"""
+    if not batch:
+        return 0
+    return mongo_collection.bulk_write(batch, ordered=False).modified_count
+
+async def run_qr_backfill(job: dict):
+    """
+    Generate QR codes for documents missing them with bounded parallelism.
+    Documents sharing a QR public_id are handled by one worker in sequence so
+    uploads to the same Cloudinary asset never race each other.
+    """
+    try:
+        docs = await asyncio.to_thread(lambda: list(mongo_collection.find(
+            {"qr_uri": {"$exists": False}},
+            {"_id": 1, "company_name": 1, "product_name": 1, "filename": 1}
+        )))
+        groups: dict[str, list] = {}
+        for doc in docs:
+            company_name = doc.get("company_name")
+            product_name = doc.get("product_name")
+            if not all([company_name, product_name]):
+                job["skipped"] += 1
+                continue
+            groups.setdefault(f"{company_name}_{product_name}_qr", []).append(doc)
+        job["total"] = sum(len(group) for group in groups.values())
+
+        semaphore = asyncio.Semaphore(QR_BACKFILL_CONCURRENCY)
+        pending_updates = []
+        write_lock = asyncio.Lock()
+
+        async def flush_pending():
+            async with write_lock:
+                # Taken on the event loop: updates queued while the write runs wait for the next flush
+                batch, pending_updates[:] = pending_updates[:], []
+                job["updated_count"] += await asyncio.to_thread(flush_qr_updates, batch)
+
+        async def process_group(qr_public_id: str, group: list):
+            async with semaphore:
+                # One upload per distinct (company, product, code) payload
+                uploaded: dict[tuple, str] = {}
+                for doc in group:
+                    payload = (doc["company_name"], doc["product_name"], doc.get("filename"))
+                    try:
+                        if payload not in uploaded:
+                            qr_buffer = generate_qr_code(*payload)
+                            qr_result = await asyncio.to_thread(upload_qr_to_cloudinary, qr_buffer, qr_public_id)
+                            uploaded[payload] = qr_result["secure_url"]
+                        pending_updates.append(UpdateOne(
+                            {"_id": doc["_id"]},
+                            {"$set": {"qr_uri": uploaded[payload], "qr_public_id": qr_public_id}}
+                        ))
+                    except Exception as e:
+                        job["failed"] += 1
+                        logger.warning(f"Failed to generate QR for {payload[0]} - {payload[1]}: {e}")
+                    job["processed"] += 1
+
+                    if len(pending_updates) >= QR_BACKFILL_WRITE_BATCH:
+                        await flush_pending()
+                await asyncio.to_thread(publish_qr_job, job)
+
+        await asyncio.gather(*(process_group(public_id, group) for public_id, group in groups.items()))
+        await flush_pending()
+
+        if job["updated_count"]:
+            await asyncio.to_thread(catalog_cache.invalidate)
+        job["status"] = "completed"
+        job["message"] = f"Generated QR codes for {job['updated_count']} existing entries"
+        logger.info(f"QR backfill {job['job_id']} finished: {job['updated_count']} updated, {job['failed']} failed")
+    except Exception as e:
+        job["status"] = "failed"
+        job["message"] = f"QR generation failed: {str(e)}"
+        logger.warning(f"QR backfill {job['job_id']} failed: {e}")
+    finally:
+        job["finished_at"] = datetime.now().isoformat()
+        await asyncio.to_thread(publish_qr_job, job)
+        qr_backfill_tasks.pop(job["job_id"], None)
+
+class QrBackfillJob(BaseModel):
+    job_id: str
+    status: str
+    message: str
+    total: int | None
+    processed: int
+    updated_count: int
+    failed: int
+    skipped: int
+    started_at: str
+    finished_at: str | None
+
+@app.post("/generate_qr_for_existing/", response_model=QrBackfillJob)
 async def generate_qr_for_existing():
     """
-    Generate QR codes for existing entries that don't have them
+    Start a background job generating QR codes for existing entries that don't
+    have them. Poll /generate_qr_for_existing/{job_id} for progress.
     """
     try:
         if mongo_collection is None:
             raise HTTPException(status_code=500, detail="MongoDB connection not available")
-        
-        # Find documents without QR codes
-        cursor = mongo_collection.find({"qr_uri": {"$exists": False}})
-        updated_count = 0
-        
-        for doc in cursor:
-            try:
-                company_name = doc.get("company_name")
-                product_name = doc.get("product_name")
-                filename = doc.get("filename")
-                
-                if not all([company_name, product_name]):
-                    continue
-                
-                # Generate QR code
-                qr_buffer = generate_qr_code(company_name, product_name, filename)
-                qr_public_id = f"{company_name}_{product_name}_qr"
-                qr_result = upload_qr_to_cloudinary(qr_buffer, qr_public_id)
-                qr_uri = qr_result["secure_url"]
-                
-                # Update document with QR code
-                mongo_collection.update_one(
-                    {"_id": doc["_id"]},
-                    {"$set": {"qr_uri": qr_uri, "qr_public_id": qr_public_id}}
-                )
-                
-                updated_count += 1
-                print(f"✅ Generated QR code for {company_name} - {product_name}: {qr_uri}")
-                
-            except Exception as e:
-                print(f"⚠️  Failed to generate QR for {doc.get('company_name')} - {doc.get('product_name')}: {e}")
-                continue
-        
-        return {
-            "message": f"Generated QR codes for {updated_count} existing entries",
-            "updated_count": updated_count
+
+        job_id = uuid.uuid4().hex
+        job = {
+            "job_id": job_id,
+            "status": "running",
+            "message": "QR backfill started",
+            "total": None,
+            "processed": 0,
+            "updated_count": 0,
+            "failed": 0,
+            "skipped": 0,
+            "started_at": datetime.now().isoformat(),
+            "finished_at": None,
         }
-        
+        await asyncio.to_thread(publish_qr_job, job)
+        qr_backfill_tasks[job_id] = asyncio.create_task(run_qr_backfill(job))
+        return job
+
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"QR generation failed: {str(e)}")
 
-@app.delete("/delete_manual/")
+@app.get("/generate_qr_for_existing/{job_id}", response_model=QrBackfillJob)
+async def qr_backfill_status(job_id: str):
+    """Report progress of a QR backfill job"""
+    job = await asyncio.to_thread(state_store.get, f"qr_backfill:{job_id}")
+    if job is None:
+        raise HTTPException(status_code=404, detail="QR backfill job not found")
+    return job
+
+class DeleteManualResponse(BaseModel):
+    message: str
+    mongo_deleted: int
+    cloudinary_deleted: bool
+    product_name: str
+    product_code: str
+
+@app.delete("/delete_manual/", response_model=DeleteManualResponse)
 async def delete_manual(
     product_name: str = Form(...),
     product_code: str = Form(...)
@@ -752,7 +1300,7 @@ async def delete_manual(
             raise HTTPException(status_code=500, detail="MongoDB connection not available")
         
         # Find the document in MongoDB first
-        mongo_doc = mongo_collection.find_one({
+        mongo_doc = await asyncio.to_thread(mongo_collection.find_one, {
             "product_name": product_name,
             "filename": product_code  # product_code is stored as filename in MongoDB
         })
@@ -764,32 +1312,33 @@ async def delete_manual(
         cloudinary_public_id = mongo_doc.get("cloudinary_public_id")
         
         # Delete from MongoDB
-        mongo_result = mongo_collection.delete_one({
+        mongo_result = await asyncio.to_thread(mongo_collection.delete_one, {
             "product_name": product_name,
             "filename": product_code
         })
         
         if mongo_result.deleted_count == 0:
             raise HTTPException(status_code=404, detail="Failed to delete from MongoDB")
+        await asyncio.to_thread(catalog_cache.invalidate, mongo_doc.get("company_name"))
+        await asyncio.to_thread(invalidate_product_caches, mongo_doc.get("company_name"), product_name)
+        if embedding_retry_queue is not None:
+            await asyncio.to_thread(embedding_retry_queue.discard, str(mongo_doc["_id"]))
         
         # Delete from Cloudinary if public_id exists
         cloudinary_deleted = False
         if cloudinary_public_id:
             try:
-                cloudinary_deleted = delete_from_cloudinary(cloudinary_public_id)
+                cloudinary_deleted = await asyncio.to_thread(delete_from_cloudinary, cloudinary_public_id)
                 if cloudinary_deleted:
-                    print(f"✅ File deleted from Cloudinary: {cloudinary_public_id}")
+                    logger.info(f"File deleted from Cloudinary: {cloudinary_public_id}")
                 else:
-                    print(f"⚠️  Failed to delete from Cloudinary: {cloudinary_public_id}")
+                    logger.warning(f"Failed to delete from Cloudinary: {cloudinary_public_id}")
             except Exception as cloudinary_err:
-                print(f"⚠️  Cloudinary deletion error: {cloudinary_err}")
+                logger.warning(f"Cloudinary deletion error: {cloudinary_err}")
         
         # Delete from Qdrant DB using metadata filter
         try:
-            qdrant_client = QdrantClient(
-                url=os.getenv("QDRANT_URL"),
-                api_key=os.getenv("QDRANT_API_KEY")
-            )
+            qdrant_client = get_qdrant_client()
             
             # Try multiple approaches to find and delete the points
             deletion_successful = False
@@ -797,7 +1346,7 @@ async def delete_manual(
             # Approach 1: Use db_id from MongoDB document
             if mongo_doc and "_id" in mongo_doc:
                 db_id = str(mongo_doc["_id"])
-                print(f"🔍 Trying deletion with db_id: {db_id}")
+                logger.info(f"Trying deletion with db_id: {db_id}")
                 
                 db_id_filter = models.Filter(
                     must=[
@@ -809,25 +1358,25 @@ async def delete_manual(
                 )
                 
                 search_result = qdrant_client.scroll(
-                    collection_name=os.getenv("QDRANT_COLLECTION_NAME"),
+                    collection_name=get_collection_name(),
                     scroll_filter=db_id_filter,
                     limit=10
                 )
                 
                 points_found = len(search_result[0]) if search_result[0] else 0
-                print(f"📊 Found {points_found} points with db_id={db_id}")
+                logger.info(f"Found {points_found} points with db_id={db_id}")
                 
                 if points_found > 0:
                     delete_result = qdrant_client.delete(
-                        collection_name=os.getenv("QDRANT_COLLECTION_NAME"),
+                        collection_name=get_collection_name(),
                         points_selector=models.FilterSelector(filter=db_id_filter)
                     )
-                    print(f"✅ Deleted {points_found} points using db_id with operation ID: {delete_result.operation_id}")
+                    logger.info(f"Deleted {points_found} points using db_id with operation ID: {delete_result.operation_id}")
                     deletion_successful = True
             
             # Approach 2: Use product_name and filename if db_id approach didn't work
             if not deletion_successful:
-                print(f"🔍 Trying deletion with product_name and filename: {product_name}, {product_code}")
+                logger.info(f"Trying deletion with product_name and filename: {product_name}, {product_code}")
                 
                 qdrant_filter = models.Filter(
                     must=[
@@ -843,27 +1392,27 @@ async def delete_manual(
                 )
                 
                 search_result = qdrant_client.scroll(
-                    collection_name=os.getenv("QDRANT_COLLECTION_NAME"),
+                    collection_name=get_collection_name(),
                     scroll_filter=qdrant_filter,
                     limit=10
                 )
                 
                 points_found = len(search_result[0]) if search_result[0] else 0
-                print(f"📊 Found {points_found} points with product_name={product_name}, filename={product_code}")
+                logger.info(f"Found {points_found} points with product_name={product_name}, filename={product_code}")
                 
                 if points_found > 0:
                     delete_result = qdrant_client.delete(
-                        collection_name=os.getenv("QDRANT_COLLECTION_NAME"),
+                        collection_name=get_collection_name(),
                         points_selector=models.FilterSelector(filter=qdrant_filter)
                     )
-                    print(f"\n\n\n\n\n\n\n\n\n\nn\n\n✅ Deleted {points_found} points using product_name/filename with operation ID: {delete_result.operation_id}\n\n\n\n\n\n\n\n\n\n\n\n\n")
+                    logger.info(f"Deleted {points_found} points using product_name/filename with operation ID: {delete_result.operation_id}")
                     deletion_successful = True
             
             if not deletion_successful:
-                print("⚠️  No points found in Qdrant matching any filter criteria")
+                logger.warning("No points found in Qdrant matching any filter criteria")
             
         except Exception as qdrant_err:
-            print(f"⚠️  Qdrant deletion failed: {qdrant_err}")
+            logger.warning(f"Qdrant deletion failed: {qdrant_err}")
             # Continue even if Qdrant deletion fails - MongoDB deletion succeeded
             # This ensures data consistency where MongoDB is the source of truth
         
@@ -880,66 +1429,99 @@ async def delete_manual(
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Delete operation failed: {str(e)}")
 
+class EmbeddingRetryStatusResponse(BaseModel):
+    queue: dict[str, int]
+    incomplete_manuals: list[dict]
+
+@app.get("/embedding_retry/status/", response_model=EmbeddingRetryStatusResponse)
+async def embedding_retry_status(limit: int = Query(50, ge=1, le=500)):
+    """Retry queue counts and the manuals whose chunks are not all searchable yet"""
+    if embedding_retry_queue is None:
+        raise HTTPException(status_code=500, detail="MongoDB connection not available")
+    queue = await asyncio.to_thread(embedding_retry_queue.stats)
+    cursor = mongo_collection.find(
+        {"indexing.status": {"$in": ["partial", "failed"]}},
+        {"company_name": 1, "product_name": 1, "filename": 1, "indexing": 1}
+    ).limit(limit)
+    incomplete = await asyncio.to_thread(list, cursor)
+    for doc in incomplete:
+        doc["_id"] = str(doc["_id"])
+    return {"queue": queue, "incomplete_manuals": incomplete}
+
+@app.get("/metrics")
+async def metrics_endpoint():
+    """Prometheus scrape endpoint"""
+    body, content_type = render_metrics()
+    return Response(content=body, media_type=content_type)
+
+def probe_mongodb():
+    """Background probe for MongoDB"""
+    if mongo_client is None:
+        raise RuntimeError("MongoDB client not initialized")
+    mongo_client.admin.command('ping')
+
+class LivenessResponse(BaseModel):
+    status: str
+
+@app.get("/health/live", response_model=LivenessResponse)
+async def liveness():
+    """Liveness: the process is up and serving requests"""
+    return {"status": "alive"}
+
+@app.get("/health/ready")
+async def readiness():
+    """Readiness: served from the background probe snapshot, never calls dependencies"""
+    snapshot = health_monitor.snapshot()
+    return ORJSONResponse(status_code=200 if health_monitor.is_ready() else 503, content=snapshot)
+
 @app.get("/health/")
 async def health_check():
-    """Health check endpoint to verify all services are working"""
-    health_status = {
-        "status": "healthy",
-        "timestamp": datetime.now().isoformat(),
-        "services": {}
-    }
-    
-    # Check MongoDB
-    try:
-        if mongo_client:
-            mongo_client.admin.command('ping')
-            health_status["services"]["mongodb"] = "connected"
-        else:
-            health_status["services"]["mongodb"] = "disconnected"
-    except Exception as e:
-        health_status["services"]["mongodb"] = f"error: {str(e)}"
+    """Health status from the cached probe snapshot plus service configuration"""
+    health_status = health_monitor.snapshot()
+    health_status["timestamp"] = datetime.now().isoformat()
+    health_status["configuration"] = {}
     
     # Check Cloudinary
     try:
         cloudinary_name = os.getenv("CLOUDINARY_CLOUD_NAME")
         if cloudinary_name:
-            health_status["services"]["cloudinary"] = "configured"
+            health_status["configuration"]["cloudinary"] = "configured"
         else:
-            health_status["services"]["cloudinary"] = "not_configured"
+            health_status["configuration"]["cloudinary"] = "not_configured"
     except Exception as e:
-        health_status["services"]["cloudinary"] = f"error: {str(e)}"
+        health_status["configuration"]["cloudinary"] = f"error: {str(e)}"
     
     # Check Qdrant
     try:
-        qdrant_url = os.getenv("QDRANT_URL")
-        qdrant_key = os.getenv("QDRANT_API_KEY")
-        if qdrant_url and qdrant_key:
-            health_status["services"]["qdrant"] = "configured"
+        if backend_configured():
+            health_status["configuration"]["qdrant"] = "configured"
         else:
-            health_status["services"]["qdrant"] = "not_configured"
+            health_status["configuration"]["qdrant"] = "not_configured"
     except Exception as e:
-        health_status["services"]["qdrant"] = f"error: {str(e)}"
+        health_status["configuration"]["qdrant"] = f"error: {str(e)}"
     
     # Check NVIDIA
     try:
         nvidia_key = os.getenv("NVIDIA_API_KEY")
         nvidia_url = os.getenv("NVIDIA_BASE_URL")
         if nvidia_key and nvidia_url:
-            health_status["services"]["nvidia"] = "configured"
+            health_status["configuration"]["nvidia"] = "configured"
         else:
-            health_status["services"]["nvidia"] = "not_configured"
+            health_status["configuration"]["nvidia"] = "not_configured"
     except Exception as e:
-        health_status["services"]["nvidia"] = f"error: {str(e)}"
+        health_status["configuration"]["nvidia"] = f"error: {str(e)}"
     
     # Check JWT
     try:
         secret_key = os.getenv("SECRET_KEY")
         if secret_key:
-            health_status["services"]["jwt"] = "configured"
+            health_status["configuration"]["jwt"] = "configured"
         else:
-            health_status["services"]["jwt"] = "not_configured"
+            health_status["configuration"]["jwt"] = "not_configured"
     except Exception as e:
-        health_status["services"]["jwt"] = f"error: {str(e)}"
+        health_status["configuration"]["jwt"] = f"error: {str(e)}"
+
+    health_status["circuit_breakers"] = circuit_states()
     
     return health_status
 
@@ -0,0 +1,263 @@
+"""
+Manual-aware chunking: token-sized chunks that follow section headings and keep
+numbered steps and tables together
+"""
+
+import os
+import re
+import statistics
+from functools import lru_cache
+from typing import List, Optional
+
+from langchain_core.documents import Document
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+BLOCK_HEADING = "heading"
+BLOCK_STEPS = "steps"
+BLOCK_TABLE = "table"
+BLOCK_TEXT = "text"
+
+# "3.2 Replacing the filter", "4 Maintenance", "Chapter 2", "SAFETY PRECAUTIONS"
+HEADING_PATTERNS = (
+    re.compile(r"^\d+(\.\d+)+\.?\s+\S.{0,80}$"),
+    re.compile(r"^\d+\s+[A-Z][^.:;!?]{0,80}$"),
+    re.compile(r"^(chapter|section|part|appendix)\s+[\dA-Z]+\b.{0,80}$", re.IGNORECASE),
+    re.compile(r"^[A-Z][A-Z0-9 &/,\-]{3,60}$"),
+)
+# "1.", "2)", "(a)", "Step 3:", bullets
+STEP_PATTERN = re.compile(r"^(\(?\d{1,2}[.)]|\(?[a-z][.)]|step\s+\d+[:.]?|[-•●▪■*])\s+", re.IGNORECASE)
+# Three or more columns separated by runs of spaces or tabs
+TABLE_ROW_PATTERN = re.compile(r"\S(?: {2,}|\t)\S.*\S(?: {2,}|\t)\S")
+SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+
+
+@lru_cache(maxsize=1)
+def _encoding():
+    try:
+        import tiktoken
+        return tiktoken.get_encoding("cl100k_base")
+    except Exception:
+        return None
+
+
+def count_tokens(text: str) -> int:
+    """Token count with tiktoken's cl100k_base, or a 4-characters-per-token estimate without it"""
+    encoding = _encoding()
+    if encoding is None:
+        return max(1, len(text) // 4)
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+class _Block:
+    __slots__ = ("kind", "lines", "page_doc")
+
+    def __init__(self, kind: str, page_doc: Document):
+        self.kind = kind
+        self.lines: List[str] = []
+        self.page_doc = page_doc
+
+    @property
+    def text(self) -> str:
+        return "\n".join(self.lines)
+
+
+def classify_line(line: str) -> str:
+    if STEP_PATTERN.match(line):
+        return BLOCK_STEPS
+    if TABLE_ROW_PATTERN.search(line):
+        return BLOCK_TABLE
+    if any(pattern.match(line) for pattern in HEADING_PATTERNS):
+        return BLOCK_HEADING
+    return BLOCK_TEXT
+
+
+def detect_blocks(pages: List[Document]) -> List[_Block]:
+    """
+    Group page lines into headings, step lists, tables and text paragraphs.
+    Plain lines following a step continue that step.
+    """
+    blocks: List[_Block] = []
+    for page_doc in pages:
+        current: Optional[_Block] = None
+        for raw_line in page_doc.page_content.splitlines():
+            line = raw_line.rstrip()
+            if not line.strip():
+                current = None
+                continue
+            kind = classify_line(line.strip())
+            if kind == BLOCK_HEADING:
+                heading = _Block(BLOCK_HEADING, page_doc)
+                heading.lines.append(line.strip())
+                blocks.append(heading)
+                current = None
+                continue
+            if kind == BLOCK_TEXT and current is not None and current.kind in (BLOCK_STEPS, BLOCK_TEXT):
+                current.lines.append(line.strip())
+                continue
+            if current is None or current.kind != kind:
+                current = _Block(kind, page_doc)
+                blocks.append(current)
+            current.lines.append(line if kind == BLOCK_TABLE else line.strip())
+    return blocks
+
+
+class ManualChunker:
+    """
+    Packs blocks into chunks of about chunk_tokens tokens. Chunks never cross
+    a section heading unless the section is too small to stand alone; step
+    lists and tables are only split when they alone exceed the chunk size.
+    Continuation chunks repeat the section heading and carry overlap_tokens
+    of the previous paragraph.
+    """
+
+    name = "manual"
+
+    def __init__(self, chunk_tokens: int = None, overlap_tokens: int = None, min_chunk_tokens: int = None):
+        self.chunk_tokens = chunk_tokens or int(os.getenv("CHUNK_TARGET_TOKENS", "384"))
+        self.overlap_tokens = overlap_tokens if overlap_tokens is not None else int(os.getenv("CHUNK_OVERLAP_TOKENS", "48"))
+        self.min_chunk_tokens = min_chunk_tokens or int(os.getenv("CHUNK_MIN_TOKENS", "64"))
+
+    def _pieces(self, block: _Block) -> List[str]:
+        """Split a block that is too large for one chunk at line or sentence boundaries"""
+        if block.kind == BLOCK_TEXT:
+            units = SENTENCE_END.split(block.text)
+        else:
+            units = block.lines
+        pieces = []
+        for unit in units:
+            if count_tokens(unit) <= self.chunk_tokens:
+                pieces.append(unit)
+                continue
+            # A single line or sentence longer than a chunk: split by words
+            words = unit.split()
+            step = max(1, int(self.chunk_tokens * 0.75))
+            pieces.extend(" ".join(words[i:i + step]) for i in range(0, len(words), step))
+        return pieces
+
+    def _overlap(self, text: str) -> str:
+        if self.overlap_tokens <= 0:
+            return ""
+        words = text.split()
+        return " ".join(words[-max(1, int(self.overlap_tokens * 0.75)):])
+
+    def split_documents(self, documents: List[Document]) -> List[Document]:
+        chunks: List[Document] = []
+        section: Optional[str] = None
+        # Pending (text, page_doc, is_body) parts of the next chunk
+        parts: List[tuple] = []
+        part_tokens = 0
+        chunk_section: Optional[str] = None
+        has_body = False
+
+        def add(text: str, page_doc: Document, body: bool = True):
+            nonlocal part_tokens, chunk_section, has_body
+            if body and not has_body:
+                # A chunk belongs to the section its first body block is in
+                chunk_section = section
+            parts.append((text, page_doc, body))
+            # +1 for the newline joining parts
+            part_tokens += count_tokens(text) + 1
+            has_body = has_body or body
+
+        def flush():
+            """
+            Emit the pending parts as a chunk. Headings after the last body block
+            open the next chunk instead of trailing this one; a run of headings
+            alone is only emitted once it reaches min_chunk_tokens.
+            """
+            nonlocal parts, part_tokens, chunk_section, has_body
+            if not has_body and part_tokens < self.min_chunk_tokens:
+                return
+            end = len(parts)
+            if has_body:
+                while not parts[end - 1][2]:
+                    end -= 1
+            emitted, carried = parts[:end], parts[end:]
+            text = "\n".join(part[0] for part in emitted)
+            metadata = dict(emitted[0][1].metadata)
+            metadata["page_end"] = emitted[-1][1].metadata.get("page")
+            metadata["section"] = chunk_section if has_body else section
+            metadata["chunk_index"] = len(chunks)
+            metadata["chunk_tokens"] = count_tokens(text)
+            chunks.append(Document(page_content=text, metadata=metadata))
+            parts, part_tokens, chunk_section, has_body = [], 0, None, False
+            for part in carried:
+                add(*part)
+
+        def continue_section(block: _Block, previous_kind: Optional[str]):
+            """Start the next chunk of the same section with its heading and some overlap"""
+            # Overlap only runs paragraph into paragraph; steps and tables start clean
+            tail = self._overlap(parts[-1][0]) if block.kind == previous_kind == BLOCK_TEXT else ""
+            flush()
+            # Carried headings already open the chunk
+            if section and not parts:
+                add(section, block.page_doc, body=False)
+            if tail:
+                add(tail, block.page_doc, body=False)
+
+        previous_kind: Optional[str] = None
+        for block in detect_blocks(documents):
+            block_previous_kind, previous_kind = previous_kind, block.kind
+            text = block.text
+            tokens = count_tokens(text) + 1
+
+            if block.kind == BLOCK_HEADING:
+                # Small sections are merged forward rather than emitted as tiny chunks
+                if part_tokens >= self.min_chunk_tokens:
+                    flush()
+                section = text
+                add(text, block.page_doc, body=False)
+                continue
+
+            if part_tokens + tokens <= self.chunk_tokens:
+                add(text, block.page_doc)
+                continue
+
+            if has_body:
+                continue_section(block, block_previous_kind)
+                if part_tokens + tokens <= self.chunk_tokens:
+                    add(text, block.page_doc)
+                    continue
+
+            for piece in self._pieces(block):
+                piece_tokens = count_tokens(piece) + 1
+                if has_body and part_tokens + piece_tokens > self.chunk_tokens:
+                    continue_section(block, block.kind)
+                add(piece, block.page_doc)
+        flush()
+        return chunks
+
+
+class RecursiveChunker:
+    """The original fixed-size character splitter (1000 characters, 500 overlap)"""
+
+    name = "recursive"
+
+    def __init__(self, chunk_size: int = 1000, chunk_overlap: int = 500):
+        self.splitter = RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+
+    def split_documents(self, documents: List[Document]) -> List[Document]:
+        return self.splitter.split_documents(documents=documents)
+
+
+def create_chunker(name: str = None):
+    """Build the chunker selected by CHUNKER ("manual" by default, or "recursive")"""
+    name = (name or os.getenv("CHUNKER", "manual")).lower()
+    if name == "recursive":
+        return RecursiveChunker()
+    return ManualChunker()
+
+
+def chunk_stats(chunks: List[Document]) -> dict:
+    """Chunk count and token size statistics for one manual"""
+    sizes = [d.metadata.get("chunk_tokens") or count_tokens(d.page_content) for d in chunks]
+    if not sizes:
+        return {"chunk_count": 0, "total_tokens": 0}
+    return {
+        "chunk_count": len(sizes),
+        "total_tokens": sum(sizes),
+        "mean_tokens": round(statistics.fmean(sizes), 1),
+        "median_tokens": statistics.median(sizes),
+        "min_tokens": min(sizes),
+        "max_tokens": max(sizes),
+    }
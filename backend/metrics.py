@@ -0,0 +1,179 @@
+"""
+Prometheus metrics for the retrieval and ingestion pipelines
+"""
+
+import os
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    REGISTRY,
+)
+from prometheus_client import multiprocess
+from pymongo import monitoring
+
+# Latency buckets spanning sub-millisecond cache hits to multi-second LLM calls
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+TOKEN_BUCKETS = (64, 128, 256, 512, 1024, 2048, 4096, 8192, 16384, 32768)
+
+QUERY_STAGE_SECONDS = Histogram(
+    "rag_query_stage_seconds",
+    "Latency of each /query/ pipeline stage",
+    ["stage"],
+    buckets=LATENCY_BUCKETS,
+)
+
+INGEST_STAGE_SECONDS = Histogram(
+    "rag_ingest_stage_seconds",
+    "Latency of each PDF ingestion stage",
+    ["stage"],
+    buckets=LATENCY_BUCKETS,
+)
+
+LLM_TOKENS = Histogram(
+    "rag_llm_tokens",
+    "Token usage reported by chat completions",
+    ["kind"],
+    buckets=TOKEN_BUCKETS,
+)
+
+CACHE_REQUESTS = Counter(
+    "rag_cache_requests_total",
+    "Cache lookups by cache and result (hit/miss)",
+    ["cache", "result"],
+)
+
+SINGLEFLIGHT_CALLS = Counter(
+    "rag_singleflight_calls_total",
+    "Single-flight calls by group and role (leader made the upstream call, follower shared it)",
+    ["group", "role"],
+)
+
+NIM_QUEUE_DEPTH = Gauge(
+    "rag_nim_queue_depth",
+    "NIM calls waiting for admission by endpoint and priority class",
+    ["endpoint", "priority"],
+    multiprocess_mode="livesum",
+)
+
+NIM_QUEUE_WAIT_SECONDS = Histogram(
+    "rag_nim_queue_wait_seconds",
+    "Time NIM calls waited for admission",
+    ["endpoint", "priority"],
+    buckets=LATENCY_BUCKETS,
+)
+
+NIM_ADMISSION_TIMEOUTS = Counter(
+    "rag_nim_admission_timeouts_total",
+    "NIM calls rejected after waiting too long for admission",
+    ["endpoint", "priority"],
+)
+
+DEPENDENCY_CALLS = Counter(
+    "rag_dependency_calls_total",
+    "Remote dependency calls by outcome (ok, error, slow past deadline, rejected by open breaker)",
+    ["dependency", "outcome"],
+)
+
+CIRCUIT_STATE = Gauge(
+    "rag_circuit_state",
+    "Circuit breaker state per dependency (0 closed, 1 half-open, 2 open)",
+    ["dependency"],
+    multiprocess_mode="livemax",
+)
+
+DEPENDENCY_RETRIES = Counter(
+    "rag_dependency_retries_total",
+    "Retries by dependency and result (retried, or skipped because the retry budget ran out)",
+    ["dependency", "result"],
+)
+
+HEDGED_REQUESTS = Counter(
+    "rag_hedged_requests_total",
+    "Hedged duplicate requests by dependency and outcome (sent, primary_won, hedge_won)",
+    ["dependency", "outcome"],
+)
+
+CHUNK_TOKENS = Histogram(
+    "rag_chunk_tokens",
+    "Size of ingested chunks in tokens",
+    buckets=TOKEN_BUCKETS,
+)
+
+MONGODB_COMMAND_SECONDS = Histogram(
+    "rag_mongodb_command_seconds",
+    "Duration of MongoDB commands",
+    ["command", "status"],
+    buckets=LATENCY_BUCKETS,
+)
+
+
+def time_query_stage(stage: str):
+    """Context manager timing one /query/ stage"""
+    return QUERY_STAGE_SECONDS.labels(stage).time()
+
+
+def record_query_stage(stage: str, seconds: float):
+    """Record a /query/ stage timed by the caller"""
+    QUERY_STAGE_SECONDS.labels(stage).observe(seconds)
+
+
+def time_ingest_stage(stage: str):
+    """Context manager timing one ingestion stage"""
+    return INGEST_STAGE_SECONDS.labels(stage).time()
+
+
+def record_cache(cache: str, hit: bool):
+    """Count a cache hit or miss"""
+    CACHE_REQUESTS.labels(cache, "hit" if hit else "miss").inc()
+
+
+def record_llm_usage(usage):
+    """Record prompt/completion token counts from an OpenAI-style usage object"""
+    if usage is None:
+        return
+    prompt_tokens = getattr(usage, "prompt_tokens", None)
+    completion_tokens = getattr(usage, "completion_tokens", None)
+    if prompt_tokens is not None:
+        LLM_TOKENS.labels("prompt").observe(prompt_tokens)
+    if completion_tokens is not None:
+        LLM_TOKENS.labels("completion").observe(completion_tokens)
+
+
+def record_chunk_sizes(token_counts):
+    """Record the token size of each chunk of an ingested manual"""
+    for tokens in token_counts:
+        if tokens is not None:
+            CHUNK_TOKENS.observe(tokens)
+
+
+class MongoCommandMetrics(monitoring.CommandListener):
+    """Times every MongoDB command using the driver's own duration measurement"""
+
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        MONGODB_COMMAND_SECONDS.labels(event.command_name, "ok").observe(event.duration_micros / 1e6)
+
+    def failed(self, event):
+        MONGODB_COMMAND_SECONDS.labels(event.command_name, "error").observe(event.duration_micros / 1e6)
+
+
+mongo_command_metrics = MongoCommandMetrics()
+
+
+def render_metrics() -> tuple[bytes, str]:
+    """
+    Render metrics in Prometheus text format. With PROMETHEUS_MULTIPROC_DIR set,
+    samples from every uvicorn worker are aggregated.
+    """
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
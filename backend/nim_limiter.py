@@ -0,0 +1,166 @@
+"""
+Shared admission control for NVIDIA NIM calls: per-endpoint token buckets,
+concurrency caps and priority scheduling so bulk ingestion yields to live queries
+"""
+
+import itertools
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from dotenv import load_dotenv
+
+from metrics import NIM_ADMISSION_TIMEOUTS, NIM_QUEUE_DEPTH, NIM_QUEUE_WAIT_SECONDS
+
+load_dotenv()
+
+PRIORITY_INTERACTIVE = 0
+PRIORITY_INGESTION = 1
+
+PRIORITY_NAMES = {
+    PRIORITY_INTERACTIVE: "interactive",
+    PRIORITY_INGESTION: "ingestion",
+}
+
+
+class AdmissionTimeout(Exception):
+    """Raised when a NIM call could not be admitted within its wait budget"""
+
+
+class _Ticket:
+    __slots__ = ("priority", "seq", "enqueued_at")
+
+    def __init__(self, priority: int, seq: int):
+        self.priority = priority
+        self.seq = seq
+        self.enqueued_at = time.monotonic()
+
+
+class EndpointLimiter:
+    """
+    Token bucket plus concurrency cap for one NIM endpoint type. Waiters are
+    admitted in priority order, FIFO within a priority; a lower-priority waiter
+    that has waited longer than max_starvation_seconds is treated as interactive
+    so ingestion still makes progress under sustained chat load.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        rate_per_sec: float,
+        burst: int,
+        max_concurrency: int,
+        max_starvation_seconds: float
+    ):
+        self.name = name
+        self.rate_per_sec = rate_per_sec
+        self.burst = burst
+        self.max_concurrency = max_concurrency
+        self.max_starvation_seconds = max_starvation_seconds
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._in_flight = 0
+        self._waiters: list[_Ticket] = []
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+
+    def _refill(self, now: float):
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate_per_sec)
+        self._updated = now
+
+    def _next_ticket(self, now: float) -> _Ticket:
+        def rank(ticket: _Ticket):
+            starving = now - ticket.enqueued_at >= self.max_starvation_seconds
+            return (PRIORITY_INTERACTIVE if starving else ticket.priority, ticket.seq)
+        return min(self._waiters, key=rank)
+
+    def acquire(self, priority: int, timeout: float):
+        priority_name = PRIORITY_NAMES.get(priority, str(priority))
+        with self._cond:
+            ticket = _Ticket(priority, next(self._seq))
+            self._waiters.append(ticket)
+            NIM_QUEUE_DEPTH.labels(self.name, priority_name).inc()
+            deadline = ticket.enqueued_at + timeout
+            try:
+                while True:
+                    now = time.monotonic()
+                    wait = deadline - now
+                    if self._next_ticket(now) is ticket and self._in_flight < self.max_concurrency:
+                        self._refill(now)
+                        if self._tokens >= 1:
+                            self._tokens -= 1
+                            self._in_flight += 1
+                            self._waiters.remove(ticket)
+                            self._cond.notify_all()
+                            NIM_QUEUE_WAIT_SECONDS.labels(self.name, priority_name).observe(now - ticket.enqueued_at)
+                            return
+                        # Sleep until the next token is due
+                        wait = min(wait, (1 - self._tokens) / self.rate_per_sec)
+                    if deadline - now <= 0:
+                        self._waiters.remove(ticket)
+                        self._cond.notify_all()
+                        NIM_ADMISSION_TIMEOUTS.labels(self.name, priority_name).inc()
+                        raise AdmissionTimeout(
+                            f"NIM {self.name} call not admitted within {timeout:.0f}s ({priority_name})"
+                        )
+                    self._cond.wait(max(wait, 0.001))
+            finally:
+                NIM_QUEUE_DEPTH.labels(self.name, priority_name).dec()
+
+    def release(self):
+        with self._cond:
+            self._in_flight -= 1
+            self._cond.notify_all()
+
+
+def _process_share() -> float:
+    """
+    Fraction of the account-wide NIM_*_RATE_PER_SEC / NIM_*_BURST this process
+    may use. Buckets are per process, so every uvicorn worker (and the bulk
+    ingestion CLI) takes its own share instead of the full rate.
+    """
+    share = os.getenv("NIM_LIMITER_SHARE")
+    if share:
+        return float(share)
+    return 1 / max(1, int(os.getenv("WEB_CONCURRENCY", "1")))
+
+
+def _endpoint_from_env(name: str, rate: float, burst: int, concurrency: int) -> EndpointLimiter:
+    prefix = f"NIM_{name.upper()}"
+    share = _process_share()
+    return EndpointLimiter(
+        name,
+        rate_per_sec=float(os.getenv(f"{prefix}_RATE_PER_SEC", str(rate))) * share,
+        burst=max(1, round(int(os.getenv(f"{prefix}_BURST", str(burst))) * share)),
+        max_concurrency=int(os.getenv(f"{prefix}_CONCURRENCY", str(concurrency))),
+        max_starvation_seconds=float(os.getenv("NIM_MAX_STARVATION_SECONDS", "10")),
+    )
+
+
+class NIMLimiter:
+    """Limiters for every NIM endpoint type sharing one account"""
+
+    def __init__(self):
+        self.endpoints = {
+            "embed": _endpoint_from_env("embed", rate=10, burst=20, concurrency=8),
+            "rerank": _endpoint_from_env("rerank", rate=10, burst=20, concurrency=8),
+            "chat": _endpoint_from_env("chat", rate=5, burst=10, concurrency=8),
+        }
+        self.timeouts = {
+            PRIORITY_INTERACTIVE: float(os.getenv("NIM_INTERACTIVE_MAX_WAIT_SECONDS", "15")),
+            PRIORITY_INGESTION: float(os.getenv("NIM_INGESTION_MAX_WAIT_SECONDS", "300")),
+        }
+
+    @contextmanager
+    def acquire(self, endpoint: str, priority: int = PRIORITY_INTERACTIVE):
+        """Hold an admission slot for one call, e.g. with nim_limiter.acquire("embed"): ..."""
+        limiter = self.endpoints[endpoint]
+        limiter.acquire(priority, self.timeouts[priority])
+        try:
+            yield
+        finally:
+            limiter.release()
+
+
+nim_limiter = NIMLimiter()
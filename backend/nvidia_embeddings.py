@@ -2,32 +2,42 @@
 Custom NVIDIA NIM Embeddings class for LangChain compatibility
 """
 
-from typing import List, Optional, Any
+from typing import Dict, List, Optional, Any
 from openai import OpenAI
+import logging
 import os
 from langchain_core.embeddings import Embeddings
+from tracing import start_span
+from nim_limiter import nim_limiter, PRIORITY_INTERACTIVE
+from resilience import embed_dependency
+from vector_storage import storage_settings
+
+logger = logging.getLogger(__name__)
 
 class NVIDIANIMEmbeddings(Embeddings):
     """Custom embeddings class for NVIDIA NIM API that inherits from LangChain Embeddings"""
     
-    def __init__(self):
+    def __init__(self, priority: int = PRIORITY_INTERACTIVE):
         super().__init__()
+        # Admission priority for the shared NIM limiter; ingestion passes PRIORITY_INGESTION
+        self.priority = priority
+        # Retries are budgeted by embed_dependency, not by the client
         self.client = OpenAI(
             base_url=os.getenv("NVIDIA_BASE_URL"),
-            api_key=os.getenv("NVIDIA_API_KEY")
+            api_key=os.getenv("NVIDIA_API_KEY"),
+            timeout=embed_dependency.timeout_seconds,
+            max_retries=0
         )
         self.model = os.getenv("NVIDIA_EMBEDDING_MODEL")
     
     def embed_query(self, text: str) -> List[float]:
         """Embed a single query text"""
         try:
-            response = self.client.embeddings.create(
-                model=self.model,
-                input=text
-            )
-            return response.data[0].embedding
+            with start_span("nvidia.embed_query", model=self.model, text_length=len(text)):
+                response = embed_dependency.call(self._create, text, admission=self._admission)
+            return storage_settings.truncate(response.data[0].embedding)
         except Exception as e:
-            print(f"Error embedding query: {e}")
+            logger.error("Error embedding query: %s", e)
             raise e
     
     def embed_documents(self, texts: List[str]) -> List[List[float]]:
@@ -37,25 +47,28 @@ class NVIDIANIMEmbeddings(Embeddings):
         
         for i in range(0, len(texts), batch_size):
             batch_texts = texts[i:i + batch_size]
+            # The whole batch is retried within the retry budget; no per-text
+            # fallback, which would multiply load on a struggling service
             try:
-                # Use batch API call for better performance
-                response = self.client.embeddings.create(
-                    model=self.model,
-                    input=batch_texts
-                )
-                batch_embeddings = [data.embedding for data in response.data]
-                embeddings.extend(batch_embeddings)
+                with start_span("nvidia.embed_documents", model=self.model, batch_size=len(batch_texts)):
+                    response = embed_dependency.call(self._create, batch_texts, admission=self._admission)
             except Exception as e:
-                print(f"Batch embedding failed, falling back to individual processing: {e}")
-                # Fallback to individual processing if batch fails
-                for text in batch_texts:
-                    try:
-                        embeddings.append(self.embed_query(text))
-                    except Exception as individual_error:
-                        print(f"Error embedding individual text: {individual_error}")
-                        # Add zero vector as fallback
-                        embeddings.append([0.0] * 1024)  # Assuming 1024 dimensions
+                logger.error("Batch embedding failed: %s", e)
+                raise
+            batch_embeddings = [storage_settings.truncate(data.embedding) for data in response.data]
+            embeddings.extend(batch_embeddings)
         return embeddings
+
+    def _admission(self):
+        """Slot in the shared NIM limiter, taken outside the breaker's deadline"""
+        return nim_limiter.acquire("embed", self.priority)
+
+    def _create(self, input):
+        """One embeddings request"""
+        return self.client.embeddings.create(
+            model=self.model,
+            input=input
+        )
     
     def _embed_query(self, text: str) -> List[float]:
         """Internal method for embedding queries"""
@@ -64,3 +77,34 @@ class NVIDIANIMEmbeddings(Embeddings):
     def _embed_documents(self, texts: List[str]) -> List[List[float]]:
         """Internal method for embedding documents"""
         return self.embed_documents(texts)
+
+
+class PrecomputedEmbeddings(Embeddings):
+    """Serves document embeddings computed ahead of time, falling back to a live model for unknown texts"""
+
+    def __init__(
+        self,
+        base: Embeddings,
+        texts: Optional[List[str]] = None,
+        vectors: Optional[List[List[float]]] = None
+    ):
+        super().__init__()
+        self.base = base
+        self._vectors: Dict[str, List[float]] = {}
+        if texts and vectors:
+            self.add(texts, vectors)
+
+    def add(self, texts: List[str], vectors: List[List[float]]):
+        """Register vectors computed elsewhere for the given texts"""
+        self._vectors.update(zip(texts, vectors))
+
+    def embed_query(self, text: str) -> List[float]:
+        """Queries are always embedded live"""
+        return self.base.embed_query(text)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """Return stored vectors, embedding only texts that were not precomputed"""
+        missing = [text for text in texts if text not in self._vectors]
+        if missing:
+            self._vectors.update(zip(missing, self.base.embed_documents(missing)))
+        return [self._vectors[text] for text in texts]
@@ -0,0 +1,312 @@
+"""
+Deadlines, circuit breakers, retry budgets and hedged requests for remote dependencies
+"""
+
+import asyncio
+import logging
+import os
+import random
+import re
+import threading
+import time
+from contextlib import nullcontext
+from typing import Any, Callable, ContextManager, Optional
+
+import httpx
+from dotenv import load_dotenv
+from openai import APIConnectionError
+from qdrant_client.http.exceptions import ResponseHandlingException
+
+from metrics import CIRCUIT_STATE, DEPENDENCY_CALLS, DEPENDENCY_RETRIES, HEDGED_REQUESTS
+from nim_limiter import AdmissionTimeout
+
+logger = logging.getLogger(__name__)
+
+load_dotenv()
+
+STATE_CLOSED = "closed"
+STATE_HALF_OPEN = "half_open"
+STATE_OPEN = "open"
+
+STATE_VALUES = {STATE_CLOSED: 0, STATE_HALF_OPEN: 1, STATE_OPEN: 2}
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a dependency whose breaker is open"""
+
+
+# NVIDIA endpoint clients raise plain exceptions starting with "[<status>] ..."
+STATUS_PREFIX = re.compile(r"^\[(\d{3})\]")
+
+
+def status_code(error: Exception):
+    """HTTP status carried by a client library error, if any"""
+    for source in (error, getattr(error, "response", None)):
+        code = getattr(source, "status_code", None)
+        if isinstance(code, int):
+            return code
+    match = STATUS_PREFIX.match(str(error))
+    return int(match.group(1)) if match else None
+
+
+def is_dependency_failure(error: Exception) -> bool:
+    """
+    Whether an error says the dependency is unhealthy: 429, 5xx, timeouts and
+    connection errors. Anything else (a bad request, an unknown model, a 404)
+    is the caller's problem and must not open the breaker or be retried.
+    """
+    code = status_code(error)
+    if code is not None:
+        return code == 429 or code >= 500
+    # OSError covers the builtin TimeoutError/ConnectionError and requests' errors
+    return isinstance(error, (OSError, httpx.TransportError, APIConnectionError, ResponseHandlingException))
+
+
+class CircuitBreaker:
+    """
+    Opens after failure_threshold consecutive failures and rejects calls for
+    reset_timeout_seconds. Then a single trial call is let through (half-open);
+    its outcome closes the breaker or opens it again.
+    """
+
+    def __init__(self, name: str, failure_threshold: int, reset_timeout_seconds: float):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout_seconds = reset_timeout_seconds
+        self._lock = threading.Lock()
+        self._state = STATE_CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trial_in_flight = False
+        CIRCUIT_STATE.labels(name).set(STATE_VALUES[STATE_CLOSED])
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._state
+
+    def _set_state(self, state: str):
+        if state != self._state:
+            logger.warning("Circuit breaker %s: %s -> %s", self.name, self._state, state)
+        self._state = state
+        CIRCUIT_STATE.labels(self.name).set(STATE_VALUES[state])
+
+    def before_call(self):
+        """Raise CircuitOpenError unless a call may go through now"""
+        with self._lock:
+            if self._state == STATE_OPEN:
+                if time.monotonic() - self._opened_at < self.reset_timeout_seconds:
+                    raise CircuitOpenError(f"{self.name} circuit is open")
+                self._set_state(STATE_HALF_OPEN)
+            if self._state == STATE_HALF_OPEN:
+                if self._trial_in_flight:
+                    raise CircuitOpenError(f"{self.name} circuit is half-open, trial call in progress")
+                self._trial_in_flight = True
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._trial_in_flight = False
+            self._set_state(STATE_CLOSED)
+
+    def release_trial(self):
+        """End a call that said nothing about the dependency's health"""
+        with self._lock:
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            self._trial_in_flight = False
+            if self._state == STATE_HALF_OPEN or self._failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+                self._set_state(STATE_OPEN)
+
+
+class RetryBudget:
+    """
+    Caps retries (and hedges) at a fraction of recent calls so a struggling
+    service is not hit with a multiple of its normal load. Every call deposits
+    ratio tokens, every retry spends one; min_per_second keeps a trickle of
+    retries available at low traffic.
+    """
+
+    def __init__(self, ratio: float, min_per_second: float, max_tokens: float = 100.0):
+        self.ratio = ratio
+        self.min_per_second = min_per_second
+        self.max_tokens = max_tokens
+        self._lock = threading.Lock()
+        self._tokens = max_tokens
+        self._updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.max_tokens, self._tokens + (now - self._updated) * self.min_per_second)
+        self._updated = now
+
+    def record_call(self):
+        with self._lock:
+            self._refill()
+            self._tokens = min(self.max_tokens, self._tokens + self.ratio)
+
+    def try_spend(self) -> bool:
+        with self._lock:
+            self._refill()
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return True
+            return False
+
+
+class Dependency:
+    """
+    One remote dependency: a deadline, a circuit breaker and budgeted retries.
+    Calls that return after the deadline count as failures for the breaker
+    even when the client itself could not be given a timeout. Only errors
+    that say the dependency is unhealthy (is_dependency_failure) count as
+    failures and are retried; client errors are raised as is. Waiting for
+    admission (the NIM limiter) is local back-pressure, not a dependency
+    failure: it is neither timed, retried nor reported to the breaker.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        timeout_seconds: float,
+        max_retries: int,
+        failure_threshold: int,
+        reset_timeout_seconds: float,
+        retry_budget: RetryBudget,
+        backoff_seconds: float = 0.2
+    ):
+        self.name = name
+        self.timeout_seconds = timeout_seconds
+        self.max_retries = max_retries
+        self.breaker = CircuitBreaker(name, failure_threshold, reset_timeout_seconds)
+        self.retry_budget = retry_budget
+        self.backoff_seconds = backoff_seconds
+
+    def _attempt(self, admission: Optional[Callable[[], ContextManager]], fn: Callable, *args, **kwargs) -> Any:
+        with admission() if admission is not None else nullcontext():
+            self.breaker.before_call()
+            started = time.monotonic()
+            try:
+                result = fn(*args, **kwargs)
+            except Exception as e:
+                if is_dependency_failure(e):
+                    self.breaker.record_failure()
+                    DEPENDENCY_CALLS.labels(self.name, "error").inc()
+                else:
+                    self.breaker.release_trial()
+                    DEPENDENCY_CALLS.labels(self.name, "client_error").inc()
+                raise
+        if time.monotonic() - started > self.timeout_seconds:
+            self.breaker.record_failure()
+            DEPENDENCY_CALLS.labels(self.name, "slow").inc()
+        else:
+            self.breaker.record_success()
+            DEPENDENCY_CALLS.labels(self.name, "ok").inc()
+        return result
+
+    def call(
+        self,
+        fn: Callable,
+        *args,
+        admission: Optional[Callable[[], ContextManager]] = None,
+        **kwargs
+    ) -> Any:
+        """
+        Run a blocking call with breaker protection and budgeted retries.
+        admission, e.g. lambda: nim_limiter.acquire("embed"), is entered
+        before every attempt; an AdmissionTimeout is raised as is.
+        """
+        self.retry_budget.record_call()
+        attempt = 0
+        while True:
+            try:
+                return self._attempt(admission, fn, *args, **kwargs)
+            except CircuitOpenError:
+                DEPENDENCY_CALLS.labels(self.name, "rejected").inc()
+                raise
+            except AdmissionTimeout:
+                raise
+            except Exception as e:
+                if not is_dependency_failure(e) or attempt >= self.max_retries:
+                    raise
+                if not self.retry_budget.try_spend():
+                    DEPENDENCY_RETRIES.labels(self.name, "budget_exhausted").inc()
+                    raise
+                DEPENDENCY_RETRIES.labels(self.name, "retried").inc()
+                attempt += 1
+                delay = self.backoff_seconds * (2 ** (attempt - 1)) * (0.5 + random.random())
+                logger.warning("%s call failed (%s), retry %d in %.2fs", self.name, e, attempt, delay)
+                time.sleep(delay)
+
+    async def hedged(self, hedge_after_seconds: float, fn: Callable, *args, **kwargs) -> Any:
+        """
+        Run a blocking call (which should itself go through call()) on a worker
+        thread; if it has not finished after hedge_after_seconds, send one
+        duplicate and return whichever succeeds first. Hedges spend the retry
+        budget and are skipped unless the breaker is closed. Only use for
+        idempotent calls.
+        """
+        primary = asyncio.ensure_future(asyncio.to_thread(fn, *args, **kwargs))
+        if hedge_after_seconds <= 0:
+            return await primary
+        done, _ = await asyncio.wait({primary}, timeout=hedge_after_seconds)
+        if done or self.breaker.state != STATE_CLOSED or not self.retry_budget.try_spend():
+            return await primary
+
+        HEDGED_REQUESTS.labels(self.name, "sent").inc()
+        hedge = asyncio.ensure_future(asyncio.to_thread(fn, *args, **kwargs))
+        pending = {primary, hedge}
+        error = None
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    HEDGED_REQUESTS.labels(self.name, "hedge_won" if task is hedge else "primary_won").inc()
+                    for loser in pending:
+                        # The losing thread cannot be interrupted; just drop its result
+                        loser.add_done_callback(lambda t: t.exception())
+                    return task.result()
+                error = task.exception()
+        raise error
+
+
+def _dependency_from_env(name: str, timeout: float, retries: int, retry_budget: RetryBudget) -> Dependency:
+    prefix = name.upper()
+    return Dependency(
+        name,
+        timeout_seconds=float(os.getenv(f"{prefix}_TIMEOUT_SECONDS", str(timeout))),
+        max_retries=int(os.getenv(f"{prefix}_MAX_RETRIES", str(retries))),
+        failure_threshold=int(os.getenv(f"{prefix}_BREAKER_FAILURES", "5")),
+        reset_timeout_seconds=float(os.getenv(f"{prefix}_BREAKER_RESET_SECONDS", "30")),
+        retry_budget=retry_budget,
+    )
+
+
+def _retry_budget_from_env() -> RetryBudget:
+    return RetryBudget(
+        ratio=float(os.getenv("RETRY_BUDGET_RATIO", "0.2")),
+        min_per_second=float(os.getenv("RETRY_BUDGET_MIN_PER_SECOND", "1")),
+    )
+
+
+embed_dependency = _dependency_from_env("nim_embed", timeout=10, retries=2, retry_budget=_retry_budget_from_env())
+rerank_dependency = _dependency_from_env("nim_rerank", timeout=10, retries=1, retry_budget=_retry_budget_from_env())
+chat_dependency = _dependency_from_env("nim_chat", timeout=60, retries=1, retry_budget=_retry_budget_from_env())
+qdrant_dependency = _dependency_from_env("qdrant", timeout=10, retries=2, retry_budget=_retry_budget_from_env())
+
+dependencies = {
+    dependency.name: dependency
+    for dependency in (embed_dependency, rerank_dependency, chat_dependency, qdrant_dependency)
+}
+
+
+def circuit_states() -> dict:
+    """Current breaker state per dependency, for the health endpoint"""
+    return {name: dependency.breaker.state for name, dependency in dependencies.items()}
+
+# Send a duplicate query embedding when the first has not returned after this long (0 disables)
+EMBED_HEDGE_AFTER_SECONDS = float(os.getenv("NIM_EMBED_HEDGE_AFTER_SECONDS", "0.5"))
@@ -0,0 +1,139 @@
+"""
+Semantic answer cache: reuse answers for paraphrased questions about the same product
+"""
+
+import asyncio
+import os
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from metrics import record_cache
+
+
+class _ProductEntries:
+    """Normalized query vectors for one product as a contiguous matrix, plus their answers"""
+
+    def __init__(self, dim: int):
+        self.vectors = np.empty((0, dim), dtype=np.float32)
+        self.answers: List[str] = []
+        self.created: List[float] = []
+
+
+class SemanticAnswerCache:
+    """
+    Per (company_name, product_name) cache keyed by query embedding. A lookup
+    hits when the cosine similarity to a stored query reaches the threshold.
+    """
+
+    GENERATION_KEY_PREFIX = "answer_cache_generation"
+
+    def __init__(
+        self,
+        threshold: float = None,
+        max_entries_per_product: int = None,
+        ttl_seconds: float = None,
+        generation_check_seconds: float = 1.0
+    ):
+        self.enabled = os.getenv("SEMANTIC_CACHE_ENABLED", "true").lower() == "true"
+        self.threshold = threshold or float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.92"))
+        self.max_entries_per_product = max_entries_per_product or int(os.getenv("SEMANTIC_CACHE_MAX_ENTRIES", "256"))
+        self.ttl_seconds = ttl_seconds or float(os.getenv("SEMANTIC_CACHE_TTL_SECONDS", "86400"))
+        self.generation_check_seconds = generation_check_seconds
+        self._lock = threading.Lock()
+        self._products: Dict[Tuple[str, str], _ProductEntries] = {}
+        self._shared_store = None
+        self._generations: Dict[Tuple[str, str], object] = {}
+        self._generation_checked_at: Dict[Tuple[str, str], float] = {}
+        self._refresh_tasks: set = set()
+
+    def bind_shared_store(self, store):
+        """Propagate per-product invalidations to other workers through the state store"""
+        self._shared_store = store
+
+    @staticmethod
+    def _normalize(embedding) -> np.ndarray:
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _generation_key(self, key: Tuple[str, str]) -> str:
+        return f"{self.GENERATION_KEY_PREFIX}:{key[0]}|{key[1]}"
+
+    def _sync_shared_generation(self, key: Tuple[str, str]):
+        if self._shared_store is None:
+            return
+        now = time.monotonic()
+        if now - self._generation_checked_at.get(key, 0.0) < self.generation_check_seconds:
+            return
+        self._generation_checked_at[key] = now
+        try:
+            # The store read is blocking I/O: apply it off the event loop, for later lookups
+            task = asyncio.get_running_loop().create_task(asyncio.to_thread(self._refresh_generation, key))
+            self._refresh_tasks.add(task)
+            task.add_done_callback(self._refresh_tasks.discard)
+        except RuntimeError:
+            # No event loop (scripts): refresh inline
+            self._refresh_generation(key)
+
+    def _refresh_generation(self, key: Tuple[str, str]):
+        try:
+            generation = self._shared_store.get(self._generation_key(key))
+        except Exception:
+            return
+        with self._lock:
+            if key in self._generations and generation != self._generations[key]:
+                self._products.pop(key, None)
+            self._generations[key] = generation
+
+    def lookup(self, company_name: str, product_name: str, embedding) -> Optional[str]:
+        """Return a cached answer for a near-duplicate query, or None"""
+        if not self.enabled:
+            return None
+        key = (company_name, product_name)
+        self._sync_shared_generation(key)
+        query = self._normalize(embedding)
+        answer = None
+        with self._lock:
+            entries = self._products.get(key)
+            if entries is not None and entries.answers and entries.vectors.shape[1] == query.shape[0]:
+                scores = entries.vectors @ query
+                best = int(np.argmax(scores))
+                fresh = time.time() - entries.created[best] <= self.ttl_seconds
+                if scores[best] >= self.threshold and fresh:
+                    answer = entries.answers[best]
+        record_cache("semantic_answer", answer is not None)
+        return answer
+
+    def store(self, company_name: str, product_name: str, embedding, answer: str):
+        """Remember the answer for a query, evicting the oldest entry when full"""
+        if not self.enabled:
+            return
+        key = (company_name, product_name)
+        vector = self._normalize(embedding)
+        with self._lock:
+            entries = self._products.get(key)
+            if entries is None or entries.vectors.shape[1] != vector.shape[0]:
+                entries = self._products[key] = _ProductEntries(vector.shape[0])
+            if len(entries.answers) >= self.max_entries_per_product:
+                entries.vectors = entries.vectors[1:]
+                entries.answers.pop(0)
+                entries.created.pop(0)
+            entries.vectors = np.vstack([entries.vectors, vector[np.newaxis, :]])
+            entries.answers.append(answer)
+            entries.created.append(time.time())
+
+    def invalidate(self, company_name: str, product_name: str):
+        """Drop cached answers after the product's manuals changed"""
+        key = (company_name, product_name)
+        with self._lock:
+            self._products.pop(key, None)
+        if self._shared_store is not None:
+            try:
+                generation = time.time_ns()
+                self._shared_store.set(self._generation_key(key), generation)
+                self._generations[key] = generation
+            except Exception:
+                pass
@@ -0,0 +1,91 @@
+"""
+Shared application state that stays consistent across uvicorn workers and nodes
+"""
+
+import copy
+import logging
+import os
+import threading
+from typing import Any, List
+
+logger = logging.getLogger(__name__)
+
+
+class InMemoryStateStore:
+    """Process-local store; only correct when running a single worker"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._values: dict = {}
+
+    def get(self, key: str, default: Any = None) -> Any:
+        with self._lock:
+            return copy.deepcopy(self._values.get(key, default))
+
+    def set(self, key: str, value: Any):
+        with self._lock:
+            self._values[key] = copy.deepcopy(value)
+
+    def list_get(self, key: str) -> List[Any]:
+        with self._lock:
+            return list(self._values.get(key, []))
+
+    def list_append(self, key: str, item: Any):
+        with self._lock:
+            self._values.setdefault(key, []).append(item)
+
+    def list_remove(self, key: str, item: Any) -> bool:
+        """Remove every occurrence of item, like MongoDB's $pull"""
+        with self._lock:
+            items = self._values.get(key, [])
+            if item not in items:
+                return False
+            self._values[key] = [existing for existing in items if existing != item]
+            return True
+
+    def list_clear(self, key: str):
+        with self._lock:
+            self._values[key] = []
+
+
+class MongoStateStore:
+    """Store backed by a MongoDB collection, one document per key"""
+
+    def __init__(self, collection):
+        self.collection = collection
+
+    def get(self, key: str, default: Any = None) -> Any:
+        doc = self.collection.find_one({"_id": key}, {"value": 1})
+        if doc is None or "value" not in doc:
+            return default
+        return doc["value"]
+
+    def set(self, key: str, value: Any):
+        self.collection.update_one({"_id": key}, {"$set": {"value": value}}, upsert=True)
+
+    def list_get(self, key: str) -> List[Any]:
+        return self.get(key, []) or []
+
+    def list_append(self, key: str, item: Any):
+        self.collection.update_one({"_id": key}, {"$push": {"value": item}}, upsert=True)
+
+    def list_remove(self, key: str, item: Any) -> bool:
+        result = self.collection.update_one({"_id": key, "value": item}, {"$pull": {"value": item}})
+        return result.modified_count > 0
+
+    def list_clear(self, key: str):
+        self.set(key, [])
+
+
+def create_state_store(mongo_db=None):
+    """
+    Build the store selected by STATE_STORE_BACKEND ("mongodb" by default, or
+    "memory"). Falls back to memory when MongoDB is unavailable.
+    """
+    backend = os.getenv("STATE_STORE_BACKEND", "mongodb").lower()
+    if backend == "mongodb" and mongo_db is not None:
+        collection_name = os.getenv("STATE_STORE_COLLECTION", "app_state")
+        return MongoStateStore(mongo_db[collection_name])
+    if backend == "mongodb":
+        logger.warning("MongoDB unavailable, using in-memory shared state (single worker only)")
+    return InMemoryStateStore()
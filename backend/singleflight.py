@@ -0,0 +1,48 @@
+"""
+Single-flight request coalescing: concurrent identical calls share one upstream request
+"""
+
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+from metrics import SINGLEFLIGHT_CALLS
+
+
+class SingleFlight:
+    """
+    Collapses concurrent calls with the same key into one. The first caller
+    (leader) runs the work; callers arriving while it is in flight await the
+    same future. Nothing is cached once the call completes.
+    """
+
+    def __init__(self, group: str):
+        self.group = group
+        self._in_flight: Dict[Hashable, asyncio.Future] = {}
+
+    async def do(self, key: Hashable, work: Callable[[], Awaitable[Any]]) -> Any:
+        future = self._in_flight.get(key)
+        if future is not None:
+            SINGLEFLIGHT_CALLS.labels(self.group, "follower").inc()
+            # shield: a cancelled follower must not cancel the shared call
+            return await asyncio.shield(future)
+
+        SINGLEFLIGHT_CALLS.labels(self.group, "leader").inc()
+        future = asyncio.ensure_future(work())
+        self._in_flight[key] = future
+        try:
+            return await asyncio.shield(future)
+        finally:
+            if future.done():
+                self._forget(key, future)
+            else:
+                future.add_done_callback(lambda _: self._forget(key, future))
+
+    def _forget(self, key: Hashable, future: asyncio.Future):
+        # A newer call may already own the key once this one was cancelled or finished
+        if self._in_flight.get(key) is future:
+            del self._in_flight[key]
+
+
+def run_coalesced(flight: SingleFlight, key: Hashable, fn: Callable, *args, **kwargs) -> Awaitable[Any]:
+    """Run a blocking call on a worker thread, coalesced with identical in-flight calls"""
+    return flight.do(key, lambda: asyncio.to_thread(fn, *args, **kwargs))
@@ -0,0 +1,210 @@
+"""
+Export and import the search index without re-embedding anything: Qdrant
+points (vectors and payloads) of one company or the whole collection, plus
+the matching MongoDB manual records.
+
+    python snapshot.py export ./snapshots/acme --company acme
+    python snapshot.py import ./snapshots/acme
+
+An archive is a directory with:
+
+    manifest.json   collection, vector size, embedding model, counts
+    vectors.npy     float32 (points, dimensions), row i belongs to points.jsonl line i
+    points.jsonl    {"id": ..., "payload": ...} per point
+    manuals.jsonl   MongoDB manual records in extended JSON
+
+Import creates the collection with the target's storage settings if needed,
+bulk-upserts the points under their original ids and upserts the manual
+records by _id, so re-running an import is safe. Cloudinary files are shared,
+not copied.
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+from bson import json_util
+from pymongo import ReplaceOne
+from pymongo.errors import BulkWriteError
+from qdrant_client.http import models
+
+FORMAT_VERSION = 1
+SCROLL_BATCH = 1024
+UPSERT_BATCH = 512
+
+
+def company_filter(company_name: str | None) -> models.Filter | None:
+    if not company_name:
+        return None
+    return models.Filter(must=[
+        models.FieldCondition(key="metadata.company_name", match=models.MatchValue(value=company_name))
+    ])
+
+
+def export_snapshot(archive: Path, company_name: str | None):
+    import main
+    from resilience import qdrant_dependency
+    from vector_storage import get_collection_name, get_qdrant_client, storage_settings
+
+    if main.mongo_collection is None:
+        raise SystemExit("MongoDB connection not available")
+    client = get_qdrant_client()
+    collection_name = get_collection_name()
+    point_filter = company_filter(company_name)
+    archive.mkdir(parents=True, exist_ok=True)
+    started = time.perf_counter()
+
+    total = qdrant_dependency.call(client.count, collection_name, count_filter=point_filter, exact=True).count
+    vector_size = client.get_collection(collection_name).config.params.vectors.size
+    # Written in place, so the archive never has to fit in memory
+    vectors = np.lib.format.open_memmap(archive / "vectors.npy", mode="w+", dtype=np.float32, shape=(total, vector_size))
+    exported, offset = 0, None
+    with (archive / "points.jsonl").open("w") as points_file:
+        while exported < total:
+            points, offset = qdrant_dependency.call(
+                client.scroll,
+                collection_name=collection_name,
+                scroll_filter=point_filter,
+                limit=SCROLL_BATCH,
+                offset=offset,
+                with_vectors=True,
+                with_payload=True,
+            )
+            # Points added after counting are left for the next snapshot
+            for point in points[:total - exported]:
+                vectors[exported] = point.vector
+                points_file.write(json.dumps({"id": point.id, "payload": point.payload}) + "\n")
+                exported += 1
+            if offset is None:
+                break
+    vectors.flush()
+    del vectors
+    if exported < total:
+        # Points deleted while exporting: shrink the matrix to what was written
+        np.save(archive / "vectors.npy", np.load(archive / "vectors.npy")[:exported])
+
+    manual_query = {"company_name": company_name} if company_name else {}
+    manual_count = 0
+    with (archive / "manuals.jsonl").open("w") as manuals_file:
+        for record in main.mongo_collection.find(manual_query):
+            manuals_file.write(json_util.dumps(record) + "\n")
+            manual_count += 1
+
+    manifest = {
+        "format_version": FORMAT_VERSION,
+        "created_at": datetime.utcnow().isoformat() + "Z",
+        "collection": collection_name,
+        "company_name": company_name,
+        "vector_size": vector_size,
+        "embedding_model": os.getenv("NVIDIA_EMBEDDING_MODEL"),
+        "storage_settings": storage_settings.describe(),
+        "points": exported,
+        "manuals": manual_count,
+    }
+    (archive / "manifest.json").write_text(json.dumps(manifest, indent=2))
+    print(
+        f"Exported {exported} points ({vector_size} dimensions) and {manual_count} manuals "
+        f"to {archive} in {time.perf_counter() - started:.1f}s"
+    )
+
+
+def import_snapshot(archive: Path, collection_name: str | None):
+    import chat
+    import main
+    from catalog_cache import catalog_cache
+    from resilience import qdrant_dependency
+    from vector_storage import ensure_collection, get_collection_name, get_qdrant_client, storage_settings
+
+    if main.mongo_collection is None:
+        raise SystemExit("MongoDB connection not available")
+    manifest = json.loads((archive / "manifest.json").read_text())
+    if manifest.get("format_version") != FORMAT_VERSION:
+        raise SystemExit(f"Unsupported snapshot format {manifest.get('format_version')}")
+    embedding_model = os.getenv("NVIDIA_EMBEDDING_MODEL")
+    if manifest.get("embedding_model") and embedding_model and manifest["embedding_model"] != embedding_model:
+        raise SystemExit(
+            f"Snapshot was embedded with {manifest['embedding_model']}, this environment queries with {embedding_model}"
+        )
+    vector_size = manifest["vector_size"]
+    if storage_settings.dimensions and storage_settings.dimensions != vector_size:
+        raise SystemExit(f"Snapshot vectors have {vector_size} dimensions, EMBEDDING_DIMENSIONS is {storage_settings.dimensions}")
+
+    client = get_qdrant_client()
+    collection_name = collection_name or get_collection_name()
+    if not ensure_collection(client, collection_name, vector_size):
+        existing_size = client.get_collection(collection_name).config.params.vectors.size
+        if existing_size != vector_size:
+            raise SystemExit(f"Collection {collection_name} has {existing_size} dimensions, snapshot has {vector_size}")
+    started = time.perf_counter()
+
+    vectors = np.load(archive / "vectors.npy", mmap_mode="r")
+    imported, batch = 0, []
+    products = set()
+    with (archive / "points.jsonl").open() as points_file:
+        for row, line in enumerate(points_file):
+            point = json.loads(line)
+            metadata = point["payload"].get("metadata") or {}
+            products.add((metadata.get("company_name"), metadata.get("product_name")))
+            batch.append(models.PointStruct(id=point["id"], vector=vectors[row].tolist(), payload=point["payload"]))
+            if len(batch) == UPSERT_BATCH:
+                qdrant_dependency.call(client.upsert, collection_name=collection_name, points=batch, wait=True)
+                imported += len(batch)
+                batch = []
+                print(f"\r{imported}/{manifest['points']} points", end="", flush=True)
+        if batch:
+            qdrant_dependency.call(client.upsert, collection_name=collection_name, points=batch, wait=True)
+            imported += len(batch)
+    print(f"\r{imported}/{manifest['points']} points")
+
+    requests = []
+    with (archive / "manuals.jsonl").open() as manuals_file:
+        for line in manuals_file:
+            record = json_util.loads(line)
+            products.add((record.get("company_name"), record.get("product_name")))
+            requests.append(ReplaceOne({"_id": record["_id"]}, record, upsert=True))
+    failed_manuals = 0
+    if requests:
+        try:
+            main.mongo_collection.bulk_write(requests, ordered=False)
+        except BulkWriteError as bulk_err:
+            # Typically the same PDF already ingested under another _id (unique content_hash)
+            failed_manuals = len(bulk_err.details.get("writeErrors", []))
+            print(f"{failed_manuals} manual records were not imported: {bulk_err.details['writeErrors'][0]['errmsg']}")
+
+    # Running API workers follow through the shared state store
+    catalog_cache.invalidate(manifest.get("company_name"))
+    for company, product in products:
+        chat.answer_cache.invalidate(company, product)
+        chat.hot_vectors.invalidate(company, product)
+
+    print(
+        f"Imported {imported} points and {len(requests) - failed_manuals} manuals into {collection_name} "
+        f"in {time.perf_counter() - started:.1f}s"
+    )
+    return 1 if failed_manuals else 0
+
+
+def run():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+    export_parser = commands.add_parser("export", help="write a snapshot archive")
+    export_parser.add_argument("archive", type=Path)
+    export_parser.add_argument("--company", default=None, help="only this company (default: whole collection)")
+    import_parser = commands.add_parser("import", help="restore a snapshot archive")
+    import_parser.add_argument("archive", type=Path)
+    import_parser.add_argument("--collection", default=None, help="target collection (default QDRANT_COLLECTION_NAME)")
+    args = parser.parse_args()
+
+    if args.command == "export":
+        export_snapshot(args.archive, args.company)
+        return 0
+    return import_snapshot(args.archive, args.collection)
+
+
+if __name__ == "__main__":
+    sys.exit(run())
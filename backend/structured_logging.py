@@ -0,0 +1,138 @@
+"""
+Structured JSON logging with sampling, request-id correlation and a non-blocking handler
+"""
+
+import atexit
+import contextvars
+import copy
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+import time
+import uuid
+
+# Request id of the HTTP request being served, attached to every log record
+request_id_var: contextvars.ContextVar[str | None] = contextvars.ContextVar("request_id", default=None)
+
+REQUEST_ID_HEADER = "X-Request-ID"
+
+# Standard LogRecord attributes; everything else passed via extra= is emitted as a field
+_RESERVED_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+_listener: logging.handlers.QueueListener | None = None
+
+
+def parse_sample_rates(spec: str | None) -> dict[str, float]:
+    """Parse LOG_SAMPLE_RATES, e.g. "query.params=0.01,ingest.batch=0.1" """
+    rates = {}
+    for item in (spec or "").split(","):
+        if "=" not in item:
+            continue
+        event, rate = item.split("=", 1)
+        try:
+            rates[event.strip()] = max(0.0, min(1.0, float(rate)))
+        except ValueError:
+            continue
+    return rates
+
+
+class JsonFormatter(logging.Formatter):
+    """Render records as one JSON object per line; message args are formatted here, off the hot path"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        payload = {
+            "ts": time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(record.created)) + f".{int(record.msecs):03d}Z",
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RESERVED_ATTRS and not key.startswith("_"):
+                payload[key] = value
+        if record.exc_info:
+            payload["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(payload, default=str, ensure_ascii=False)
+
+
+class DeferredQueueHandler(logging.handlers.QueueHandler):
+    """
+    Enqueue records unformatted. The stock prepare() merges the message args
+    and renders the traceback in the calling thread, then drops exc_info;
+    here both happen in the listener. Logged args must therefore not be
+    mutated after the call.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return copy.copy(record)
+
+
+class ContextFilter(logging.Filter):
+    """Stamp records with the current request id and apply per-event sampling"""
+
+    def __init__(self, sample_rates: dict[str, float]):
+        super().__init__()
+        self.sample_rates = sample_rates
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        event = getattr(record, "event", None)
+        if event is not None and event in self.sample_rates:
+            if random.random() >= self.sample_rates[event]:
+                return False
+        record.request_id = request_id_var.get()
+        return True
+
+
+def setup_logging():
+    """
+    Route all logging through a queue so request handlers never block on I/O.
+    Configured by LOG_LEVEL (default INFO), LOG_FORMAT (json/text) and
+    LOG_SAMPLE_RATES.
+    """
+    global _listener
+    if _listener is not None:
+        return
+
+    level = os.getenv("LOG_LEVEL", "INFO").upper()
+    output = logging.StreamHandler(sys.stdout)
+    if os.getenv("LOG_FORMAT", "json").lower() == "json":
+        output.setFormatter(JsonFormatter())
+    else:
+        output.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s [%(request_id)s] %(message)s"))
+
+    log_queue: queue.Queue = queue.Queue(-1)
+    queue_handler = DeferredQueueHandler(log_queue)
+    # Sampling and request ids are resolved in the caller's context, before enqueueing
+    queue_handler.addFilter(ContextFilter(parse_sample_rates(os.getenv("LOG_SAMPLE_RATES"))))
+
+    root = logging.getLogger()
+    root.handlers = [queue_handler]
+    root.setLevel(level)
+
+    _listener = logging.handlers.QueueListener(log_queue, output, respect_handler_level=True)
+    _listener.start()
+    atexit.register(_listener.stop)
+
+
+def log_event(logger: logging.Logger, level: int, event: str, msg: str, *args, **fields):
+    """
+    Log a named event with structured fields. Nothing is formatted unless the
+    level is enabled; sampling by event name happens in the handler filter.
+    """
+    if logger.isEnabledFor(level):
+        logger.log(level, msg, *args, extra={"event": event, **fields})
+
+
+async def request_id_middleware(request, call_next):
+    """Reuse the caller's X-Request-ID or create one, and echo it on the response"""
+    request_id = request.headers.get(REQUEST_ID_HEADER) or uuid.uuid4().hex
+    token = request_id_var.set(request_id)
+    try:
+        response = await call_next(request)
+    finally:
+        request_id_var.reset(token)
+    response.headers[REQUEST_ID_HEADER] = request_id
+    return response
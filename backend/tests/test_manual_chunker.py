@@ -0,0 +1,33 @@
+from langchain_core.documents import Document
+
+from manual_chunker import ManualChunker
+
+LONG_BODY = " ".join(
+    ["The filter must be rinsed under warm water and dried completely before it is reinstalled."] * 8
+)
+
+
+def chunk(text: str, **settings) -> list:
+    chunker = ManualChunker(**{"chunk_tokens": 60, "overlap_tokens": 0, "min_chunk_tokens": 40, **settings})
+    return chunker.split_documents([Document(page_content=text, metadata={"page": 0})])
+
+
+def test_merged_small_section_does_not_end_with_the_next_heading():
+    chunks = chunk(f"CHAPTER 1\nClean regularly.\nCHAPTER 2\n{LONG_BODY}")
+
+    assert chunks[0].page_content == "CHAPTER 1\nClean regularly."
+    assert chunks[0].metadata["section"] == "CHAPTER 1"
+    for later in chunks[1:]:
+        assert later.metadata["section"] == "CHAPTER 2"
+        assert later.page_content.startswith("CHAPTER 2\n")
+        assert later.page_content.count("CHAPTER 2") == 1
+    assert "".join(c.page_content for c in chunks).count("The filter must") == 8
+
+
+def test_heading_only_runs_are_emitted_once_large_enough():
+    contents = "\n".join(f"{n}.1 Replacing the filter of unit {n}" for n in range(1, 30))
+
+    chunks = chunk(contents)
+
+    assert chunks
+    assert all(c.page_content for c in chunks)
@@ -0,0 +1,117 @@
+import threading
+import time
+from contextlib import contextmanager
+
+import pytest
+
+from nim_limiter import PRIORITY_INGESTION, PRIORITY_INTERACTIVE, AdmissionTimeout, EndpointLimiter
+from resilience import STATE_CLOSED, Dependency, RetryBudget
+
+
+def make_dependency(timeout_seconds: float = 1.0, failure_threshold: int = 1) -> Dependency:
+    return Dependency(
+        "test",
+        timeout_seconds=timeout_seconds,
+        max_retries=2,
+        failure_threshold=failure_threshold,
+        reset_timeout_seconds=30,
+        retry_budget=RetryBudget(ratio=1.0, min_per_second=10),
+        backoff_seconds=0.01,
+    )
+
+
+def admission_for(limiter: EndpointLimiter, timeout: float):
+    @contextmanager
+    def admission():
+        limiter.acquire(PRIORITY_INTERACTIVE, timeout)
+        try:
+            yield
+        finally:
+            limiter.release()
+    return admission
+
+
+@pytest.fixture
+def saturated_limiter():
+    """One slot, held by an ingestion call until the test releases it"""
+    limiter = EndpointLimiter("test", rate_per_sec=1000, burst=10, max_concurrency=1, max_starvation_seconds=60)
+    limiter.acquire(PRIORITY_INGESTION, timeout=1)
+    return limiter
+
+
+def test_admission_timeout_is_not_a_failure_or_retried(saturated_limiter):
+    dependency = make_dependency()
+    calls = []
+
+    with pytest.raises(AdmissionTimeout):
+        dependency.call(lambda: calls.append(1), admission=admission_for(saturated_limiter, timeout=0.05))
+    with pytest.raises(AdmissionTimeout):
+        dependency.call(lambda: calls.append(1), admission=admission_for(saturated_limiter, timeout=0.05))
+
+    assert calls == []
+    assert dependency.breaker.state == STATE_CLOSED
+
+
+def test_queue_time_does_not_count_toward_the_deadline(saturated_limiter):
+    dependency = make_dependency(timeout_seconds=0.1)
+    threading.Timer(0.3, saturated_limiter.release).start()
+
+    started = time.monotonic()
+    assert dependency.call(lambda: "ok", admission=admission_for(saturated_limiter, timeout=5)) == "ok"
+
+    assert time.monotonic() - started > dependency.timeout_seconds
+    assert dependency.breaker.state == STATE_CLOSED
+
+
+def test_upstream_failures_still_open_the_breaker():
+    # Three attempts (one call, two retries) reach the breaker's threshold
+    dependency = make_dependency(failure_threshold=3)
+    limiter = EndpointLimiter("test", rate_per_sec=1000, burst=10, max_concurrency=1, max_starvation_seconds=60)
+
+    def failing():
+        raise ConnectionError("upstream down")
+
+    with pytest.raises(ConnectionError):
+        dependency.call(failing, admission=admission_for(limiter, timeout=1))
+
+    assert dependency.breaker.state != STATE_CLOSED
+    # Every attempt released its slot
+    assert limiter._in_flight == 0
+
+
+class ClientError(Exception):
+    status_code = 404
+
+
+class Overloaded(Exception):
+    status_code = 503
+
+
+def test_client_errors_are_not_failures_or_retried():
+    dependency = make_dependency()
+    calls = []
+
+    def bad_request():
+        calls.append(1)
+        raise ClientError("model not found")
+
+    with pytest.raises(ClientError):
+        dependency.call(bad_request)
+
+    assert calls == [1]
+    assert dependency.breaker.state == STATE_CLOSED
+
+
+def test_server_errors_are_retried_and_counted():
+    dependency = make_dependency(failure_threshold=3)
+    calls = []
+
+    def overloaded():
+        calls.append(1)
+        raise Overloaded("service unavailable")
+
+    with pytest.raises(Overloaded):
+        dependency.call(overloaded)
+
+    assert len(calls) == 3
+    assert dependency.breaker.state != STATE_CLOSED
@@ -0,0 +1,66 @@
+import asyncio
+import io
+
+import pytest
+from fastapi import HTTPException, UploadFile
+from pymongo.errors import DuplicateKeyError
+
+import main
+from shared_state import InMemoryStateStore
+
+
+class ConcurrentDuplicateManuals:
+    """Manual collection where another upload of the same PDF wins the insert after the hash lookup"""
+
+    def find_one(self, *args, **kwargs):
+        return None
+
+    def insert_one(self, doc):
+        raise DuplicateKeyError("E11000 duplicate key error collection: manuals index: content_hash_1")
+
+
+@pytest.fixture
+def ingestion_stubs(monkeypatch):
+    monkeypatch.setattr(main, "mongo_collection", ConcurrentDuplicateManuals())
+    monkeypatch.setattr(main, "state_store", InMemoryStateStore())
+    monkeypatch.setattr(
+        main, "upload_to_cloudinary",
+        lambda file_path, public_id=None: {"secure_url": "https://example.com/manual.pdf", "public_id": public_id}
+    )
+    monkeypatch.setattr(main, "generate_and_upload_qr", lambda *args: ("https://example.com/qr.png", "qr"))
+    monkeypatch.setattr(main, "parse_and_embed_pdf", lambda file_path, embedding_model: ({}, [], None))
+    monkeypatch.setattr(main, "NVIDIANIMEmbeddings", lambda priority=None: None)
+
+
+def test_concurrent_duplicate_upload_returns_409(ingestion_stubs):
+    upload = UploadFile(file=io.BytesIO(b"%PDF-1.4 manual"), filename="manual.pdf")
+
+    with pytest.raises(HTTPException) as excinfo:
+        asyncio.run(main.upload_pdf(
+            file=upload, company_name="acme", product_name="cooler", product_code=None, retag=False
+        ))
+
+    assert excinfo.value.status_code == 409
+
+
+def test_missing_product_returns_400(ingestion_stubs):
+    upload = UploadFile(file=io.BytesIO(b"%PDF-1.4 manual"), filename="manual.pdf")
+
+    with pytest.raises(HTTPException) as excinfo:
+        asyncio.run(main.upload_pdf(
+            file=upload, company_name="acme", product_name=None, product_code=None, retag=False
+        ))
+
+    assert excinfo.value.status_code == 400
+
+
+def test_rejected_upload_keeps_the_uploaded_files_list(ingestion_stubs):
+    main.state_store.list_append(main.UPLOADED_FILES_KEY, "earlier.pdf")
+    upload = UploadFile(file=io.BytesIO(b"%PDF-1.4 manual"), filename="manual.pdf")
+
+    with pytest.raises(HTTPException):
+        asyncio.run(main.upload_multiple_pdfs(
+            files=[upload], company_name="acme", product_name=None, product_code=None, retag=False
+        ))
+
+    assert main.state_store.list_get(main.UPLOADED_FILES_KEY) == ["earlier.pdf"]
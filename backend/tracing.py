@@ -0,0 +1,121 @@
+"""
+OpenTelemetry tracing for the retrieval and ingestion pipelines
+"""
+
+import logging
+import os
+import time
+
+from opentelemetry import propagate, trace
+from opentelemetry.sdk.resources import Resource
+from opentelemetry.sdk.trace import TracerProvider
+from opentelemetry.sdk.trace.export import BatchSpanProcessor, ConsoleSpanExporter
+from opentelemetry.trace import SpanKind, Status, StatusCode
+from pymongo import monitoring
+
+logger = logging.getLogger(__name__)
+
+SERVICE_NAME = os.getenv("OTEL_SERVICE_NAME", "manual-rag-backend")
+
+tracer = trace.get_tracer("manual-rag")
+
+
+def setup_tracing():
+    """
+    Install the tracer provider selected by TRACING_EXPORTER:
+    "otlp" (OTEL_EXPORTER_OTLP_ENDPOINT, default local collector), "console"
+    (stdout) or "none" (default, spans are no-ops)
+    """
+    exporter_name = os.getenv("TRACING_EXPORTER", "none").lower()
+    if exporter_name == "none":
+        return
+
+    if exporter_name == "otlp":
+        from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+        exporter = OTLPSpanExporter()
+    elif exporter_name == "console":
+        exporter = ConsoleSpanExporter()
+    else:
+        logger.warning("Unknown TRACING_EXPORTER %r, tracing disabled", exporter_name)
+        return
+
+    provider = TracerProvider(resource=Resource.create({"service.name": SERVICE_NAME}))
+    provider.add_span_processor(BatchSpanProcessor(exporter))
+    trace.set_tracer_provider(provider)
+    logger.info("Tracing enabled with %s exporter", exporter_name)
+
+
+def start_span(name: str, **attributes):
+    """Start a child span of the current request, e.g. with start_span("qdrant.search", k=15)"""
+    return tracer.start_as_current_span(
+        name,
+        attributes={k: v for k, v in attributes.items() if v is not None},
+    )
+
+
+def set_span_attributes(**attributes):
+    """Attach attributes known only after a stage ran (result counts, token usage)"""
+    span = trace.get_current_span()
+    for key, value in attributes.items():
+        if value is not None:
+            span.set_attribute(key, value)
+
+
+class MongoCommandTracing(monitoring.CommandListener):
+    """
+    Records a span per MongoDB command, back-dated with the driver's measured
+    duration so no per-command state has to be kept
+    """
+
+    def started(self, event):
+        pass
+
+    def _record(self, event, error: bool):
+        end_ns = time.time_ns()
+        span = tracer.start_span(
+            f"mongodb.{event.command_name}",
+            kind=SpanKind.CLIENT,
+            start_time=end_ns - event.duration_micros * 1000,
+            attributes={
+                "db.system": "mongodb",
+                "db.name": event.database_name,
+                "db.operation": event.command_name,
+            },
+        )
+        if error:
+            span.set_status(Status(StatusCode.ERROR))
+        span.end(end_time=end_ns)
+
+    def succeeded(self, event):
+        self._record(event, error=False)
+
+    def failed(self, event):
+        self._record(event, error=True)
+
+
+mongo_command_tracing = MongoCommandTracing()
+
+
+async def tracing_middleware(request, call_next):
+    """
+    Open a server span per HTTP request, continuing any trace propagated in the
+    incoming traceparent/tracestate headers
+    """
+    context = propagate.extract(dict(request.headers))
+    route = request.url.path
+    with tracer.start_as_current_span(
+        f"{request.method} {route}",
+        context=context,
+        kind=SpanKind.SERVER,
+        attributes={"http.method": request.method, "http.target": route},
+    ) as span:
+        response = await call_next(request)
+        span.set_attribute("http.status_code", response.status_code)
+        if response.status_code >= 500:
+            span.set_status(Status(StatusCode.ERROR))
+        # Let clients correlate their request with the trace
+        carrier = {}
+        propagate.inject(carrier)
+        for header, value in carrier.items():
+            response.headers[header] = value
+        return response
@@ -0,0 +1,213 @@
+"""
+Qdrant access and collection layout: the shared client for the configured
+backend, quantization, on-disk originals and embedding dimension
+"""
+
+import functools
+import logging
+import os
+import threading
+from typing import List, Optional
+
+import numpy as np
+from dotenv import load_dotenv
+from langchain_core.documents import Document
+from langchain_qdrant import QdrantVectorStore
+from qdrant_client import QdrantClient
+from qdrant_client.http import models
+
+from resilience import qdrant_dependency
+
+logger = logging.getLogger(__name__)
+
+load_dotenv()
+
+# "remote" (QDRANT_URL) or "local" (embedded, on disk at QDRANT_LOCAL_PATH, or ":memory:")
+VECTOR_BACKEND = os.getenv("VECTOR_BACKEND", "remote").lower()
+QDRANT_LOCAL_PATH = os.getenv("QDRANT_LOCAL_PATH", "./qdrant_data")
+
+_client = None
+_client_lock = threading.Lock()
+_validated_collections: set = set()
+
+
+class SerializedQdrantClient(QdrantClient):
+    """
+    Embedded Qdrant is not thread-safe, but the API calls it from worker
+    threads; every public client call here holds one re-entrant lock.
+    """
+
+    def __init__(self, *args, **kwargs):
+        self._operation_lock = threading.RLock()
+        super().__init__(*args, **kwargs)
+
+    def __getattribute__(self, name: str):
+        attr = super().__getattribute__(name)
+        if name.startswith("_") or not callable(attr):
+            return attr
+        lock = super().__getattribute__("_operation_lock")
+
+        @functools.wraps(attr)
+        def serialized(*args, **kwargs):
+            with lock:
+                return attr(*args, **kwargs)
+        return serialized
+
+
+def get_collection_name() -> str:
+    return os.getenv("QDRANT_COLLECTION_NAME", "manuals")
+
+
+def get_qdrant_client() -> QdrantClient:
+    """
+    Shared Qdrant client for the configured backend. The local backend runs
+    in-process and locks its directory, so it needs this single instance and
+    a single uvicorn worker; its operations are serialized by
+    SerializedQdrantClient.
+    """
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                if VECTOR_BACKEND == "local":
+                    if QDRANT_LOCAL_PATH == ":memory:":
+                        _client = SerializedQdrantClient(location=":memory:")
+                    else:
+                        _client = SerializedQdrantClient(path=QDRANT_LOCAL_PATH)
+                    logger.info("Using embedded Qdrant at %s", QDRANT_LOCAL_PATH)
+                else:
+                    _client = QdrantClient(
+                        url=os.getenv("QDRANT_URL"),
+                        api_key=os.getenv("QDRANT_API_KEY"),
+                        timeout=int(qdrant_dependency.timeout_seconds)
+                    )
+    return _client
+
+
+def get_vector_store(embedding, collection_name: str = None) -> QdrantVectorStore:
+    """
+    LangChain vector store over the shared client; raises if the collection
+    does not exist. The check (a collection lookup plus one embedding call to
+    compare vector sizes) runs once per collection per process.
+    """
+    collection_name = collection_name or get_collection_name()
+    vector_store = QdrantVectorStore(
+        client=get_qdrant_client(),
+        collection_name=collection_name,
+        embedding=embedding,
+        validate_collection_config=collection_name not in _validated_collections,
+    )
+    _validated_collections.add(collection_name)
+    return vector_store
+
+
+def point_to_document(point_id, payload: dict, collection_name: str = None) -> Document:
+    """A stored point in the same shape QdrantVectorStore returns search results"""
+    metadata = dict(payload.get("metadata") or {})
+    metadata["_id"] = point_id
+    metadata["_collection_name"] = collection_name or get_collection_name()
+    return Document(page_content=payload.get("page_content") or "", metadata=metadata)
+
+
+def backend_configured() -> bool:
+    return VECTOR_BACKEND == "local" or bool(os.getenv("QDRANT_URL"))
+
+
+class VectorStorageSettings:
+    """
+    Storage options for the chunk collection, read from the environment by default.
+
+    quantization: "none", "scalar" (int8) or "binary"
+    rescore / oversampling: re-rank quantized candidates with the original vectors
+    on_disk: keep the original float32 vectors on disk, only quantized ones in RAM
+    dimensions: truncate Matryoshka-capable embeddings to this many dimensions
+    """
+
+    def __init__(
+        self,
+        quantization: str = None,
+        rescore: bool = None,
+        oversampling: float = None,
+        on_disk: bool = None,
+        dimensions: Optional[int] = None
+    ):
+        self.quantization = (quantization or os.getenv("QDRANT_QUANTIZATION", "none")).lower()
+        self.rescore = rescore if rescore is not None else os.getenv("QDRANT_RESCORE", "true").lower() == "true"
+        self.oversampling = oversampling or float(os.getenv("QDRANT_OVERSAMPLING", "2.0"))
+        self.on_disk = on_disk if on_disk is not None else os.getenv("QDRANT_ON_DISK_VECTORS", "false").lower() == "true"
+        if dimensions is None and os.getenv("EMBEDDING_DIMENSIONS"):
+            dimensions = int(os.getenv("EMBEDDING_DIMENSIONS"))
+        self.dimensions = dimensions
+
+    def describe(self) -> str:
+        parts = [self.quantization]
+        if self.quantization != "none":
+            parts.append(f"rescore x{self.oversampling}" if self.rescore else "no rescore")
+        if self.on_disk:
+            parts.append("on-disk")
+        if self.dimensions:
+            parts.append(f"{self.dimensions}d")
+        return ", ".join(parts)
+
+    def vectors_config(self, size: int) -> models.VectorParams:
+        return models.VectorParams(size=size, distance=models.Distance.COSINE, on_disk=self.on_disk)
+
+    def quantization_config(self):
+        if self.quantization == "scalar":
+            return models.ScalarQuantization(
+                scalar=models.ScalarQuantizationConfig(
+                    type=models.ScalarType.INT8,
+                    quantile=0.99,
+                    always_ram=True,
+                )
+            )
+        if self.quantization == "binary":
+            return models.BinaryQuantization(binary=models.BinaryQuantizationConfig(always_ram=True))
+        return None
+
+    def search_params(self) -> Optional[models.SearchParams]:
+        """Search parameters for queries; None keeps Qdrant's defaults"""
+        if self.quantization == "none":
+            return None
+        return models.SearchParams(
+            quantization=models.QuantizationSearchParams(
+                rescore=self.rescore,
+                oversampling=self.oversampling,
+            )
+        )
+
+    def truncate(self, embedding: List[float]) -> List[float]:
+        """Keep the leading dimensions of a Matryoshka embedding and re-normalize"""
+        if not self.dimensions or len(embedding) <= self.dimensions:
+            return embedding
+        vector = np.asarray(embedding[:self.dimensions], dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return (vector / norm if norm else vector).tolist()
+
+
+storage_settings = VectorStorageSettings()
+
+
+def ensure_collection(client, collection_name: str, vector_size: int, settings: VectorStorageSettings = None) -> bool:
+    """
+    Create the chunk collection with the configured storage layout and keyword
+    indexes on the filter fields. Returns False when it already existed; the
+    layout of an existing collection is left untouched. The local backend
+    accepts but ignores quantization and payload indexes.
+    """
+    settings = settings or storage_settings
+    if client.collection_exists(collection_name):
+        return False
+    client.create_collection(
+        collection_name=collection_name,
+        vectors_config=settings.vectors_config(vector_size),
+        quantization_config=settings.quantization_config(),
+    )
+    for field in ("metadata.company_name", "metadata.product_name"):
+        client.create_payload_index(
+            collection_name=collection_name,
+            field_name=field,
+            field_schema=models.PayloadSchemaType.KEYWORD,
+        )
+    logger.info("Created collection %s (%s, %d dimensions)", collection_name, settings.describe(), vector_size)
+    return True